@@ -0,0 +1,15 @@
+"""
+Entry point of "python -m ip_checker", see the "cli" module. The modules
+are imported as parts of the package, nothing is added to the module
+search path.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import sys
+from ip_checker.cli import main
+
+sys.exit(main())
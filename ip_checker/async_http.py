@@ -0,0 +1,563 @@
+"""
+Minimal non-blocking HTTP/1.1 client on top of asyncio streams.
+Only what is needed to download a provider page: GET requests,
+redirects, "Content-Length" and "chunked" bodies. The requests can go
+through an HTTP proxy (CONNECT, or an absolute link for plain http) or
+a SOCKS5 proxy ("socks5://" - the name is resolved locally,
+"socks5h://" - by the proxy), with an optional user name and password.
+With a ConnectionPool the connections are kept open and reused by the
+next requests to the same host on the same event loop.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import asyncio
+import base64
+import ipaddress
+import socket
+import ssl
+import struct
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, NamedTuple
+from urllib.parse import unquote, urljoin, urlsplit
+
+PROXY_SCHEMES = ('http', 'socks5', 'socks5h')
+# Size limit of the answer of an HTTP proxy to CONNECT
+_MAX_PROXY_HEADER = 16 * 1024
+# Size of the pieces in which a body is read
+CHUNK_SIZE = 16 * 1024
+_REDIRECT_CODES = (301, 302, 303, 307, 308)
+# The rest of a body still read after the reading was stopped, so that
+# a kept connection can carry the next request
+_DRAIN = 64 * 1024
+
+
+class HTTPResponse(NamedTuple):
+    """
+    Description of the data returned by the "fetch" function.
+    "content" is only the beginning of the body when the reading was
+    stopped early (see "read_body"); "complete" is False when the rest
+    of the body was left unread.
+    """
+    status_code: int
+    headers: dict
+    content: bytes
+    url: str
+    complete: bool = True
+
+
+class ConnectionPool():
+    """
+    Keep-alive connections of one event loop, kept for the next request
+    to the same host (through the same proxy, from the same local address).
+    A connection to an HTTP proxy that gets plain http requests serves
+    all hosts. The pool must be used on one event loop only.
+
+    Methods:
+        __init__: class initialization;
+        take: an idle connection for a request, if there is one;
+        put: keeping a connection after a complete response;
+        close: closing all idle connections.
+
+    Class level variables:
+        self.max_per_host: idle connections kept per host;
+        self.idle_timeout: seconds an idle connection is kept;
+        self.reused: number of requests sent over a kept connection.
+    """
+
+    def __init__(self, max_per_host:int = 4, idle_timeout:float = 60.0):
+        if max_per_host < 1:
+            raise ValueError(f'max_per_host must be positive. Value: {max_per_host}')
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.reused = 0
+        self._idle: dict[tuple, list[tuple[asyncio.StreamReader, asyncio.StreamWriter,
+                                           float]]] = {}
+
+    def take(self, key:tuple) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]|None:
+        """
+        Parameters:
+            key (tuple): the host, port, proxy and local address of the request.
+
+        Returns:
+            tuple: reader and writer of an idle connection, the last used first;
+            None: no usable connection is kept.
+        """
+        connections = self._idle.get(key, [])
+        while connections:
+            reader, writer, last_used = connections.pop()
+            if (time.monotonic() - last_used > self.idle_timeout
+                    or writer.is_closing() or reader.at_eof()):
+                writer.close()
+                continue
+            self.reused += 1
+            return reader, writer
+        return None
+
+    def put(self, key:tuple, reader:asyncio.StreamReader,
+            writer:asyncio.StreamWriter) -> None:
+        """
+        Keeping a connection whose response was read to the end.
+
+        Parameters:
+            key (tuple): see "take";
+            reader (asyncio.StreamReader), writer (asyncio.StreamWriter): the connection.
+        """
+        connections = self._idle.setdefault(key, [])
+        if len(connections) >= self.max_per_host or writer.is_closing():
+            writer.close()
+            return
+        connections.append((reader, writer, time.monotonic()))
+
+    def close(self) -> None:
+        """
+        Closing all idle connections. The pool stays usable.
+        """
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for _, writer, _ in connections:
+                writer.close()
+
+
+_SSL_CONTEXT = None
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """
+    Default SSL context, created once and shared by all connections.
+
+    Returns:
+        class 'ssl.SSLContext': context with certificate verification.
+    """
+    global _SSL_CONTEXT
+    if _SSL_CONTEXT is None:
+        _SSL_CONTEXT = ssl.create_default_context()
+    return _SSL_CONTEXT
+
+
+async def iter_body(reader:asyncio.StreamReader, headers:dict,
+                    chunk_size:int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Reading the response body in pieces as they arrive.
+
+    Parameters:
+        reader (asyncio.StreamReader): stream positioned after the headers;
+        headers (dict): response headers with lower-case names;
+        chunk_size (int): the largest piece.
+
+    Returns:
+        AsyncIterator: pieces of the body, until its end.
+
+    Exceptions:
+        asyncio.IncompleteReadError: the connection was closed too early.
+    """
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                await reader.readline()
+                return
+            while size > 0:
+                piece = await reader.readexactly(min(size, chunk_size))
+                size -= len(piece)
+                yield piece
+            await reader.readline()
+    elif 'content-length' in headers:
+        left = int(headers['content-length'])
+        while left > 0:
+            piece = await reader.read(min(left, chunk_size))
+            if not piece:
+                raise asyncio.IncompleteReadError(b'', left)
+            left -= len(piece)
+            yield piece
+    else: # The body ends with the connection
+        while piece := await reader.read(chunk_size):
+            yield piece
+
+
+async def read_body(reader:asyncio.StreamReader, headers:dict,
+                    limit:int|None = None,
+                    stop:Callable[[bytes], object]|None = None,
+                    drain:int = 0) -> tuple[bytes, bool]:
+    """
+    Reading the response body according to its headers, stopping early
+    when "limit" bytes have been read or "stop" asks for it. Up to
+    "drain" bytes of the rest are still read (and thrown away), so that
+    the connection can carry the next request.
+
+    Parameters:
+        reader (asyncio.StreamReader): stream positioned after the headers;
+        headers (dict): response headers with lower-case names;
+        limit (int | None): the most bytes to return, None - the whole body;
+        stop (Callable | None): called with every piece, a true answer
+            ends the reading (for example StreamExtractor.feed);
+        drain (int): the most bytes read after the stop.
+
+    Returns:
+        tuple: the body (or its beginning) and whether the connection
+            is at the end of the response.
+    """
+    body = bytearray()
+    stopped = False
+    drained = 0
+    async with aclosing(iter_body(reader, headers)) as pieces:
+        async for piece in pieces:
+            if stopped:
+                drained += len(piece)
+                if drained > drain:
+                    return bytes(body), False
+                continue
+            body += piece
+            if stop is not None and stop(piece):
+                stopped = True
+            if limit is not None and len(body) >= limit:
+                del body[limit:]
+                stopped = True
+            if stopped and drain <= 0:
+                return bytes(body), False
+    return bytes(body), True
+
+
+def proxy_authorization(proxy:str) -> str|None:
+    """
+    Parameters:
+        proxy (str): link of the proxy, may contain "user:password@".
+
+    Returns:
+        str: value of the "Proxy-Authorization" header;
+        None: the link has no user name.
+    """
+    parts = urlsplit(proxy)
+    if parts.username is None:
+        return None
+    credentials = f'{unquote(parts.username)}:{unquote(parts.password or "")}'
+    return 'Basic ' + base64.b64encode(credentials.encode()).decode('ascii')
+
+
+async def _receive_exactly(loop:asyncio.AbstractEventLoop, sock:socket.socket,
+                           size:int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = await loop.sock_recv(sock, size - len(data))
+        if not chunk:
+            raise ConnectionError('The proxy closed the connection')
+        data += chunk
+    return data
+
+
+async def _http_connect(loop:asyncio.AbstractEventLoop, sock:socket.socket,
+                        proxy:str, host:str, port:int) -> None:
+    target = f'[{host}]:{port}' if ':' in host else f'{host}:{port}'
+    lines = [f'CONNECT {target} HTTP/1.1', f'Host: {target}']
+    authorization = proxy_authorization(proxy)
+    if authorization is not None:
+        lines.append(f'Proxy-Authorization: {authorization}')
+    await loop.sock_sendall(sock, ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    answer = b''
+    while b'\r\n\r\n' not in answer: # Read byte by byte: nothing after the header is taken
+        if len(answer) > _MAX_PROXY_HEADER:
+            raise ConnectionError('The answer of the proxy is too long')
+        answer += await _receive_exactly(loop, sock, 1)
+    status_line = answer.split(b'\r\n', 1)[0]
+    try:
+        status_code = int(status_line.split()[1])
+    except (IndexError, ValueError) as exc:
+        raise ConnectionError(f'Malformed answer of the proxy: {status_line!r}') from exc
+    if status_code != 200:
+        raise ConnectionError(f'The proxy refused the tunnel: {status_code}')
+
+
+async def _socks5_connect(loop:asyncio.AbstractEventLoop, sock:socket.socket,
+                          proxy:str, host:str, port:int) -> None:
+    parts = urlsplit(proxy)
+    methods = b'\x00\x02' if parts.username is not None else b'\x00'
+    await loop.sock_sendall(sock, b'\x05' + bytes([len(methods)]) + methods)
+    version, method = await _receive_exactly(loop, sock, 2)
+    if version != 5 or method == 0xFF:
+        raise ConnectionError('The SOCKS5 proxy accepts none of the offered methods')
+    if method == 2:
+        user = unquote(parts.username or '').encode()
+        password = unquote(parts.password or '').encode()
+        await loop.sock_sendall(sock, b'\x01' + bytes([len(user)]) + user
+                                      + bytes([len(password)]) + password)
+        if (await _receive_exactly(loop, sock, 2))[1] != 0:
+            raise ConnectionError('The SOCKS5 proxy rejected the user name or password')
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        address = None
+    if address is None and parts.scheme == 'socks5':
+        # Resolved locally, the proxy gets the address
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        address = ipaddress.ip_address(infos[0][4][0])
+    if address is None:
+        destination = b'\x03' + bytes([len(host)]) + host.encode('idna')
+    elif address.version == 4:
+        destination = b'\x01' + address.packed
+    else:
+        destination = b'\x04' + address.packed
+    await loop.sock_sendall(sock, b'\x05\x01\x00' + destination + struct.pack('>H', port))
+    _, reply, _, address_type = await _receive_exactly(loop, sock, 4)
+    if reply != 0:
+        raise ConnectionError(f'The SOCKS5 proxy could not connect: code {reply}')
+    if address_type == 3:
+        length = (await _receive_exactly(loop, sock, 1))[0]
+    else:
+        length = 16 if address_type == 4 else 4
+    await _receive_exactly(loop, sock, length + 2) # The bound address and port
+
+
+async def open_proxy_socket(proxy:str, host:str, port:int,
+                            source_address:str|None = None) -> socket.socket:
+    """
+    Opening a connection to "host:port" through a proxy: a CONNECT
+    tunnel of an HTTP proxy or a SOCKS5 CONNECT.
+
+    Parameters:
+        proxy (str): link of the proxy, "http://", "socks5://" or "socks5h://";
+        host (str): name or address of the target;
+        port (int): port of the target;
+        source_address (str | None): local address the connection is bound to.
+
+    Returns:
+        socket.socket: non-blocking socket connected to the target.
+
+    Exceptions:
+        ValueError: the link of the proxy is invalid;
+        OSError: connection error or the proxy refused the connection.
+    """
+    parts = urlsplit(proxy)
+    if parts.scheme not in PROXY_SCHEMES or not parts.hostname:
+        raise ValueError(f'Invalid proxy: {proxy}')
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(parts.hostname, parts.port or 1080,
+                                   type=socket.SOCK_STREAM)
+    family, kind, protocol, _, address = infos[0]
+    sock = socket.socket(family, kind, protocol)
+    try:
+        sock.setblocking(False)
+        if source_address is not None:
+            sock.bind((source_address, 0))
+        await loop.sock_connect(sock, address)
+        if parts.scheme == 'http':
+            await _http_connect(loop, sock, proxy, host, port)
+        else:
+            await _socks5_connect(loop, sock, proxy, host, port)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+async def request_once(url:str, headers:dict|None = None,
+                       source_address:str|None = None,
+                       proxy:str|None = None,
+                       connect_timeout:float|None = None,
+                       byte_limit:int|None = None,
+                       stop:Callable[[bytes], object]|None = None,
+                       pool:ConnectionPool|None = None) -> HTTPResponse:
+    """
+    One GET request without following redirects. With a pool a kept
+    connection is used if there is one (a new one is opened if the
+    server has closed it meanwhile), and the connection is kept after
+    a complete response the server did not ask to close.
+
+    Parameters:
+        url (str): absolute http or https link;
+        headers (dict | None): additional request headers;
+        source_address (str | None): local address the connection is bound to;
+        proxy (str | None): link of the proxy the request goes through;
+        connect_timeout (float | None): seconds to open the connection
+            (including the proxy handshake and TLS), None - no own limit;
+        byte_limit (int | None): the most bytes of the body to read;
+        stop (Callable | None): called with every piece of the body
+            (not of a redirect), a true answer ends the reading (see "read_body");
+        pool (ConnectionPool | None): keep-alive connections of the event
+            loop, None - the connection is closed after the response.
+
+    Returns:
+        HTTPResponse: status, headers and body of the response.
+
+    Exceptions:
+        ValueError: the link is not an absolute http(s) link or the proxy is invalid;
+        OSError: connection error;
+        asyncio.TimeoutError: the connection was not opened within "connect_timeout".
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f'Invalid URL: {url}')
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path = f'{path}?{parts.query}'
+
+    extra_lines = []
+    absolute = proxy is not None and not secure and urlsplit(proxy).scheme == 'http'
+    if absolute:
+        # A plain http request is sent to an HTTP proxy with the absolute link
+        proxy_parts = urlsplit(proxy)
+        if not proxy_parts.hostname:
+            raise ValueError(f'Invalid proxy: {proxy}')
+        path = f'http://{parts.netloc}{path}'
+        authorization = proxy_authorization(proxy)
+        if authorization is not None:
+            extra_lines.append(f'Proxy-Authorization: {authorization}')
+
+    async def connect():
+        if absolute:
+            return await asyncio.open_connection(
+                    proxy_parts.hostname, proxy_parts.port or 80,
+                    local_addr=None if source_address is None else (source_address, 0))
+        if proxy is not None:
+            sock = await open_proxy_socket(proxy, parts.hostname, port, source_address)
+            try:
+                return await asyncio.open_connection(
+                        sock=sock, ssl=get_ssl_context() if secure else None,
+                        server_hostname=parts.hostname if secure else None)
+            except BaseException:
+                sock.close()
+                raise
+        return await asyncio.open_connection(
+                parts.hostname, port,
+                ssl=get_ssl_context() if secure else None,
+                local_addr=None if source_address is None else (source_address, 0))
+
+    async def open_connection():
+        if connect_timeout is None:
+            return await connect()
+        return await asyncio.wait_for(connect(), connect_timeout)
+
+    lines = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Accept-Encoding: identity',
+             'Connection: close' if pool is None else 'Connection: keep-alive'] + extra_lines
+    for name, value in (headers or {}).items():
+        lines.append(f'{name}: {value}')
+    request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def send(reader, writer):
+        writer.write(request)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('The connection was closed without an answer')
+        return status_line
+
+    if absolute:
+        key = ('proxy', proxy, source_address)
+    else:
+        key = (parts.scheme, parts.hostname, port, source_address, proxy)
+    connection = None if pool is None else pool.take(key)
+    if connection is None:
+        reader, writer = await open_connection()
+    else:
+        reader, writer = connection
+    try:
+        try:
+            status_line = await send(reader, writer)
+        except OSError:
+            if connection is None:
+                raise
+            # The server has closed the kept connection meanwhile
+            writer.close()
+            reader, writer = await open_connection()
+            status_line = await send(reader, writer)
+        try:
+            version, status_code = status_line.split()[:2]
+            status_code = int(status_code)
+        except ValueError as exc:
+            raise ConnectionError(f'Malformed status line: {status_line!r}') from exc
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        if status_code in _REDIRECT_CODES and 'location' in response_headers:
+            stop = None # Only the body of the page itself is scanned
+        content, complete = await read_body(reader, response_headers, byte_limit, stop,
+                                            0 if pool is None else _DRAIN)
+    except asyncio.IncompleteReadError as exc:
+        writer.close()
+        raise ConnectionError('The connection was closed before the end of the response') from exc
+    except BaseException:
+        writer.close()
+        raise
+    if pool is not None and complete and keeps_alive(version, response_headers):
+        pool.put(key, reader, writer)
+    else:
+        writer.close()
+    return HTTPResponse(status_code, response_headers, content, url, complete)
+
+
+def keeps_alive(version:bytes, headers:dict) -> bool:
+    """
+    Whether the connection can carry the next request after this response.
+
+    Parameters:
+        version (bytes): protocol of the status line, b'HTTP/1.1';
+        headers (dict): response headers with lower-case names.
+
+    Returns:
+        bool: True if the body had a known length and the server keeps
+            the connection open.
+    """
+    if ('content-length' not in headers
+            and headers.get('transfer-encoding', '').lower() != 'chunked'):
+        return False # The body ended with the connection
+    connection = headers.get('connection', '').lower()
+    if version == b'HTTP/1.0':
+        return connection == 'keep-alive'
+    return connection != 'close'
+
+
+async def fetch(url:str, headers:dict|None = None,
+                timeout:float = 5, max_redirects:int = 3,
+                source_address:str|None = None,
+                proxy:str|None = None,
+                connect_timeout:float|None = None,
+                byte_limit:int|None = None,
+                stop:Callable[[bytes], object]|None = None,
+                pool:ConnectionPool|None = None) -> HTTPResponse:
+    """
+    GET request following redirects, limited by a total timeout.
+    Cancelling the task that awaits this function closes the connection.
+
+    Parameters:
+        url (str): absolute http or https link;
+        headers (dict | None): additional request headers;
+        timeout (float): seconds for the whole request including redirects;
+        max_redirects (int): maximum number of redirects to follow;
+        source_address (str | None): local address the connections are bound to;
+        proxy (str | None): link of the proxy the requests go through;
+        connect_timeout (float | None): seconds to open each connection,
+            within the total "timeout";
+        byte_limit (int | None): the most bytes of a body to read;
+        stop (Callable | None): called with every piece of the last body,
+            a true answer ends the reading;
+        pool (ConnectionPool | None): keep-alive connections to use and to keep.
+
+    Returns:
+        HTTPResponse: status, headers and body of the last response.
+
+    Exceptions:
+        ValueError: the link is not an absolute http(s) link;
+        OSError: connection error;
+        asyncio.TimeoutError: the timeout has expired.
+    """
+    async def follow():
+        current_url = url
+        for _ in range(max_redirects + 1):
+            response = await request_once(current_url, headers, source_address, proxy,
+                                          connect_timeout, byte_limit, stop, pool)
+            location = response.headers.get('location')
+            if response.status_code not in _REDIRECT_CODES or not location:
+                return response
+            current_url = urljoin(current_url, location)
+        return response
+    return await asyncio.wait_for(follow(), timeout)
@@ -0,0 +1,294 @@
+"""
+Offline benchmarks of the program. The provider sites are replaced by
+local servers (see the "fake_providers" module), so the results do not
+depend on the Internet and can be compared between versions:
+
+    python benchmark.py --output results.json
+    python benchmark.py --latency 0.01 0.05 --failure-rate 0.2 --https
+
+Measured:
+    get: latency of GetMyIP.get (cache disabled), sequential and racing;
+    parse: pages per second of every site, with the fast pattern and
+        with the BeautifulSoup parser only;
+    run: IPAddressVerification.run calls per second;
+    proxies: ProxyChecker through the local proxy stand-in, proxies per
+        second and the latency of one check.
+
+The result is one JSON object: "meta" (settings, versions) and "results".
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Union
+
+import log_config
+import extract
+import fake_providers
+from find_ip import GetMyIP, FailedToGetIP
+from check_ip import IPAddressVerification
+from providers import Provider
+from proxy_check import ProxyChecker
+
+ADDRESS = '203.0.113.7'
+# Site, parser method and fast pattern of "get_external_ipv4_N"
+PARSERS = (
+    (fake_providers.CHECKIP, 'parse_page_1', extract.CHECKIP_PATTERN),
+    (fake_providers.IPADDRESS_COM, 'parse_page_2', extract.IPADDRESS_COM_PATTERN),
+    (fake_providers.IPLOCATION, 'parse_page_3', extract.IPLOCATION_PATTERN),
+)
+
+
+def summarize(samples:list[float]) -> dict:
+    """
+    Parameters:
+        samples (list): durations in seconds.
+
+    Returns:
+        dict: percentiles, mean, min and max in milliseconds.
+    """
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(share:float) -> float:
+        return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+    return {'count': len(ordered),
+            'p50_ms': round(percentile(0.5) * 1000, 3),
+            'p90_ms': round(percentile(0.9) * 1000, 3),
+            'p99_ms': round(percentile(0.99) * 1000, 3),
+            'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+            'min_ms': round(ordered[0] * 1000, 3),
+            'max_ms': round(ordered[-1] * 1000, 3)}
+
+
+def rate(func:Callable[[], object], iterations:int) -> float:
+    """
+    Parameters:
+        func: the measured call;
+        iterations (int): how many times it is called.
+
+    Returns:
+        float: calls per second.
+    """
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return iterations / (time.perf_counter() - started)
+
+
+def bench_get(urls:tuple[str, ...], race:bool, iterations:int) -> dict:
+    """
+    Measuring GetMyIP.get against the local sites.
+
+    Parameters:
+        urls (tuple): links of the local sites;
+        race (bool): call the providers in parallel;
+        iterations (int): number of lookups.
+
+    Returns:
+        dict: latency of the successful lookups and the share of failed ones.
+    """
+    samples = []
+    failures = 0
+    with GetMyIP(race=race, provider_urls=urls, cache_ttl=0, failure_ttl=0) as ip_search:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            try:
+                ipv4 = ip_search.get()
+            except FailedToGetIP:
+                ipv4 = None
+            if ipv4 is None:
+                failures += 1
+            else:
+                samples.append(time.perf_counter() - started)
+    result = summarize(samples)
+    result['failure_rate'] = round(failures / iterations, 4)
+    return result
+
+
+def bench_parse(page_size:int, iterations:int) -> dict:
+    """
+    Measuring how fast the address is found in a downloaded page.
+
+    Parameters:
+        page_size (int): size of the generated pages;
+        iterations (int): pages parsed per site and way.
+
+    Returns:
+        dict: pages and megabytes per second of every site, "fast" - with
+            the byte pattern, "full" - with the BeautifulSoup parser only.
+    """
+    ip_search = GetMyIP()
+    results = {}
+    for site, parser_name, pattern in PARSERS:
+        page = fake_providers.make_page(site, ADDRESS, page_size)
+        parser = getattr(ip_search, parser_name)
+        assert str(ip_search.process_page(page, parser, pattern)) == ADDRESS
+        assert str(ip_search.process_page(page, parser)) == ADDRESS
+        fast = rate(lambda: ip_search.process_page(page, parser, pattern), iterations)
+        full = rate(lambda: ip_search.process_page(page, parser), iterations)
+        results[site] = {'page_bytes': len(page),
+                         'fast_pages_per_s': round(fast, 1),
+                         'fast_mb_per_s': round(fast * len(page) / 1e6, 3),
+                         'full_pages_per_s': round(full, 1),
+                         'full_mb_per_s': round(full * len(page) / 1e6, 3)}
+    return results
+
+
+def bench_run(iterations:int) -> dict:
+    """
+    Measuring IPAddressVerification.run.
+
+    Parameters:
+        iterations (int): calls per case.
+
+    Returns:
+        dict: calls per second for equal and different addresses.
+    """
+    same = IPAddressVerification(ADDRESS, ADDRESS)
+    different = IPAddressVerification('198.51.100.1', ADDRESS)
+    return {'match_ops_per_s': round(rate(same.run, iterations), 1),
+            'mismatch_ops_per_s': round(rate(different.run, iterations), 1)}
+
+
+def bench_proxies(count:int, concurrency:int, latency:Union[float, tuple],
+                  failure_rate:float, seed:int) -> dict:
+    """
+    Measuring the bulk proxy check. Every "proxy" of the stand-in exits
+    from its own loopback address, shown by a local plain text site.
+
+    Parameters:
+        count (int): number of proxies;
+        concurrency (int): proxies checked at once;
+        latency (float | tuple): delay of the site answers;
+        failure_rate (float): share of connections refused by the proxy;
+        seed (int): seed of the failures.
+
+    Returns:
+        dict: proxies per second, latency of the successful checks,
+            share of failed ones and the most connections open at once.
+    """
+    with fake_providers.FakeProviderServer(fake_providers.PLAIN, address=None,
+                                           latency=latency, seed=seed) as site, \
+            fake_providers.FakeProxyServer(failure_rate=failure_rate, seed=seed) as proxy_server:
+        proxies = [proxy_server.url(f'127.1.{number // 250}.{number % 250 + 1}')
+                   for number in range(count)]
+        checker = ProxyChecker(providers=[Provider('local', site.url)],
+                               concurrency=concurrency, timeout=10)
+        started = time.perf_counter()
+        results = list(checker.check(proxies))
+        elapsed = time.perf_counter() - started
+        peak = proxy_server.peak
+    result = summarize([result.latency for result in results if result.error is None])
+    result.update(proxies_per_s=round(count / elapsed, 1),
+                  failure_rate=round(sum(result.error is not None for result in results)
+                                     / count, 4),
+                  peak_connections=peak)
+    return result
+
+
+def parse_args(argv:Union[list[str], None] = None) -> argparse.Namespace:
+    """
+    Parameters:
+        argv (list | None): arguments without the program name.
+
+    Returns:
+        argparse.Namespace: parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description='Offline benchmarks of ip_checker.')
+    parser.add_argument('--output', metavar='FILE',
+                        help='write the JSON result to FILE instead of stdout')
+    parser.add_argument('--get-iterations', type=int, default=200)
+    parser.add_argument('--parse-iterations', type=int, default=200)
+    parser.add_argument('--run-iterations', type=int, default=20000)
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.0], metavar='SECONDS',
+                        help='answer delay of the local sites, or MIN MAX of a random delay')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='share of answers with the status 503')
+    parser.add_argument('--page-size', type=int, default=16 * 1024,
+                        help='size of the pages in bytes')
+    parser.add_argument('--https', action='store_true',
+                        help='serve the sites over HTTPS (needs the "openssl" command)')
+    parser.add_argument('--proxies', type=int, default=500,
+                        help='number of proxies of the bulk proxy check')
+    parser.add_argument('--proxy-concurrency', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', action='append', choices=('get', 'parse', 'run', 'proxies'),
+                        help='run only the given benchmarks, can be repeated')
+    args = parser.parse_args(argv)
+    if len(args.latency) > 2:
+        parser.error('--latency takes one value or MIN MAX')
+    return args
+
+
+def main(argv:Union[list[str], None] = None) -> int:
+    """
+    Running the benchmarks and writing the result.
+
+    Parameters:
+        argv (list | None): arguments without the program name.
+
+    Returns:
+        int: exit code.
+    """
+    args = parse_args(argv)
+    log_config.configure(file_level=None, console_level='CRITICAL')
+    latency = args.latency[0] if len(args.latency) == 1 else tuple(args.latency)
+    only = set(args.only or ('get', 'parse', 'run', 'proxies'))
+    results = {}
+    scheme = 'http'
+    if 'get' in only:
+        with fake_providers.FakeSites(https=args.https, address=ADDRESS, latency=latency,
+                                      failure_rate=args.failure_rate,
+                                      page_size=args.page_size, seed=args.seed) as sites:
+            if sites.ca_file is not None:
+                scheme = 'https'
+                os.environ['REQUESTS_CA_BUNDLE'] = sites.ca_file
+            results['get'] = {
+                    'sequential': bench_get(sites.urls(), False, args.get_iterations),
+                    'race': bench_get(sites.urls(), True, args.get_iterations)}
+            results['get']['requests_per_site'] = {
+                    server.site: server.requests for server in sites.servers}
+    if 'parse' in only:
+        results['parse'] = bench_parse(args.page_size, args.parse_iterations)
+    if 'run' in only:
+        results['run'] = bench_run(args.run_iterations)
+    if 'proxies' in only:
+        results['proxies'] = bench_proxies(args.proxies, args.proxy_concurrency, latency,
+                                           args.failure_rate, args.seed)
+    log_config.shutdown()
+    data = {'meta': {'timestamp': time.time(),
+                     'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'scheme': scheme,
+                     'latency_s': args.latency,
+                     'failure_rate': args.failure_rate,
+                     'page_size': args.page_size,
+                     'get_iterations': args.get_iterations,
+                     'parse_iterations': args.parse_iterations,
+                     'run_iterations': args.run_iterations,
+                     'proxies': args.proxies,
+                     'proxy_concurrency': args.proxy_concurrency},
+            'results': results}
+    text = json.dumps(data, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,32 +3,72 @@ Comparison of external external IPv4 addresses with another presented to
 compare with an IPv4 address.
 
 Author: Mikhail Gurov
-Last Modified: Feb 06, 2023
+Last Modified: Oct 16, 2026
 """
 #!/usr/bin/env python3.10
 # -- coding: utf-8 --
 
-from ipaddress import ip_address
-from typing import Union, NamedTuple
+from ipaddress import IPv6Address, ip_address
+from typing import Iterable, Union, NamedTuple
 from loguru import logger
-from find_ip import GetMyIP
+# Imported as a package (python -m ip_checker) or as scripts from this directory
+if __package__:
+    from .allowlist import Allowlist
+    from .ipv4 import IPv4
+else:
+    from allowlist import Allowlist
+    from ipv4 import IPv4
+
+# Error codes of "validate_batch"
+BATCH_OK = 0
+BATCH_NOT_STRING = 1 # data_type_check failed
+BATCH_NOT_IP = 2 # ipv4_type_check: not an IP address
+BATCH_NOT_IPV4 = 3 # ipv4_type_check: an IP address, but not IPv4
+
+# The longest dotted-quad string: "255.255.255.255"
+_MAX_IPV4_LENGTH = 15
+
+class BatchValidationResult(NamedTuple):
+    """
+    Description of the data returned by the "validate_batch" function.
 
-logger.add(
-        'check_ip.log.txt',
-        format='{time}, {level}, {module}:{line} -> {message}. {exception}',
-        level='ERROR',
-        rotation='10MB', compression='zip',
-        serialize=False,
-        )
+    addresses: numpy uint32 array, the packed address of every valid row (0 otherwise);
+    valid: numpy bool array, True for the rows holding an IPv4 address;
+    errors: numpy uint8 array, one of the BATCH_* codes per row.
+    """
+    addresses: 'np.ndarray'
+    valid: 'np.ndarray'
+    errors: 'np.ndarray'
 
 class IPComparisonResult(NamedTuple):
     """
     This class of descriptions for the type of data that should be obtained
-    as a result of the successful operation of the "run" method
+    as a result of the successful operation of the "run" method.
+    "matched" is the allowlist range containing the current address
+    (only when the comparison is made against an allowlist).
     """
     result: bool
     user_input: str
     current_ip: str
+    matched: Union[str, None] = None
+
+class DualStackComparisonResult(NamedTuple):
+    """
+    Description of the data returned by the "run_dual" method.
+    The first three fields have the same meaning as in IPComparisonResult:
+    "current_ip" is the current address of the same family as "user_input".
+    "result" is True only if it matches and no family leaks.
+    A family leaks if its current address is known and differs from
+    the expected one, or if no address of the family is expected at all
+    (the traffic of that family does not go through the VPN).
+    """
+    result: bool
+    user_input: str
+    current_ip: Union[str, None]
+    current_ipv4: Union[str, None]
+    current_ipv6: Union[str, None]
+    ipv4_leak: bool
+    ipv6_leak: bool
 
 class IPAddressVerification():
     """
@@ -41,11 +81,23 @@ class IPAddressVerification():
          data_normalization: string normalization;
          data_type_check: data check for page data check;
          comparison_ipv4: compare IPv4 addresses;
-         run: Run a process method.
+         comparison_allowlist: find the current address in the allowlist;
+         comparison_ipv6: compare IPv6 addresses;
+         run: Run a process method;
+         run_allowlist: Run a process method for the allowlist;
+         run_dual: Run a process method for both IPv4 and IPv6.
 
      Class level variables:
          self.user_input: string from the user suspected IPv4 address;
-         self.current_ip: the device's current external IPv4 address.
+         self.current_ip: the device's current external IPv4 address;
+         self.allowlist: Allowlist of addresses and CIDR ranges. If it is
+             given, the current address is checked against it instead of
+             being compared with "user_input";
+         self.current_ipv6: the device's current external IPv6 address,
+             None if the device has no IPv6 route;
+         self.expected_ipv6: the IPv6 address expected while the VPN is
+             active, None if the VPN carries only IPv4 (then any current
+             IPv6 address is a leak). Used by "run_dual".
 
      Exceptions:
          In developing.
@@ -57,14 +109,19 @@ class IPAddressVerification():
 
     def __init__(self,
             user_input:str = '127.0.0.1',
-            current_ip:str = '127.0.0.1'):
+            current_ip:str = '127.0.0.1',
+            allowlist:Union[Allowlist, None] = None,
+            current_ipv6:Union[str, None] = None,
+            expected_ipv6:Union[str, None] = None):
         """
         """
         self.user_input = user_input
         self.current_ip = current_ip
+        self.allowlist = allowlist
+        self.current_ipv6 = current_ipv6
+        self.expected_ipv6 = expected_ipv6
 
 
-    @logger.catch
     def ipv4_type_check(self, ipv4_to_check:str) -> Union[bool, None]:
         """
         Checking if the contents of a string is an IPv4 address.
@@ -76,22 +133,23 @@ class IPAddressVerification():
             bool: True if ipv4_to_check is IPv4 address;
             None: if any error occurred.
         """
+        if IPv4.parse(ipv4_to_check) is not None:
+            return True # Fast path, no exception for an IPv4 address
         try:
             ipv4 = ip_address(ipv4_to_check)
         except ValueError as exc:
-            logger.warning(f'Variable does not contain an IP address.\
-                    Value: {ipv4_to_check}. {exc}')
+            logger.warning('Variable does not contain an IP address. Value: {}. {}',
+                           ipv4_to_check, exc)
             return None
         try:
             if ipv4.version == 4:
                 return True
         except AttributeError as exc:
-            logger.error(f'The variable does not contain an IPv4 address. Value: {ipv4}. {exc}')
+            logger.error('The variable does not contain an IPv4 address. Value: {}. {}', ipv4, exc)
             return None
         return False
 
 
-    @logger.catch
     def data_normalization(self, user_string:str) -> Union[str, None]:
         """
         Attempt to normalize user input. An IPv4 address is expected,
@@ -110,14 +168,13 @@ class IPAddressVerification():
         """
         #if type(user_string) is not str:
         if not isinstance(user_string, str):
-            logger.error(f'The data from the user is not a string. Value: {user_string}')
+            logger.error('The data from the user is not a string. Value: {}', user_string)
             return None
         user_string_strip =  user_string.strip()
         normalized_input = user_string_strip.replace(',', '.')
         return normalized_input
 
 
-    @logger.catch
     def data_type_check(self, user_input: Union[str, int, float]) -> Union[str, None]:
         """
         Checking if the information received by the module is a string.
@@ -137,33 +194,73 @@ class IPAddressVerification():
             user_input = str(user_input)
             return user_input
         except TypeError as exc:
-            logger.error(f'An attempt to create a string from a user variable failed. {exc}')
+            logger.error('An attempt to create a string from a user variable failed. {}', exc)
             return None
 
 
-    @logger.catch
     def comparison_ipv4(self, current_ipv4_address:str, ipv4_to_check:str) -> Union[bool, None]:
         """
         This method is responsible for comparing the user input
         IPv4 address with the current external IPv4 address.
+        The addresses are compared as numbers, the values that are not
+        IPv4 addresses are compared as strings.
 
         Parameters:
-            current_ipv4_address (str): current IPv4 address;
-            ipv4_to_check (str): IPv4 address to compare against.
+            current_ipv4_address (str | IPv4): current IPv4 address;
+            ipv4_to_check (str | IPv4): IPv4 address to compare against.
 
         Returns:
             bool: True if a match;
             None: if any error occurred.
         """
+        current_ipv4 = IPv4.parse(current_ipv4_address)
+        ipv4 = IPv4.parse(ipv4_to_check)
+        if current_ipv4 is not None and ipv4 is not None:
+            return current_ipv4 == ipv4
         try:
             if current_ipv4_address == ipv4_to_check:
                 return True
             return False
         except TypeError as exc:
-            logger.error(f'Failed to compare variables. {exc}')
+            logger.error('Failed to compare variables. {}', exc)
             return None
 
 
+    def comparison_ipv6(self, current_ipv6_address:str, ipv6_to_check:str) -> Union[bool, None]:
+        """
+        Comparing two IPv6 addresses. The addresses are compared as numbers,
+        so different spellings of the same address ("2001:db8::1" and
+        "2001:0db8:0:0:0:0:0:1") are equal.
+
+        Parameters:
+            current_ipv6_address (str): current IPv6 address;
+            ipv6_to_check (str): IPv6 address to compare against.
+
+        Returns:
+            bool: True if a match;
+            None: if any error occurred.
+        """
+        try:
+            return IPv6Address(current_ipv6_address) == IPv6Address(ipv6_to_check)
+        except ValueError as exc:
+            logger.warning('Failed to compare IPv6 addresses. {}', exc)
+            return None
+
+
+    def comparison_allowlist(self, current_ipv4_address:str) -> Union[str, None]:
+        """
+        Finding the current external IPv4 address in the allowlist.
+
+        Parameters:
+            current_ipv4_address (str): current IPv4 address.
+
+        Returns:
+            str: the most specific range containing the address;
+            None: the address is not in the allowlist.
+        """
+        return self.allowlist.lookup(current_ipv4_address)
+
+
     @logger.catch
     def run(self) -> Union[IPComparisonResult, None]:
         """
@@ -178,6 +275,8 @@ class IPAddressVerification():
                 current_ip: str
             None: if any error occurred.
         """
+        if self.allowlist is not None:
+            return self.run_allowlist()
         current_ip = self.data_type_check(self.current_ip)
         user_input = self.data_type_check(self.user_input)
         if user_input is None or current_ip is None:
@@ -207,7 +306,190 @@ class IPAddressVerification():
                 current_ip = normalized_current_ip
                 )
 
+    @logger.catch
+    def run_allowlist(self) -> Union[IPComparisonResult, None]:
+        """
+        The same as "run", but the current address is looked up in
+        the allowlist. "result" is True if any range contains it.
+
+        Returns:
+            class: IPComparisonResult with the "matched" range;
+            None: if any error occurred.
+        """
+        current_ip = self.data_type_check(self.current_ip)
+        if current_ip is None:
+            logger.warning('Method (data_type_check) returned None')
+            return None
+        normalized_current_ip = self.data_normalization(current_ip)
+        if normalized_current_ip is None:
+            logger.warning('Method (data_normalization) returned None')
+            return None
+        if self.ipv4_type_check(normalized_current_ip) is not True:
+            return None
+        matched = self.comparison_allowlist(normalized_current_ip)
+        return IPComparisonResult(
+                result = matched is not None,
+                user_input = str(self.user_input),
+                current_ip = normalized_current_ip,
+                matched = matched
+                )
+
+    @logger.catch
+    def run_dual(self) -> Union[DualStackComparisonResult, None]:
+        """
+        The same as "run", but both address families are checked, so
+        that an IPv6 leak is not missed. "user_input" may be an IPv4
+        or an IPv6 address; an IPv6 "user_input" replaces "expected_ipv6".
+        "current_ip" and "current_ipv6" may be None when the address
+        of the family could not be obtained.
+
+        Returns:
+            class: DualStackComparisonResult;
+            None: if any error occurred.
+        """
+        user_input = self.data_type_check(self.user_input)
+        if user_input is None:
+            logger.warning('Method (data_type_check) returned None')
+            return None
+        normalized_user_input = self.data_normalization(user_input)
+        if normalized_user_input is None:
+            logger.warning('Method (data_normalization) returned None')
+            return None
+        user_input_family = self.ipv4_type_check(normalized_user_input)
+        if user_input_family is None:
+            return None
+        expected = {4: None, 6: self.expected_ipv6}
+        expected[4 if user_input_family else 6] = normalized_user_input
+        current = {4: None, 6: None}
+        if self.current_ip is not None:
+            current[4] = self.data_normalization(self.data_type_check(self.current_ip))
+        if self.current_ipv6 is not None:
+            current[6] = self.data_normalization(self.data_type_check(self.current_ipv6))
+
+        leaks = {}
+        for family, compare in ((4, self.comparison_ipv4), (6, self.comparison_ipv6)):
+            if current[family] is None:
+                leaks[family] = False # No address of the family - nothing can leak
+            elif expected[family] is None:
+                leaks[family] = True
+            else:
+                leaks[family] = compare(current[family], expected[family]) is not True
+            if leaks[family]:
+                logger.warning('IPv{} leak: the current address is {}', family, current[family])
+
+        family = 4 if user_input_family else 6
+        matched = current[family] is not None and not leaks[family]
+        return DualStackComparisonResult(
+                result = matched and not leaks[4] and not leaks[6],
+                user_input = normalized_user_input,
+                current_ip = current[family],
+                current_ipv4 = current[4],
+                current_ipv6 = current[6],
+                ipv4_leak = leaks[4],
+                ipv6_leak = leaks[6]
+                )
+
+def validate_batch(user_inputs:Iterable[Union[str, int, float]]) -> BatchValidationResult:
+    """
+    Vectorised version of the "data_type_check" -> "data_normalization" ->
+    "ipv4_type_check" chain of IPAddressVerification for many rows at once.
+    The rows are stripped, commas are replaced with dots, and the dotted
+    quads are parsed with NumPy array operations over a matrix of
+    characters, without a Python call per row. The rules are the same as
+    in "ipv4_type_check": four decimal octets from 0 to 255 without
+    leading zeros. Only rows that look like IPv6 are passed to "ipaddress"
+    to tell BATCH_NOT_IPV4 from BATCH_NOT_IP.
+
+    Parameters:
+        user_inputs (Iterable): strings (or values converted with str),
+            for example a list or a NumPy string array.
+
+    Returns:
+        BatchValidationResult: packed addresses, validity mask and error codes.
+
+    Exceptions:
+        ImportError: NumPy is not installed.
+    """
+    try:
+        import numpy as np # Optional dependency, imported only when needed
+    except ImportError as exc:
+        raise ImportError('validate_batch needs NumPy: pip install numpy') from exc
+    not_string = []
+    if isinstance(user_inputs, np.ndarray) and user_inputs.dtype.kind == 'U':
+        strings = user_inputs.ravel()
+    else:
+        # data_type_check
+        values = []
+        for index, value in enumerate(user_inputs):
+            if not isinstance(value, str):
+                try:
+                    value = str(value)
+                except TypeError:
+                    not_string.append(index)
+                    value = ''
+            values.append(value)
+        strings = np.array(values, dtype=str)
+    rows = len(strings)
+    errors = np.full(rows, BATCH_NOT_IP, dtype=np.uint8)
+    errors[not_string] = BATCH_NOT_STRING
+    if rows == 0:
+        return BatchValidationResult(np.zeros(0, np.uint32), np.zeros(0, bool), errors)
+
+    # data_normalization
+    normalized = np.char.replace(np.char.strip(strings), ',', '.')
+    lengths = np.char.str_len(normalized)
+
+    # Matrix of code points, one row per string, zero padded
+    width = max(normalized.dtype.itemsize // 4, 1)
+    chars = np.ascontiguousarray(normalized).view(np.uint32).reshape(rows, width)
+    if width < _MAX_IPV4_LENGTH:
+        chars = np.pad(chars, ((0, 0), (0, _MAX_IPV4_LENGTH - width)))
+    chars = chars[:, :_MAX_IPV4_LENGTH]
+
+    is_digit = (chars >= ord('0')) & (chars <= ord('9'))
+    is_dot = chars == ord('.')
+    allowed = is_digit | is_dot | (chars == 0)
+    candidate = ((lengths > 0) & (lengths <= _MAX_IPV4_LENGTH)
+                 & allowed.all(axis=1) & (is_dot.sum(axis=1) == 3))
+
+    # Octet values and lengths, accumulated column by column
+    field = np.cumsum(is_dot, axis=1)
+    field[field > 3] = 3
+    octets = np.zeros((rows, 4), dtype=np.int64)
+    octet_lengths = np.zeros((rows, 4), dtype=np.int64)
+    row_index = np.arange(rows)
+    digits = chars.astype(np.int64) - ord('0')
+    for column in range(_MAX_IPV4_LENGTH):
+        has_digit = is_digit[:, column]
+        target = field[:, column]
+        update = row_index[has_digit]
+        octets[update, target[has_digit]] = (octets[update, target[has_digit]] * 10
+                                             + digits[update, column])
+        octet_lengths[update, target[has_digit]] += 1
+
+    leading_zero = (octet_lengths > 1) & (octets < 10 ** np.maximum(octet_lengths - 1, 0))
+    valid = (candidate & ((octet_lengths >= 1) & (octet_lengths <= 3)).all(axis=1)
+             & (octets <= 255).all(axis=1) & ~leading_zero.any(axis=1))
+
+    packed = ((octets[:, 0] << 24) | (octets[:, 1] << 16)
+              | (octets[:, 2] << 8) | octets[:, 3]).astype(np.uint32)
+    packed[~valid] = 0
+    errors[valid] = BATCH_OK
+
+    # Rows with a colon may be IPv6 addresses: rare, checked one by one
+    maybe_ipv6 = np.flatnonzero(~valid & (np.char.find(normalized, ':') >= 0))
+    for index in maybe_ipv6:
+        try:
+            if ip_address(str(normalized[index])).version == 6:
+                errors[index] = BATCH_NOT_IPV4
+        except ValueError:
+            pass
+    return BatchValidationResult(packed, valid, errors)
+
 if __name__ == '__main__':
+    import log_config
+    from find_ip import GetMyIP
+    log_config.configure()
     string_input_from_user = input('Enter the IPv4 to compare: ')
     ip = GetMyIP()
     CURRENT_EXTERNAL_IP = str(ip.get())
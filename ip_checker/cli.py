@@ -0,0 +1,245 @@
+"""
+Command line interface without the window, for shell prompts and cron:
+
+    python -m ip_checker                  # prints the current external IPv4 address
+    python -m ip_checker 203.0.113.5      # compares it with the expected address
+    python -m ip_checker 203.0.113.5 --json --max-age 60
+    python -m ip_checker --deadline 0.8   # answers or gives up within 800 ms
+    python -m ip_checker 2001:db8::5      # an IPv6 address turns on "--dual"
+
+The module imports only the standard library, "ipv4" and "state" at
+start. The lookup modules (requests, bs4, loguru) are imported only when
+the providers really have to be asked, so a check answered from the
+state file ("--max-age") does not pay for them. If the address can not
+be obtained, the last known one is reported, marked as stale.
+
+Exit codes:
+    0 - the address matches (or the current address was printed);
+    1 - the address does not match, or an address leaks ("--dual");
+    2 - invalid arguments;
+    3 - the current address could not be obtained.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import argparse
+import json
+import sys
+import time
+from typing import Union
+# Imported as a package (python -m ip_checker) or as scripts from this directory
+if __package__:
+    from .ipv4 import IPv4
+    from .state import StateFile
+else:
+    from ipv4 import IPv4
+    from state import StateFile
+
+EXIT_OK = 0
+EXIT_MISMATCH = 1
+EXIT_USAGE = 2
+EXIT_LOOKUP_FAILED = 3
+
+
+def parse_args(argv:Union[list[str], None] = None) -> argparse.Namespace:
+    """
+    Parameters:
+        argv (list | None): arguments without the program name, sys.argv by default.
+
+    Returns:
+        argparse.Namespace: parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+            prog='python -m ip_checker',
+            description='Printing the external IP address or comparing it with '
+                        'the expected one (the address of the VPN server).')
+    parser.add_argument('expected', nargs='?',
+                        help='expected address; without it the current address is printed')
+    parser.add_argument('--json', action='store_true', help='machine-readable output')
+    parser.add_argument('--max-age', type=float, default=0, metavar='SECONDS',
+                        help='reuse an address obtained less than SECONDS ago '
+                             '(state file, shared between runs)')
+    parser.add_argument('--backend', action='append', choices=('http', 'dns', 'stun'),
+                        help='way of getting the address, can be repeated (default: http)')
+    parser.add_argument('--race', action='store_true',
+                        help='ask the providers in parallel')
+    parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                        help='give up the lookup after SECONDS, the providers share the time')
+    parser.add_argument('--dual', action='store_true',
+                        help='also get the IPv6 address and report leaks '
+                             '(turned on by an IPv6 expected address)')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='show the log messages of the lookup')
+    args = parser.parse_args(argv)
+    if args.deadline is not None and args.deadline <= 0:
+        parser.error('--deadline must be positive')
+    if args.expected is not None and ':' in args.expected:
+        # Only an IPv6 address has colons, it is compared by the dual path
+        args.dual = True
+    return args
+
+
+def read_cache(max_age:float) -> Union[dict, None]:
+    """
+    Reading the address saved by a previous run in the state file.
+
+    Parameters:
+        max_age (float): the oldest acceptable answer, in seconds.
+
+    Returns:
+        dict: "ipv4" and "obtained_at" (time.time) of the saved answer;
+        None: no address saved or an answer older than "max_age".
+    """
+    last = StateFile().read_last()
+    if last is None or not 0 <= time.time() - last.obtained_at <= max_age:
+        return None
+    return {'ipv4': str(last.ipv4), 'obtained_at': last.obtained_at}
+
+
+def lookup(args:argparse.Namespace) -> dict:
+    """
+    Asking the providers. The heavy modules are imported here.
+    The answer and the provider statistics are saved to the state file.
+
+    Parameters:
+        args (argparse.Namespace): parsed arguments.
+
+    Returns:
+        dict: "ipv4", "ipv6" (with "--dual") and "obtained_at".
+
+    Exceptions:
+        LookupError: no address could be obtained.
+    """
+    if __package__:
+        from . import log_config
+        from .find_ip import GetMyIP, FailedToGetIP
+    else:
+        import log_config
+        from find_ip import GetMyIP, FailedToGetIP
+    log_config.configure(console_level='INFO' if args.verbose else 'CRITICAL')
+    try:
+        with GetMyIP(race=args.race, backends=args.backend or ('http',),
+                     state_file=StateFile(), deadline=args.deadline) as ip_search:
+            if args.dual:
+                addresses = ip_search.get_dual()
+                if addresses.ipv4 is None and addresses.ipv6 is None:
+                    raise LookupError('Neither the IPv4 nor the IPv6 address was obtained')
+                return {'ipv4': None if addresses.ipv4 is None else str(addresses.ipv4),
+                        'ipv6': None if addresses.ipv6 is None else str(addresses.ipv6),
+                        'obtained_at': time.time()}
+            result = ip_search.lookup()
+            return {'ipv4': str(result.ipv4), 'obtained_at': result.obtained_at}
+    except FailedToGetIP as exc:
+        raise LookupError(str(exc)) from exc
+    finally:
+        log_config.shutdown()
+
+
+def compare(expected:str, current:dict, dual:bool) -> Union[dict, None]:
+    """
+    Comparing the expected address with the current one. The usual
+    IPv4 comparison is done with the "ipv4" module only, the same rules
+    as in IPAddressVerification (spaces and commas are tolerated).
+    With "dual" IPAddressVerification.run_dual is used.
+
+    Parameters:
+        expected (str): the address given by the user;
+        current (dict): the result of "lookup" or of the cache;
+        dual (bool): compare both address families.
+
+    Returns:
+        dict: "match" and, with "dual", "ipv4_leak" and "ipv6_leak";
+        None: "expected" is not an IP address.
+    """
+    if dual:
+        if __package__:
+            from .check_ip import IPAddressVerification
+        else:
+            from check_ip import IPAddressVerification
+        result = IPAddressVerification(expected, current['ipv4'],
+                                       current_ipv6=current.get('ipv6')).run_dual()
+        if result is None:
+            return None
+        return {'match': result.result, 'ipv4_leak': result.ipv4_leak,
+                'ipv6_leak': result.ipv6_leak}
+    expected_ipv4 = IPv4.parse(expected.strip().replace(',', '.'))
+    if expected_ipv4 is None:
+        return None
+    return {'match': expected_ipv4 == IPv4.parse(current['ipv4'])}
+
+
+def report(data:dict, as_json:bool) -> None:
+    """
+    Printing the result.
+
+    Parameters:
+        data (dict): fields of the result;
+        as_json (bool): print one JSON object instead of text.
+    """
+    if as_json:
+        print(json.dumps(data))
+        return
+    if 'error' in data:
+        print(f'Error: {data["error"]}', file=sys.stderr)
+        if data.get('stale'):
+            age = max(time.time() - data['obtained_at'], 0)
+            print(f'Last known address: {data["ipv4"]} (stale, {age:.0f} s old)')
+        return
+    current = data['ipv4'] if data.get('ipv6') is None else f'{data["ipv4"]}, {data["ipv6"]}'
+    if 'match' not in data:
+        print(current)
+    elif data['match']:
+        print(f'VPN active: {data["expected"]} = {current}')
+    else:
+        print(f'VPN not active: {data["expected"]} ≠ {current}')
+    leaks = [data[family] for family in ('ipv4', 'ipv6') if data.get(f'{family}_leak')]
+    if leaks:
+        print(f'Leak: {", ".join(leaks)}')
+
+
+def main(argv:Union[list[str], None] = None) -> int:
+    """
+    Running the command line interface.
+
+    Parameters:
+        argv (list | None): arguments without the program name.
+
+    Returns:
+        int: exit code (see the module description).
+    """
+    args = parse_args(argv)
+    current = None
+    if args.max_age > 0 and not args.dual:
+        current = read_cache(args.max_age)
+    cached = current is not None
+    if current is None:
+        try:
+            current = lookup(args)
+        except LookupError as exc:
+            data = {'error': str(exc)}
+            last = StateFile().read_last()
+            if last is not None:
+                data.update(ipv4=str(last.ipv4), obtained_at=last.obtained_at, stale=True)
+            report(data, args.json)
+            return EXIT_LOOKUP_FAILED
+    data = {'ipv4': current['ipv4'], 'cached': cached, 'obtained_at': current['obtained_at']}
+    if args.dual:
+        data['ipv6'] = current.get('ipv6')
+    if args.expected is None:
+        report(data, args.json)
+        return EXIT_OK
+    comparison = compare(args.expected, current, args.dual)
+    if comparison is None:
+        report({'error': f'Not an IP address: {args.expected}'}, args.json)
+        return EXIT_USAGE
+    data['expected'] = args.expected.strip()
+    data.update(comparison)
+    report(data, args.json)
+    return EXIT_OK if data['match'] else EXIT_MISMATCH
+
+
+if __name__ == '__main__':
+    sys.exit(main())
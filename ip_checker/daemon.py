@@ -0,0 +1,362 @@
+"""
+Status daemon for hosts where many users and scripts need the external
+address: one process owns the lookup loop and answers everyone from
+memory, so the providers are asked once per interval instead of once
+per script. The status is served over a Unix socket and/or a loopback
+TCP port with plain HTTP/1.1, by one asyncio event loop (no thread per
+connection, keep-alive connections are supported):
+
+    python daemon.py --unix /tmp/ip_checker.sock --port 8765 --expected 203.0.113.5
+
+    curl --unix-socket /tmp/ip_checker.sock http://localhost/status
+    curl 'http://127.0.0.1:8765/status?expected=203.0.113.5'
+
+The answer is a JSON object: "ipv4", "obtained_at", "age" (seconds),
+"checks", "error" (of the last lookup, or null) and, when an expected
+address is given (by the query or "--expected"), "expected" and "match"
+(IPAddressVerification.run).
+
+With "--watch-network" (Linux) the address is also checked as soon as the
+network changes - a VPN interface going down, the default route moving -
+instead of waiting for the next interval (see the "network_watch" module).
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Union
+from urllib.parse import parse_qs, urlsplit
+from loguru import logger
+from find_ip import GetMyIP, FailedToGetIP
+from check_ip import IPAddressVerification
+from netlink import NetlinkEventSource
+from network_watch import NetworkCheckResult, NetworkWatcher
+
+STATUS_PATHS = ('/', '/status')
+# Size limit of the request line and of every header line
+MAX_LINE = 8 * 1024
+# Connections without a request for this long are closed (seconds)
+IDLE_TIMEOUT = 60.0
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class StatusDaemon():
+    """
+    The lookup loop and the status server.
+
+    Methods:
+        __init__: class initialization;
+        start: starting the lookup loop and the listeners;
+        close: stopping them;
+        serve_forever: "start" and waiting until cancelled;
+        refresh: one lookup, updating the status;
+        on_network_check: updating the status with a check made after a network change;
+        status: the status for an expected address;
+        handle_connection: serving the requests of one client connection.
+
+    Class level variables:
+        self.ip_search: GetMyIP instance of the lookup loop;
+        self.expected_ip: expected address used when a request gives none;
+        self.interval: seconds between the lookups;
+        self.watcher: NetworkWatcher re-checking on network changes, or None;
+        self.unix_path: path of the Unix socket or None;
+        self.host, self.port: TCP address or None. Port 0 - any free port,
+            the real one is in "self.port" after "start";
+        self.ipv4, self.obtained_at, self.error: result of the last lookup;
+        self.checks: number of lookups made;
+        self.requests: number of status requests served.
+    """
+
+    def __init__(self, ip_search:GetMyIP|None = None, expected_ip:str|None = None,
+                 interval:float = 60.0, unix_path:str|None = None,
+                 host:str = '127.0.0.1', port:int|None = None,
+                 max_comparisons:int = 1024, watch_network:bool = False,
+                 event_source:NetlinkEventSource|None = None, debounce:float = 0.5):
+        """
+        Parameters:
+            ip_search (GetMyIP | None): instance used for the lookups;
+            expected_ip (str | None): the default expected address;
+            interval (float): seconds between the lookups;
+            unix_path (str | None): path of the Unix socket;
+            host (str): address of the TCP listener, loopback by default;
+            port (int | None): port of the TCP listener, None - no TCP listener;
+            max_comparisons (int): how many comparison results (one per
+                expected address) are kept until the address changes;
+            watch_network (bool): also check the address when the network
+                changes (rtnetlink, Linux only);
+            event_source (NetlinkEventSource | None): source of the network
+                events, rtnetlink by default;
+            debounce (float): seconds without network events before the check.
+        """
+        if unix_path is None and port is None:
+            raise ValueError('At least one of unix_path and port is required')
+        if interval <= 0:
+            raise ValueError(f'interval must be positive. Value: {interval}')
+        self.ip_search = ip_search if ip_search is not None else GetMyIP()
+        self.expected_ip = expected_ip
+        self.interval = interval
+        self.unix_path = unix_path
+        self.host = host
+        self.port = port
+        self.max_comparisons = max_comparisons
+        self.ipv4: str | None = None
+        self.obtained_at: float | None = None
+        self.error: str | None = None
+        self.checks = 0
+        self.requests = 0
+        self._comparisons: dict[str, Union[bool, None]] = {}
+        self._servers: list[asyncio.AbstractServer] = []
+        self._loop_task: asyncio.Task | None = None
+        self._first_lookup: asyncio.Event | None = None
+        self.watcher = None
+        if watch_network:
+            self.watcher = NetworkWatcher(self.ip_search, expected_ip, source=event_source,
+                                          debounce=debounce, on_check=self.on_network_check)
+        self._watch_task: asyncio.Task | None = None
+
+    async def refresh(self) -> None:
+        """
+        Asking the providers and updating the status. A failed lookup
+        keeps the previous address, only "error" is set.
+        """
+        self.ip_search.invalidate()
+        try:
+            result = await self.ip_search.alookup()
+        except FailedToGetIP as exc:
+            logger.warning('The daemon could not get the external IP: {}', exc)
+            self.error = str(exc)
+        else:
+            self._set_address(str(result.ipv4), result.obtained_at)
+        self.checks += 1
+
+    def on_network_check(self, check:NetworkCheckResult) -> None:
+        """
+        Updating the status with the check made by "watcher" after
+        a network change, without waiting for the next interval.
+
+        Parameters:
+            check (NetworkCheckResult): the check.
+        """
+        if check.ipv4 is None:
+            self.error = check.error
+        else:
+            self._set_address(str(check.ipv4), check.checked_at)
+        self.checks += 1
+
+    def _set_address(self, ipv4:str, obtained_at:float) -> None:
+        if ipv4 != self.ipv4:
+            logger.info('The external IP is now {}', ipv4)
+            self._comparisons.clear()
+        self.ipv4 = ipv4
+        self.obtained_at = obtained_at
+        self.error = None
+
+    async def _watch_network(self) -> None:
+        try:
+            await self.watcher.run()
+        except OSError as exc:
+            logger.warning('Network changes can not be watched, only the interval '
+                           'is used: {}', exc)
+
+    async def _lookup_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as exc:
+                logger.error('An unknown error was found in the lookup loop: {}', exc)
+            self._first_lookup.set()
+            await asyncio.sleep(self.interval)
+
+    def compare(self, expected:str) -> Union[bool, None]:
+        """
+        Comparing the current address with an expected one. The result
+        is kept until the address changes, so a popular expected address
+        is compared once per change, not once per request.
+
+        Parameters:
+            expected (str): the expected address.
+
+        Returns:
+            bool: True if the addresses match;
+            None: no current address or "expected" is not an address.
+        """
+        if self.ipv4 is None:
+            return None
+        if expected in self._comparisons:
+            return self._comparisons[expected]
+        result = IPAddressVerification(expected, self.ipv4).run()
+        match = None if result is None else result.result
+        if len(self._comparisons) >= self.max_comparisons:
+            self._comparisons.clear()
+        self._comparisons[expected] = match
+        return match
+
+    def status(self, expected:str|None = None) -> dict:
+        """
+        Parameters:
+            expected (str | None): the expected address, "expected_ip" by default.
+
+        Returns:
+            dict: the fields of the answer (see the module description).
+        """
+        self.requests += 1
+        data = {'ipv4': self.ipv4, 'obtained_at': self.obtained_at,
+                'age': None if self.obtained_at is None
+                       else round(max(time.time() - self.obtained_at, 0.0), 3),
+                'checks': self.checks, 'error': self.error}
+        if expected is None:
+            expected = self.expected_ip
+        if expected is not None:
+            data['expected'] = expected
+            data['match'] = self.compare(expected)
+        return data
+
+    def _answer(self, method:str, target:str) -> tuple[int, dict]:
+        if method not in ('GET', 'HEAD'):
+            return 405, {'error': f'Method {method} is not allowed'}
+        parts = urlsplit(target)
+        if parts.path not in STATUS_PATHS:
+            return 404, {'error': f'Unknown path {parts.path}'}
+        expected = parse_qs(parts.query).get('expected')
+        return 200, self.status(None if expected is None else expected[0])
+
+    async def handle_connection(self, reader:asyncio.StreamReader,
+                                writer:asyncio.StreamWriter) -> None:
+        """
+        Serving the HTTP requests of one connection until the client
+        closes it, asks to close it or stays idle for IDLE_TIMEOUT seconds.
+
+        Parameters:
+            reader, writer: streams of the connection.
+        """
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                if not request_line:
+                    break
+                keep_alive = request_line.rstrip().endswith(b'HTTP/1.1')
+                while True: # The headers, only "Connection" matters
+                    line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.partition(b':')
+                    if name.strip().lower() == b'connection':
+                        value = value.strip().lower()
+                        if value == b'close':
+                            keep_alive = False
+                        elif value == b'keep-alive':
+                            keep_alive = True
+                try:
+                    method, target, _ = request_line.decode('latin-1').split()
+                    status_code, data = self._answer(method, target)
+                except ValueError:
+                    status_code, data, method = 400, {'error': 'Malformed request'}, 'GET'
+                    keep_alive = False
+                body = json.dumps(data).encode()
+                writer.write(
+                        (f'HTTP/1.1 {status_code} {_REASONS[status_code]}\r\n'
+                         'Content-Type: application/json\r\n'
+                         f'Content-Length: {len(body)}\r\n'
+                         f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+                         ).encode('latin-1') + (b'' if method == 'HEAD' else body))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.LimitOverrunError, ValueError,
+                ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, wait_for_lookup:bool = False) -> None:
+        """
+        Starting the lookup loop and the listeners.
+
+        Parameters:
+            wait_for_lookup (bool): return only after the first lookup is over.
+        """
+        self._first_lookup = asyncio.Event()
+        self._loop_task = asyncio.ensure_future(self._lookup_loop())
+        if self.watcher is not None:
+            self._watch_task = asyncio.ensure_future(self._watch_network())
+        if self.unix_path is not None:
+            if os.path.exists(self.unix_path):
+                os.remove(self.unix_path) # Left by a daemon that was killed
+            self._servers.append(await asyncio.start_unix_server(
+                    self.handle_connection, self.unix_path, limit=MAX_LINE))
+            logger.info('The daemon listens on {}', self.unix_path)
+        if self.port is not None:
+            server = await asyncio.start_server(self.handle_connection, self.host,
+                                                self.port, limit=MAX_LINE)
+            self.port = server.sockets[0].getsockname()[1]
+            self._servers.append(server)
+            logger.info('The daemon listens on {}:{}', self.host, self.port)
+        if wait_for_lookup:
+            await self._first_lookup.wait()
+
+    async def close(self) -> None:
+        """
+        Stopping the listeners and the lookup loop.
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
+        self.ip_search.close()
+
+    async def serve_forever(self) -> None:
+        """
+        Running the daemon until the task is cancelled.
+        """
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serving the external IP address '
+                                                 'to local clients.')
+    parser.add_argument('--unix', metavar='PATH', help='path of the Unix socket')
+    parser.add_argument('--port', type=int, help='port of the loopback HTTP listener')
+    parser.add_argument('--host', default='127.0.0.1', help='address of the HTTP listener')
+    parser.add_argument('--expected', help='expected address (the VPN server)')
+    parser.add_argument('--interval', type=float, default=60.0,
+                        help='seconds between the lookups')
+    parser.add_argument('--watch-network', action='store_true',
+                        help='also check the address when the network changes (Linux)')
+    args = parser.parse_args()
+    if args.unix is None and args.port is None:
+        parser.error('--unix or --port is required')
+    import log_config
+    log_config.configure()
+    daemon = StatusDaemon(expected_ip=args.expected, interval=args.interval,
+                          unix_path=args.unix, host=args.host, port=args.port,
+                          watch_network=args.watch_network)
+    try:
+        asyncio.run(daemon.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log_config.shutdown()
+    sys.exit(0)
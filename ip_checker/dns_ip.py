@@ -0,0 +1,261 @@
+"""
+Getting the external IPv4 address with one UDP DNS query.
+Some DNS servers answer a special name with the address the query
+came from (an A or a TXT record). The module contains a minimal
+encoder and decoder of the DNS wire format, so no extra library is needed.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import random
+import socket
+import struct
+from typing import NamedTuple, Union
+# Imported as a package (python -m ip_checker) or as scripts from this directory
+if __package__:
+    from . import udp_request
+else:
+    import udp_request
+
+TYPE_A = 1
+TYPE_TXT = 16
+CLASS_IN = 1
+CLASS_CH = 3
+
+_HEADER = struct.Struct('!HHHHHH')
+_QUESTION = struct.Struct('!HH')
+_RECORD = struct.Struct('!HHIH')
+
+
+class DNSError(ValueError):
+    """
+    This exception is raised if a DNS answer is malformed or reports an error.
+    """
+
+
+class DNSResolver(NamedTuple):
+    """
+    Description of a DNS server that answers "what is my IP" queries.
+
+    name: name used in the health statistics;
+    server: IPv4 address of the DNS server;
+    qname: name to ask for;
+    qtype: TYPE_A or TYPE_TXT;
+    qclass: CLASS_IN or CLASS_CH;
+    port: UDP port of the server.
+    """
+    name: str
+    server: str
+    qname: str
+    qtype: int = TYPE_A
+    qclass: int = CLASS_IN
+    port: int = 53
+
+
+DEFAULT_RESOLVERS = (
+        DNSResolver('opendns', '208.67.222.222', 'myip.opendns.com', TYPE_A),
+        DNSResolver('google', '216.239.32.10', 'o-o.myaddr.l.google.com', TYPE_TXT),
+        DNSResolver('cloudflare', '1.1.1.1', 'whoami.cloudflare', TYPE_TXT, CLASS_CH),
+        )
+
+
+def encode_name(name:str) -> bytes:
+    """
+    Encoding a domain name as a sequence of labels.
+
+    Parameters:
+        name (str): domain name, for example "myip.opendns.com".
+
+    Returns:
+        bytes: name in the wire format.
+    """
+    encoded = bytearray()
+    for label in name.strip('.').split('.'):
+        raw = label.encode('idna')
+        if not 0 < len(raw) < 64:
+            raise DNSError(f'Invalid label in the name: {name}')
+        encoded.append(len(raw))
+        encoded += raw
+    encoded.append(0)
+    return bytes(encoded)
+
+
+def encode_query(query_id:int, qname:str, qtype:int = TYPE_A,
+                 qclass:int = CLASS_IN, recursion:bool = False) -> bytes:
+    """
+    Encoding a DNS query with one question.
+
+    Parameters:
+        query_id (int): 16 bit identifier repeated in the answer;
+        qname (str): name to ask for;
+        qtype (int): record type;
+        qclass (int): record class;
+        recursion (bool): set the "recursion desired" flag.
+
+    Returns:
+        bytes: UDP payload.
+    """
+    flags = 0x0100 if recursion else 0
+    return (_HEADER.pack(query_id, flags, 1, 0, 0, 0)
+            + encode_name(qname) + _QUESTION.pack(qtype, qclass))
+
+
+def read_name(message:bytes, offset:int) -> tuple[str, int]:
+    """
+    Reading a possibly compressed domain name.
+
+    Parameters:
+        message (bytes): whole DNS message;
+        offset (int): position of the name.
+
+    Returns:
+        tuple: the name and the position right after it.
+    """
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        if offset >= len(message):
+            raise DNSError('The name goes beyond the end of the message')
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if offset + 1 >= len(message):
+                raise DNSError('Truncated compression pointer')
+            if end is None:
+                end = offset + 2
+            jumps += 1
+            if jumps > 32:
+                raise DNSError('Too many compression pointers')
+            offset = ((length & 0x3F) << 8) | message[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(message[offset:offset + length].decode('ascii', 'replace'))
+        offset += length
+    return '.'.join(labels), offset if end is None else end
+
+
+def decode_response(message:bytes, query_id:int) -> list[str]:
+    """
+    Decoding an answer and collecting the A addresses and TXT strings.
+
+    Parameters:
+        message (bytes): UDP payload of the answer;
+        query_id (int): identifier of the query.
+
+    Returns:
+        list: addresses of A records and texts of TXT records, in order.
+
+    Exceptions:
+        DNSError: the answer is malformed, belongs to another query
+            or reports an error.
+    """
+    if len(message) < _HEADER.size:
+        raise DNSError('The answer is shorter than the DNS header')
+    answer_id, flags, questions, answers, _, _ = _HEADER.unpack_from(message)
+    if answer_id != query_id:
+        raise DNSError(f'Unexpected answer id {answer_id}, expected {query_id}')
+    if not flags & 0x8000:
+        raise DNSError('The message is not an answer')
+    if flags & 0x000F:
+        raise DNSError(f'The server returned the error code {flags & 0x000F}')
+    offset = _HEADER.size
+    for _ in range(questions):
+        _, offset = read_name(message, offset)
+        offset += _QUESTION.size
+    values = []
+    for _ in range(answers):
+        _, offset = read_name(message, offset)
+        if offset + _RECORD.size > len(message):
+            raise DNSError('Truncated resource record')
+        rtype, _, _, length = _RECORD.unpack_from(message, offset)
+        offset += _RECORD.size
+        rdata = message[offset:offset + length]
+        if len(rdata) != length:
+            raise DNSError('Truncated resource record data')
+        offset += length
+        if rtype == TYPE_A and length == 4:
+            values.append(socket.inet_ntoa(rdata))
+        elif rtype == TYPE_TXT:
+            position = 0
+            while position < len(rdata):
+                size = rdata[position]
+                values.append(rdata[position + 1:position + 1 + size].decode('ascii', 'replace'))
+                position += 1 + size
+    return values
+
+
+def make_query(resolver:DNSResolver) -> tuple[bytes, int]:
+    """
+    Encoding a new query of a resolver with a random identifier.
+
+    Parameters:
+        resolver (DNSResolver): server and name to ask.
+
+    Returns:
+        tuple: UDP payload and the identifier of the query.
+    """
+    query_id = random.getrandbits(16)
+    return encode_query(query_id, resolver.qname, resolver.qtype, resolver.qclass), query_id
+
+
+def answer_id(message:bytes) -> int:
+    """
+    Parameters:
+        message (bytes): UDP payload of an answer.
+
+    Returns:
+        int: identifier of the query it answers.
+    """
+    return int.from_bytes(message[:2], 'big')
+
+
+def query(resolver:DNSResolver, timeout_ms:int = 500,
+          retries:int = 2) -> Union[list[str], None]:
+    """
+    Sending the query of a resolver and waiting for the answer.
+    Every attempt waits "timeout_ms" milliseconds, the query is sent
+    again "retries" times; a late answer to an earlier attempt is
+    accepted (see the "udp_request" module).
+
+    Parameters:
+        resolver (DNSResolver): server and name to ask;
+        timeout_ms (int): milliseconds to wait for each attempt;
+        retries (int): additional attempts after the first one.
+
+    Returns:
+        list: values from the answer (see "decode_response");
+        None: no answer within the attempts.
+
+    Exceptions:
+        OSError: the server can not be reached (no network);
+        DNSError: the answer is malformed or reports an error.
+    """
+    answer = udp_request.request((resolver.server, resolver.port),
+                                 lambda: make_query(resolver), answer_id,
+                                 timeout_ms, retries)
+    return None if answer is None else decode_response(*answer)
+
+
+async def aquery(resolver:DNSResolver, timeout_ms:int = 500,
+                 retries:int = 2) -> Union[list[str], None]:
+    """
+    Asynchronous counterpart of "query".
+
+    Parameters:
+        resolver (DNSResolver): server and name to ask;
+        timeout_ms (int): milliseconds to wait for each attempt;
+        retries (int): additional attempts after the first one.
+
+    Returns:
+        list: values from the answer (see "decode_response");
+        None: no answer within the attempts.
+    """
+    answer = await udp_request.arequest((resolver.server, resolver.port),
+                                        lambda: make_query(resolver), answer_id,
+                                        timeout_ms, retries)
+    return None if answer is None else decode_response(*answer)
@@ -0,0 +1,144 @@
+"""
+Fast extraction of the IPv4 address from the provider pages.
+Instead of building a full HTML tree, the response is scanned as it
+arrives with precompiled byte patterns, and reading stops as soon as
+the address is found or the byte budget is exhausted.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import re
+from typing import Iterator, Union
+
+_IPV4 = rb'(\d{1,3}(?:\.\d{1,3}){3})'
+
+# "http://checkip.dyndns.org": <body>Current IP Address: 1.2.3.4</body>
+CHECKIP_PATTERN = re.compile(rb'Current IP Address:\s*' + _IPV4)
+# "https://www.ipaddress.com": <div id="ipv4">...My IPv4 Address...1.2.3.4...</div>
+IPADDRESS_COM_PATTERN = re.compile(
+        rb'id=["\']?ipv4["\']?[^>]*>(?:[^<]|<(?!/div)){0,512}?' + _IPV4)
+# "https://www.iplocation.net": <span class="home-ip">1.2.3.4</span>
+IPLOCATION_PATTERN = re.compile(
+        rb'class=["\'](?:[^"\']*\s)?home-ip[\s"\'][^>]*>\s*' + _IPV4)
+
+DEFAULT_BYTE_BUDGET = 256 * 1024
+# The longest piece of a page a pattern can span. Each new chunk is
+# searched together with this many bytes of the previous data, so a
+# match split between two chunks is still found.
+_OVERLAP = 1024
+
+
+class StreamExtractor():
+    """
+    Incremental search of one pattern in a response that arrives in chunks.
+    A match that ends together with the data received so far is not
+    accepted yet: the next chunk may continue the address ("1.2.3.4"
+    of "1.2.3.45"). It is accepted by "finish" at the end of the response.
+
+    Methods:
+        __init__: class initialization;
+        feed: adding the next chunk and searching in it;
+        finish: the end of the response, a match at its very end is accepted.
+
+    Class level variables:
+        self.pattern: compiled byte pattern, group 1 is the IPv4 address;
+        self.byte_budget: maximum number of bytes to look through;
+        self.buffer: all bytes received so far;
+        self.found: the address found, None until then;
+        self.exhausted: True when the budget was spent without a match.
+    """
+
+    def __init__(self, pattern:re.Pattern, byte_budget:int = DEFAULT_BYTE_BUDGET):
+        self.pattern = pattern
+        self.byte_budget = byte_budget
+        self.buffer = bytearray()
+        self.found: str | None = None
+        self.exhausted = False
+        self._start = 0 # Where the next search begins
+
+    def feed(self, chunk:bytes) -> Union[str, None]:
+        """
+        Adding the next chunk of the response and searching for the address.
+
+        Parameters:
+            chunk (bytes): next piece of the response body.
+
+        Returns:
+            str: the found IPv4 address string (also after it was found);
+            None: not found yet (or the budget is exhausted).
+        """
+        if self.exhausted or self.found is not None:
+            return self.found
+        self.buffer += chunk
+        # The budget ends the search range: what lies beyond it is never searched
+        return self._search(final=len(self.buffer) >= self.byte_budget)
+
+    def finish(self) -> Union[str, None]:
+        """
+        The response has ended: a match at its very end is complete.
+
+        Returns:
+            str: the found IPv4 address string;
+            None: the address was not found.
+        """
+        if not self.exhausted and self.found is None:
+            self._search(final=True)
+        return self.found
+
+    def _search(self, final:bool) -> Union[str, None]:
+        found = self.pattern.search(self.buffer, self._start, self.byte_budget)
+        if found is not None and (final or found.end() < len(self.buffer)):
+            self.found = found.group(1).decode('ascii')
+            return self.found
+        if final:
+            self.exhausted = len(self.buffer) >= self.byte_budget
+        self._start = max(0, len(self.buffer) - _OVERLAP)
+        return None
+
+
+def scan_chunks(chunks:Iterator[bytes], pattern:re.Pattern,
+                byte_budget:int = DEFAULT_BYTE_BUDGET) -> tuple[Union[str, None], bytes]:
+    """
+    Reading chunks from an iterator until the address is found
+    or the byte budget is exhausted. The iterator is not read further,
+    so the caller may continue reading it (for example for a fallback parser).
+
+    Parameters:
+        chunks (Iterator[bytes]): response body in pieces;
+        pattern (re.Pattern): one of the *_PATTERN constants;
+        byte_budget (int): maximum number of bytes to look through.
+
+    Returns:
+        tuple: the found address string or None, and the bytes read so far.
+    """
+    extractor = StreamExtractor(pattern, byte_budget)
+    for chunk in chunks:
+        ipv4 = extractor.feed(chunk)
+        if ipv4 is not None or extractor.exhausted:
+            return ipv4, bytes(extractor.buffer)
+    return extractor.finish(), bytes(extractor.buffer)
+
+
+def search_bytes(pattern:re.Pattern, page:Union[bytes, str],
+                 byte_budget:int = DEFAULT_BYTE_BUDGET) -> Union[str, None]:
+    """
+    The same search for a page that has already been downloaded.
+
+    Parameters:
+        pattern (re.Pattern): one of the *_PATTERN constants;
+        page (bytes | str): response body;
+        byte_budget (int): maximum number of bytes to look through.
+
+    Returns:
+        str: the found IPv4 address string;
+        None: the address was not found.
+    """
+    if isinstance(page, str):
+        page = page.encode('utf-8', 'replace')
+    found = pattern.search(page, 0, byte_budget)
+    if found is None:
+        return None
+    return found.group(1).decode('ascii')
@@ -0,0 +1,516 @@
+"""
+Local copies of the sites used by GetMyIP, for tests and benchmarks.
+Every server answers with a page in the format of one site
+(checkip.dyndns.org, ipaddress.com, iplocation.net or a bare address),
+after a configurable delay, with a configurable share of failed
+answers and a configurable page size. The servers can use HTTPS with
+a self-signed certificate made by the "openssl" command.
+
+FakeProxyServer stands in for a pool of HTTP and SOCKS5 proxies: the
+user name of the proxy link chooses the loopback address the proxy
+exits from, so one server looks like thousands of proxies to a site
+that shows the address of its client (address=None).
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import asyncio
+import base64
+import ipaddress
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Union
+from urllib.parse import urlsplit
+
+CHECKIP = 'checkip'
+IPADDRESS_COM = 'ipaddress'
+IPLOCATION = 'iplocation'
+PLAIN = 'plain'
+# The sites of GetMyIP.get_external_ipv4_1..3, in this order
+SITES = (CHECKIP, IPADDRESS_COM, IPLOCATION)
+
+_FILLER = b'<div class="filler"><p>Lorem ipsum dolor sit amet, consectetur.</p></div>\n'
+
+
+def make_page(site:str, address:str, page_size:int = 0) -> bytes:
+    """
+    Creating a page in the format of a site.
+
+    Parameters:
+        site (str): CHECKIP, IPADDRESS_COM, IPLOCATION or PLAIN;
+        address (str): the address shown on the page;
+        page_size (int): the page is padded with markup placed before the
+            address up to about this many bytes (not used for PLAIN).
+
+    Returns:
+        bytes: body of the answer.
+    """
+    if site == PLAIN:
+        return f'{address}\n'.encode()
+    if site == CHECKIP:
+        head = '<html><head><title>Current IP Check</title>'
+        body = f'</head><body>Current IP Address: {address}</body></html>\r\n'
+        # The whole text of <body> is the answer, so the padding goes into <head>
+        filler = b'<meta name="filler" content="' + b'x' * 64 + b'">\n'
+    elif site == IPADDRESS_COM:
+        head = '<!DOCTYPE html><html><head><title>What Is My IP Address</title></head><body>'
+        body = (f'<div id="ipv4"><span>My IPv4 Address</span>{address}</div>'
+                '</body></html>')
+        filler = _FILLER
+    elif site == IPLOCATION:
+        head = '<!DOCTYPE html><html><head><title>IP Location</title></head><body>'
+        body = (f'<p>Your IP address is <span class="home-ip">{address}</span></p>'
+                '</body></html>')
+        filler = _FILLER
+    else:
+        raise ValueError(f'Unknown site "{site}". Expected one of: {", ".join(SITES + (PLAIN,))}')
+    page = head.encode()
+    missing = page_size - len(page) - len(body)
+    if missing > 0:
+        page += filler * (missing // len(filler) + 1)
+    return page + body.encode()
+
+
+def make_certificate(directory:str) -> Union[tuple[str, str], None]:
+    """
+    Creating a self-signed certificate for "127.0.0.1" and "localhost".
+
+    Parameters:
+        directory (str): where the certificate and the key are saved.
+
+    Returns:
+        tuple: paths to the certificate and to the key;
+        None: the "openssl" command is not available or failed.
+    """
+    if shutil.which('openssl') is None:
+        return None
+    certificate = os.path.join(directory, 'fake_providers.crt')
+    key = os.path.join(directory, 'fake_providers.key')
+    try:
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                        '-keyout', key, '-out', certificate, '-days', '1',
+                        '-subj', '/CN=localhost',
+                        '-addext', 'subjectAltName=IP:127.0.0.1,DNS:localhost'],
+                       check=True, capture_output=True, timeout=60)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return certificate, key
+
+
+class FakeProviderServer():
+    """
+    Local server that pretends to be one of the provider sites.
+
+    Methods:
+        __init__: class initialization, the server starts at once;
+        close: stopping the server.
+
+    Class level variables:
+        self.site: the site whose page is served;
+        self.address: the address shown on the page, None - the address of
+            the client, like the real sites;
+        self.latency: seconds before the answer, or a (min, max) range;
+        self.failure_rate: share of answers with the status 503;
+        self.page_size: approximate size of the page;
+        self.url: link to the page;
+        self.requests: number of requests received;
+        self.connections: number of connections accepted;
+        self.failures: number of failed answers sent.
+    """
+
+    def __init__(self, site:str, address:str|None = '203.0.113.7',
+                 latency:Union[float, tuple[float, float]] = 0.0,
+                 failure_rate:float = 0.0, page_size:int = 0,
+                 certificate:Union[tuple[str, str], None] = None,
+                 seed:Union[int, None] = None):
+        """
+        Parameters:
+            site (str): CHECKIP, IPADDRESS_COM, IPLOCATION or PLAIN;
+            address (str | None): the address shown on the page, None - the
+                address the request came from;
+            latency (float | tuple): delay before the answer in seconds,
+                or the range of a uniformly distributed delay;
+            failure_rate (float): share of answers with the status 503, 0 to 1;
+            page_size (int): approximate size of the page in bytes;
+            certificate (tuple | None): certificate and key from "make_certificate",
+                the server then uses HTTPS;
+            seed (int | None): seed of the delays and failures, for repeatable runs.
+        """
+        if not 0 <= failure_rate <= 1:
+            raise ValueError(f'failure_rate must be between 0 and 1. Value: {failure_rate}')
+        self.site = site
+        self.address = address
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.page_size = page_size
+        self.page = None if address is None else make_page(site, address, page_size)
+        self.requests = 0
+        self.connections = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler(),
+                                           bind_and_activate=False)
+        self._server.daemon_threads = True
+        # The default backlog of 5 drops the connections of many concurrent clients
+        self._server.request_queue_size = 1024
+        self._server.server_bind()
+        self._server.server_activate()
+        scheme = 'http'
+        if certificate is not None:
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(*certificate)
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+            scheme = 'https'
+        self.url = f'{scheme}://127.0.0.1:{self._server.server_port}/{site}'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name=f'FakeProvider-{site}')
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _next_answer(self) -> tuple[float, bool]:
+        """
+        Returns:
+            tuple: the delay of the next answer and whether it fails.
+        """
+        with self._lock:
+            self.requests += 1
+            if isinstance(self.latency, tuple):
+                delay = self._random.uniform(*self.latency)
+            else:
+                delay = self.latency
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        return delay, failed
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # Keep-alive, like the real sites
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                delay, failed = server._next_answer()
+                if delay > 0:
+                    time.sleep(delay)
+                if failed:
+                    status, body = 503, b'Service Unavailable'
+                elif server.page is None:
+                    status, body = 200, make_page(server.site, self.client_address[0],
+                                                  server.page_size)
+                else:
+                    status, body = 200, server.page
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'text/plain' if server.site == PLAIN
+                                     else 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True # The client stopped waiting
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def close(self) -> None:
+        """
+        Stopping the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+class FakeSites():
+    """
+    The three sites of GetMyIP started together, with the same settings.
+
+    Methods:
+        __init__: class initialization, the servers start at once;
+        urls: links for the "provider_urls" argument of GetMyIP;
+        close: stopping the servers and removing the certificate.
+
+    Class level variables:
+        self.servers: FakeProviderServer of every site, in the order of SITES;
+        self.ca_file: certificate to trust when "https" is used, otherwise None.
+    """
+
+    def __init__(self, https:bool = False, sites:Iterable[str] = SITES, **settings):
+        """
+        Parameters:
+            https (bool): use HTTPS. Falls back to HTTP if no certificate
+                can be made ("ca_file" is None then);
+            sites (Iterable[str]): the sites to start;
+            settings: arguments of FakeProviderServer (latency, failure_rate ...).
+        """
+        self._directory = None
+        certificate = None
+        if https:
+            self._directory = tempfile.mkdtemp(prefix='fake_providers_')
+            certificate = make_certificate(self._directory)
+        self.ca_file = None if certificate is None else certificate[0]
+        self.servers = []
+        try:
+            for number, site in enumerate(sites):
+                seed = settings.pop('seed', None) if number == 0 else None
+                self.servers.append(FakeProviderServer(
+                        site, certificate=certificate,
+                        seed=None if seed is None else seed + number, **settings))
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def urls(self) -> tuple[str, ...]:
+        """
+        Returns:
+            tuple: links of the sites.
+        """
+        return tuple(server.url for server in self.servers)
+
+    def close(self) -> None:
+        """
+        Stopping the servers and removing the certificate.
+        """
+        for server in self.servers:
+            server.close()
+        self.servers = []
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+
+class FakeProxyServer():
+    """
+    HTTP (CONNECT and absolute links) and SOCKS5 proxy on one loopback
+    port, served by an asyncio event loop on a background thread.
+
+    Methods:
+        __init__: class initialization, the server starts at once;
+        url: link of a "proxy" that exits from a given loopback address;
+        close: stopping the server.
+
+    Class level variables:
+        self.port: port of the server;
+        self.latency: seconds before a connection is forwarded;
+        self.failure_rate: share of connections refused by the proxy;
+        self.connections: number of connections received;
+        self.active, self.peak: connections open now and at most at once.
+    """
+
+    def __init__(self, latency:float = 0.0, failure_rate:float = 0.0,
+                 seed:Union[int, None] = None):
+        """
+        Parameters:
+            latency (float): delay before a connection is forwarded, seconds;
+            failure_rate (float): share of refused connections, 0 to 1;
+            seed (int | None): seed of the failures, for repeatable runs.
+        """
+        if not 0 <= failure_rate <= 1:
+            raise ValueError(f'failure_rate must be between 0 and 1. Value: {failure_rate}')
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.connections = 0
+        self.active = 0
+        self.peak = 0
+        self._random = random.Random(seed)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True,
+                                        name='FakeProxy')
+        self._thread.start()
+        self._server = asyncio.run_coroutine_threadsafe(
+                asyncio.start_server(self._handle, '127.0.0.1', 0), self._loop).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def url(self, egress:str = '127.0.0.1', scheme:str = 'http') -> str:
+        """
+        Parameters:
+            egress (str): loopback address the proxy connects from;
+            scheme (str): "http", "socks5" or "socks5h".
+
+        Returns:
+            str: link of the proxy.
+        """
+        return f'{scheme}://{egress}:secret@127.0.0.1:{self.port}'
+
+    @staticmethod
+    def _egress(user:bytes) -> str:
+        try:
+            address = ipaddress.IPv4Address(user.decode())
+        except (UnicodeDecodeError, ValueError):
+            return '127.0.0.1'
+        return str(address) if address.is_loopback else '127.0.0.1'
+
+    async def _handle(self, reader:asyncio.StreamReader,
+                      writer:asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if self.latency > 0:
+                await asyncio.sleep(self.latency)
+            failed = self._random.random() < self.failure_rate
+            first = await reader.readexactly(1)
+            if first == b'\x05':
+                await self._socks5(reader, writer, failed)
+            else:
+                await self._http(first, reader, writer, failed)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            pass # Closed by "close", asyncio would report a cancelled handler
+        finally:
+            self.active -= 1
+            writer.close()
+
+    async def _http(self, first:bytes, reader:asyncio.StreamReader,
+                    writer:asyncio.StreamWriter, failed:bool) -> None:
+        head = first + await reader.readuntil(b'\r\n\r\n')
+        while True:
+            request_line, *header_lines = head.decode('latin-1').split('\r\n')
+            method, target, version = request_line.split()
+            user = b''
+            for line in header_lines:
+                name, _, value = line.partition(':')
+                if name.strip().lower() == 'proxy-authorization':
+                    user = base64.b64decode(value.split()[-1]).partition(b':')[0]
+            if failed:
+                writer.write(b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n')
+                return
+            if method == 'CONNECT':
+                host, _, port = target.rpartition(':')
+                target_reader, target_writer = await asyncio.open_connection(
+                        host.strip('[]'), int(port), local_addr=(self._egress(user), 0))
+                writer.write(b'HTTP/1.1 200 Connection established\r\n\r\n')
+                await self._pipe(reader, writer, target_reader, target_writer)
+                return
+            # An absolute link: every request of a kept connection may go to another host
+            parts = urlsplit(target)
+            target_reader, target_writer = await asyncio.open_connection(
+                    parts.hostname, parts.port or 80, local_addr=(self._egress(user), 0))
+            try:
+                path = parts.path or '/'
+                if parts.query:
+                    path = f'{path}?{parts.query}'
+                forwarded = [f'{method} {path} {version}'] + [
+                        line for line in header_lines
+                        if line and not line.lower().startswith('proxy-')]
+                target_writer.write(('\r\n'.join(forwarded) + '\r\n\r\n').encode('latin-1'))
+                answer = await target_reader.readuntil(b'\r\n\r\n')
+                writer.write(answer)
+                length = None
+                for line in answer.decode('latin-1').split('\r\n')[1:]:
+                    name, _, value = line.partition(':')
+                    if name.strip().lower() == 'content-length':
+                        length = int(value)
+                if length is None: # The body ends with the connection
+                    await self._pipe(reader, writer, target_reader, target_writer)
+                    return
+                writer.write(await target_reader.readexactly(length))
+                await writer.drain()
+            finally:
+                target_writer.close()
+            head = await reader.readuntil(b'\r\n\r\n')
+
+    async def _socks5(self, reader:asyncio.StreamReader,
+                      writer:asyncio.StreamWriter, failed:bool) -> None:
+        methods = await reader.readexactly((await reader.readexactly(1))[0])
+        user = b''
+        if 2 in methods:
+            writer.write(b'\x05\x02')
+            await reader.readexactly(1)
+            user = await reader.readexactly((await reader.readexactly(1))[0])
+            await reader.readexactly((await reader.readexactly(1))[0])
+            writer.write(b'\x01\x00')
+        else:
+            writer.write(b'\x05\x00')
+        _, command, _, address_type = await reader.readexactly(4)
+        if address_type == 1:
+            host = str(ipaddress.IPv4Address(await reader.readexactly(4)))
+        elif address_type == 4:
+            host = str(ipaddress.IPv6Address(await reader.readexactly(16)))
+        else:
+            host = (await reader.readexactly((await reader.readexactly(1))[0])).decode('idna')
+        port = int.from_bytes(await reader.readexactly(2), 'big')
+        if failed or command != 1:
+            writer.write(b'\x05\x01\x00\x01' + bytes(6))
+            return
+        target_reader, target_writer = await asyncio.open_connection(
+                host, port, local_addr=(self._egress(user), 0))
+        writer.write(b'\x05\x00\x00\x01' + bytes(6))
+        await self._pipe(reader, writer, target_reader, target_writer)
+
+    async def _pipe(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter,
+                    target_reader:asyncio.StreamReader,
+                    target_writer:asyncio.StreamWriter) -> None:
+        async def copy(source, destination):
+            try:
+                while data := await source.read(64 * 1024):
+                    destination.write(data)
+                    await destination.drain()
+            except OSError:
+                pass
+            finally:
+                if destination.can_write_eof():
+                    try:
+                        destination.write_eof()
+                    except OSError:
+                        pass
+
+        try:
+            await asyncio.gather(copy(reader, target_writer), copy(target_reader, writer))
+        finally:
+            target_writer.close()
+
+    def close(self) -> None:
+        """
+        Stopping the server.
+        """
+        async def stop():
+            self._server.close()
+            # Tunnels kept open by keep-alive clients
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
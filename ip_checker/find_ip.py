@@ -2,26 +2,76 @@
 This module searches for an external IP address.
 
 Author: Mikhail Gurov
-Last Modified: Feb 06, 2023
+Last Modified: Oct 16, 2026
 """
 #!/usr/bin/env python3.10
 # -- coding: utf-8 --
 
+import asyncio
+import re
+import socket
 import sys
-from typing import Union
-from ipaddress import IPv4Address, ip_address
+import threading
+import time
+from concurrent.futures import (FIRST_COMPLETED, CancelledError, Future,
+                                ThreadPoolExecutor, as_completed, wait)
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextvars import ContextVar
+from ipaddress import IPv6Address
+from typing import Awaitable, Callable, Iterable, NamedTuple, Union
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
 from bs4 import BeautifulSoup
 from loguru import logger
+# Imported as a package (python -m ip_checker) or as scripts from this directory
+if __package__:
+    from . import async_http
+    from . import extract
+    from .health import HealthTracker
+    from .interfaces import SO_BINDTODEVICE, Interface, can_bind_to_device, list_interfaces
+    from .ipv4 import IPv4
+    from .state import LastKnownIP, StateFile
+    from . import providers
+    from .providers import Provider
+    from . import dns_ip
+    from .dns_ip import DNSResolver
+    from . import stun_ip
+    from .stun_ip import STUNServer
+else:
+    import async_http
+    import extract
+    from health import HealthTracker
+    from interfaces import SO_BINDTODEVICE, Interface, can_bind_to_device, list_interfaces
+    from ipv4 import IPv4
+    from state import LastKnownIP, StateFile
+    import providers
+    from providers import Provider
+    import dns_ip
+    from dns_ip import DNSResolver
+    import stun_ip
+    from stun_ip import STUNServer
 
-logger.add(
-        'find_ip.log.txt',
-        format='{time}, {level}, {module}:{line} -> {message}.',
-        level='ERROR',
-        rotation='10MB', compression='zip',
-        serialize=False,
+PROVIDER_URLS = (
+        'http://checkip.dyndns.org',
+        'https://www.ipaddress.com',
+        'https://www.iplocation.net',
         )
 
+# Ways of getting the external address supported by GetMyIP
+BACKENDS = ('http', 'dns', 'stun')
+
+# Size of the pieces in which a streamed page is read
+CHUNK_SIZE = 16 * 1024
+# Helper threads that run the calls with a deadline (see "call_within")
+DEADLINE_WORKERS = 4
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)\
+    AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+    }
+
 class FailedToGetIP(Exception):
     """
     This exception is raised if an error occurs in obtaining an external IPv4 address.
@@ -31,6 +81,89 @@ class FailedToGetIP(Exception):
         Error getting IPv4 in all modules.
     """
 
+class DeadlineExceeded(FailedToGetIP):
+    """
+    This exception is raised if no external IPv4 address was obtained
+    within the deadline of the call (see GetMyIP.lookup).
+    """
+
+class IPLookupResult(NamedTuple):
+    """
+    Description of the data returned by the "lookup" method.
+    """
+    ipv4: IPv4
+    cached: bool
+    obtained_at: float
+
+class DualStackResult(NamedTuple):
+    """
+    Description of the data returned by the "get_dual" method.
+    An address is None if it was not obtained within the timeout
+    of its family (for IPv6 usually: there is no IPv6 route).
+    """
+    ipv4: Union[IPv4, None]
+    ipv6: Union[IPv6Address, None]
+
+class SourceAddressAdapter(HTTPAdapter):
+    """
+    Transport adapter whose connections are bound to a local address
+    and, with "interface", to the interface itself (SO_BINDTODEVICE).
+    The address alone is enough only with source-based routing, see
+    the "interfaces" module.
+    """
+
+    def __init__(self, source_address:str|None, interface:str|None = None, **kwargs):
+        self.source_address = source_address
+        self.interface = interface
+        super().__init__(**kwargs)
+
+    def bind(self, kwargs:dict) -> dict:
+        if self.source_address is not None:
+            kwargs['source_address'] = (self.source_address, 0)
+        if self.interface is not None:
+            kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+                    (socket.SOL_SOCKET, SO_BINDTODEVICE, self.interface.encode())]
+        return kwargs
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **self.bind(kwargs))
+
+    def proxy_manager_for(self, *args, **kwargs):
+        return super().proxy_manager_for(*args, **self.bind(kwargs))
+
+
+class _Flight():
+    """
+    A lookup in progress, shared by the callers of "lookup" and "alookup"
+    that arrive while it runs (single-flight).
+
+    Class level variables:
+        self.future: concurrent.futures.Future with the IPLookupResult or
+            the exception, can be waited for from any thread;
+        self.loop: event loop of an asynchronous lookup, None for a thread;
+        self.task: the task of an asynchronous lookup;
+        self.waiters: callers waiting for the result, including the first one.
+    """
+
+    def __init__(self, loop:asyncio.AbstractEventLoop|None = None):
+        self.future: Future = Future()
+        self.loop = loop
+        self.task: asyncio.Task | None = None
+        self.waiters = 1
+
+
+class _ProviderCall(NamedTuple):
+    """
+    Description of the provider call running in the current thread or task.
+    """
+    name: str
+    until: Union[float, None] # time.monotonic by which the call must end
+
+
+# Read by the request methods, whose provider methods take no arguments
+_current_call: ContextVar[Union[_ProviderCall, None]] = ContextVar('current_call', default=None)
+
+
 class GetMyIP():
     """
     Calling different sites on the Internet to get the device's
@@ -40,6 +173,57 @@ class GetMyIP():
         __init__: class initialization;
         get: running the remaining methods of the class to get the result of its work.
             Control class method;
+        lookup: like "get", but also tells whether the answer came from the cache.
+            Callers arriving while a lookup runs wait for its result (single-flight);
+        lookup_shared, alookup_shared: the lookup, joining the one already running;
+        lookup_uncached, alookup_uncached: one lookup without joining other callers;
+        call_within: waiting for a blocking call no longer than the deadline;
+        attempt_deadline: the part of the deadline given to one provider;
+        request_timeouts: connect and read timeouts of the current request;
+        attempt_timeout_ms: the timeout of one DNS or STUN attempt within the deadline;
+        get_per_interface: the external address of every local interface, in parallel;
+        bound_to: a copy of the instance whose requests leave from a local address;
+        finish_flight, finish_flight_task: passing the result of a shared lookup
+            to the callers waiting for it;
+        find: asking the providers without the cache;
+        get_sequential: calling the providers one after another;
+        get_racing: calling all providers in parallel, the first valid answer wins;
+        get_cached, store_result, store_failure: reading and filling the cache;
+        invalidate: clearing the cache;
+        last_known: the last address found, also by a previous run (see "state_file");
+        save_state: scheduling a write of the last address and the provider
+            statistics to "state_file" on a background thread;
+        flush_state: writing the scheduled state at once;
+        get_session: long-lived HTTP session with a connection pool per provider host;
+        get_async_pool: keep-alive connections of the asynchronous requests;
+        close: closing the HTTP session and its connections;
+        list_providers: list of the provider methods in the default order;
+        list_http_providers: provider methods of the "http" backend;
+        make_dns_method, get_from_dns, control_dns_values: the "dns" backend;
+        make_stun_method, get_from_stun: the "stun" backend;
+        ordered_providers: providers ordered by their health statistics;
+        provider_name: name of a provider in the health statistics;
+        provider_weight: weight of a provider method;
+        call_provider: calling a provider and recording its latency and result;
+        make_provider_method: provider method created from a provider record;
+        get_from_provider: request to a provider described by a record;
+        parse_page_1, parse_page_2, parse_page_3: extracting the address from a page;
+        process_page: finding the address in a downloaded page and checking it;
+        process_response: reading a streamed page only until the address is found;
+        aprocess_url: the same for a page downloaded on the event loop;
+        aget, alookup, afind: asynchronous counterparts of "get", "lookup"
+            and "find", with or without racing;
+        agather: asking all providers concurrently and collecting every answer;
+        get_dual, aget_dual: getting the external IPv4 and IPv6 addresses concurrently;
+        find_ipv6, afind_ipv6: asking the IPv6 providers, bypassing the cache;
+        list_ipv6_providers, make_ipv6_method, alist_ipv6_providers,
+        amake_ipv6_method: provider methods of the IPv6 lookup;
+        make_control6: checking that a variable contains an IPv6 address;
+        alist_providers, aordered_providers, acall_provider, amake_requests,
+        amake_provider_method, aget_from_provider, alist_http_providers,
+        amake_dns_method, aget_from_dns, amake_stun_method, aget_from_stun,
+        aget_external_ipv4_N: asynchronous
+            counterparts of the methods with the same names without "a";
         get_external_ipv4_1: the first method is to get the user's external IPv4 address;
         get_external_ipv4_2: the following method is to get the user's external IPv4 address.
             Used as a fallback method in case the previous method fails;
@@ -48,221 +232,2190 @@ class GetMyIP():
         make_control: Helper method to check if a variable contains an IPv4 address;
         make_requests: A method for receiving a response from a web page before parsing.
 
+    Class level variables:
+        self.race: if True, "get" calls the providers in parallel instead of
+            one after another;
+        self.race_width: how many providers (from the top of the list) take part
+            in the race. None means all of them;
+        self.pool_size: maximum number of keep-alive connections kept per host;
+        self.idle_timeout: seconds without requests after which the session
+            and its connections are closed and opened again on the next request;
+        self.cache_ttl: seconds during which "get" returns the cached address;
+        self.coalesce: if True, concurrent calls of "get" ("aget") in all
+            threads and event loops share one lookup;
+        self.failure_ttl: seconds during which a failed lookup is not repeated;
+        self.byte_budget: bytes of a page scanned by the fast extraction;
+        self.adaptive: if True, the providers are called in the order of their
+            expected answer time and failing ones are skipped for a cool-down;
+        self.health: HealthTracker with latency, success rate and circuit
+            breaker state of every provider;
+        self.providers: declarative provider records (see the "providers" module)
+            or None to use the methods "get_external_ipv4_N";
+        self.backends: ways of getting the address - "http", "dns", "stun";
+        self.dns_resolvers, self.dns_timeout_ms, self.dns_retries: settings of
+            the "dns" backend (see the "dns_ip" module);
+        self.stun_servers, self.stun_timeout_ms, self.stun_retries: settings of
+            the "stun" backend (see the "stun_ip" module);
+        self.ipv6_providers: provider records of the IPv6 lookup;
+        self.ipv4_timeout, self.ipv6_timeout: seconds "get_dual" waits for
+            the address of each family;
+        self.ipv6_grace: seconds "get_dual" still waits for IPv6 after
+            the IPv4 lookup is over;
+        self.provider_urls: links of the sites of "get_external_ipv4_N";
+        self.state_file: StateFile where the last address and the provider
+            statistics are kept between runs, or None;
+        self.state_interval: minimum seconds between two writes of "state_file";
+        self.source_address: local address the HTTP requests are bound to,
+            None - the default route;
+        self.source_interface: interface the blocking HTTP requests are bound
+            to with SO_BINDTODEVICE, or None;
+        self.proxy: link of the proxy the HTTP requests go through, or None;
+        self.deadline: seconds "get" may take when the call gives no deadline,
+            None - no limit.
+
+    The instance can be used as a context manager, the session is closed on exit:
+        with GetMyIP() as ip_search:
+            ipv4 = ip_search.get()
+
     Exceptions:
-        In developing.
+        FailedToGetIP: no provider returned an IPv4 address;
+        DeadlineExceeded: no provider returned it within the deadline.
 
     External resources:
         The class uses 3 web sites, from where it gets the external IPv4 address of the user
             using the parsing method: "http://checkip.dyndns.org", "https://www.ipaddress.com",
             "https://www.iplocation.net".
+        Other sites can be given as declarative records with the "providers" argument:
+            GetMyIP(providers=ProviderRegistry.from_file('providers.json')).
+        With backends=('dns',) the address is asked from DNS servers instead:
+            OpenDNS, Google and Cloudflare by default.
+        With backends=('stun', 'http') the STUN servers of Google and Cloudflare
+            are asked first and the web sites are the fallback.
+        The IPv6 address is asked from sites that are reachable only over
+            IPv6 (see providers.IPV6_PROVIDERS).
     """
 
-    def __init__(self):
+    def __init__(self, race:bool = False, race_width:int|None = None,
+                 pool_size:int = 4, idle_timeout:float = 60.0,
+                 cache_ttl:float = 0, failure_ttl:float = 0,
+                 byte_budget:int = extract.DEFAULT_BYTE_BUDGET,
+                 adaptive:bool = True, health_tracker:HealthTracker|None = None,
+                 providers:Iterable[Provider]|None = None,
+                 backends:Iterable[str] = ('http',),
+                 dns_resolvers:Iterable[DNSResolver] = dns_ip.DEFAULT_RESOLVERS,
+                 dns_timeout_ms:int = 500, dns_retries:int = 2,
+                 stun_servers:Iterable[STUNServer] = stun_ip.DEFAULT_STUN_SERVERS,
+                 stun_timeout_ms:int = 500, stun_retries:int = 2,
+                 ipv6_providers:Iterable[Provider] = providers.IPV6_PROVIDERS,
+                 ipv4_timeout:float = 10.0, ipv6_timeout:float = 3.0,
+                 ipv6_grace:float|None = 1.0,
+                 provider_urls:Iterable[str] = PROVIDER_URLS,
+                 state_file:StateFile|None = None, state_interval:float = 5.0,
+                 coalesce:bool = True,
+                 source_address:str|None = None, source_interface:str|None = None,
+                 proxy:str|None = None,
+                 deadline:float|None = None):
         """
+        Parameters:
+            race (bool): call the providers in parallel, the fastest valid
+                answer is returned. By default the providers are called one by one;
+            race_width (int | None): number of providers taking part in the race;
+            pool_size (int): keep-alive connections kept per provider host;
+            idle_timeout (float): seconds after which an unused session is closed;
+            cache_ttl (float): seconds a found address is reused, 0 disables the cache;
+            failure_ttl (float): seconds a FailedToGetIP is raised again without
+                asking the providers, 0 disables negative caching;
+            byte_budget (int): how many bytes of a page the fast extraction
+                looks through before giving up;
+            adaptive (bool): order the providers by their health statistics;
+            health_tracker (HealthTracker | None): statistics to use, for example
+                shared by several instances. A new tracker is created by default;
+            providers (Iterable[Provider] | None): declarative providers, for
+                example a ProviderRegistry, used instead of the built-in methods;
+            backends (Iterable[str]): ways of getting the address, in the order
+                of use: "http" (web sites), "dns" (DNS queries) and "stun"
+                (STUN Binding Requests). Several backends can be combined;
+            dns_resolvers (Iterable[DNSResolver]): servers of the "dns" backend;
+            dns_timeout_ms (int): milliseconds to wait for a DNS answer;
+            dns_retries (int): how many times a DNS query is repeated;
+            stun_servers (Iterable[STUNServer]): servers of the "stun" backend;
+            stun_timeout_ms (int): milliseconds to wait for a STUN answer;
+            stun_retries (int): how many times a STUN request is repeated;
+            ipv6_providers (Iterable[Provider]): providers of the IPv6 lookup;
+            ipv4_timeout (float): seconds "get_dual" waits for the IPv4 address;
+            ipv6_timeout (float): seconds "get_dual" waits for the IPv6 address;
+            ipv6_grace (float | None): once the IPv4 lookup is over, "get_dual"
+                waits at most this many seconds more for IPv6. None - only
+                "ipv6_timeout" limits the wait;
+            provider_urls (Iterable[str]): links of the 3 sites of the
+                "get_external_ipv4_N" methods, for example local copies
+                of the sites in the benchmarks (see "fake_providers");
+            state_file (StateFile | None): file with the state of the previous
+                runs. The provider statistics are restored from it at once and
+                every lookup updates it. By default nothing is saved;
+            state_interval (float): the file is written on a background thread
+                at most once per this many seconds, the lookups only schedule
+                the write. A pending write is done by "close";
+            coalesce (bool): callers that arrive while a lookup is running
+                get its result (or its FailedToGetIP) instead of asking the
+                providers again;
+            source_address (str | None): local IPv4 address the requests are
+                bound to, so they leave through its interface. Only the
+                "http" backend can be bound. The route is still chosen by the
+                destination unless the system routes by the source address,
+                see "source_interface";
+            source_interface (str | None): name of the interface the blocking
+                requests are bound to with SO_BINDTODEVICE (Linux, see
+                interfaces.can_bind_to_device), so they take its route
+                whatever the routing rules. The asynchronous requests are
+                bound only to "source_address";
+            proxy (str | None): link of an HTTP or SOCKS5 proxy ("http://",
+                "socks5://", "socks5h://", with an optional "user:password@").
+                The answer is then the address the proxy exits from. Only the
+                "http" backend can use a proxy; SOCKS5 in the blocking
+                methods needs the PySocks package (requests[socks]);
+            deadline (float | None): seconds "get" ("lookup", "aget", "alookup")
+                may take, unless the call gives its own deadline. The time is
+                split among the providers and the call returns or raises
+                DeadlineExceeded when it expires. By default there is no limit,
+                every request has only its own timeouts.
         """
+        if race_width is not None and race_width < 1:
+            raise ValueError(f'race_width must be positive. Value: {race_width}')
+        if pool_size < 1:
+            raise ValueError(f'pool_size must be positive. Value: {pool_size}')
+        if state_interval < 0:
+            raise ValueError(f'state_interval must not be negative. Value: {state_interval}')
+        if deadline is not None and deadline <= 0:
+            raise ValueError(f'deadline must be positive. Value: {deadline}')
+        backends = tuple(backends)
+        for backend in backends:
+            if backend not in BACKENDS:
+                raise ValueError(f'Unknown backend "{backend}". '
+                                 f'Expected one of: {", ".join(BACKENDS)}')
+        if (source_address is not None or source_interface is not None) \
+                and backends != ('http',):
+            raise ValueError('source_address is supported by the "http" backend only. '
+                             f'Value: {backends}')
+        if source_interface is not None and SO_BINDTODEVICE is None:
+            raise ValueError('source_interface needs SO_BINDTODEVICE, '
+                             f'which this system does not have. Value: {source_interface}')
+        if proxy is not None:
+            if backends != ('http',):
+                raise ValueError('proxy is supported by the "http" backend only. '
+                                 f'Value: {backends}')
+            proxy_parts = urlsplit(proxy)
+            if proxy_parts.scheme not in async_http.PROXY_SCHEMES or not proxy_parts.hostname:
+                raise ValueError(f'Invalid proxy "{proxy}". Expected a link with one of '
+                                 f'the schemes: {", ".join(async_http.PROXY_SCHEMES)}')
+        self.race = race
+        self.race_width = race_width
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._session: requests.Session | None = None
+        self._session_last_used = 0.0
+        self._session_lock = threading.Lock()
+        # Keep-alive connections of the asynchronous requests, one pool per event loop
+        self._async_pools: dict[asyncio.AbstractEventLoop, async_http.ConnectionPool] = {}
+        self.cache_ttl = cache_ttl
+        self.failure_ttl = failure_ttl
+        self._result: IPLookupResult | None = None
+        self._result_expires = 0.0
+        self._failure: FailedToGetIP | None = None
+        self._failure_expires = 0.0
+        self._cache_lock = threading.Lock()
+        self.coalesce = coalesce
+        self.source_address = source_address
+        self.source_interface = source_interface
+        self.proxy = proxy
+        self.deadline = deadline
+        # Created on the first call with a deadline, guarded by "_session_lock"
+        self._deadline_executor: ThreadPoolExecutor | None = None
+        self._flight: _Flight | None = None # Guarded by "_cache_lock"
+        # Changed by "invalidate", a lookup started before must not fill the cache
+        self._generation = 0
+        self.byte_budget = byte_budget
+        self.adaptive = adaptive
+        self.health = health_tracker if health_tracker is not None else HealthTracker()
+        self.providers = providers
+        self.backends = backends
+        self.dns_resolvers = tuple(dns_resolvers)
+        self.dns_timeout_ms = dns_timeout_ms
+        self.dns_retries = dns_retries
+        self.stun_servers = tuple(stun_servers)
+        self.stun_timeout_ms = stun_timeout_ms
+        self.stun_retries = stun_retries
+        self.ipv6_providers = tuple(ipv6_providers)
+        self.ipv4_timeout = ipv4_timeout
+        self.ipv6_timeout = ipv6_timeout
+        self.ipv6_grace = ipv6_grace
+        self.provider_urls = tuple(provider_urls)
+        if len(self.provider_urls) != len(PROVIDER_URLS):
+            raise ValueError(f'Expected {len(PROVIDER_URLS)} provider_urls. '
+                             f'Value: {self.provider_urls}')
+        self.state_file = state_file
+        self.state_interval = state_interval
+        self._last_known: LastKnownIP | None = None
+        # The scheduled write and the start (time.monotonic) of the last one
+        self._state_timer: threading.Timer | None = None
+        self._state_written = -state_interval
+        self._state_lock = threading.Lock()
+        # Held during a write, so "flush_state" waits for a write already running
+        self._state_write_lock = threading.Lock()
+        if state_file is not None:
+            saved = state_file.read()
+            if saved is not None:
+                self._last_known = saved.last
+                restored = self.health.restore(saved.providers)
+                logger.info('Restored the statistics of {} providers from {}',
+                            restored, state_file.path)
 
-    def get(self) -> Union[IPv4Address, None]:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_session(self) -> requests.Session:
         """
-        Sequentially calling other class methods to get the external
-        IP address. If one of the called methods returns None, the next
-        method is requested until the current external
-        IPv4 address is obtained.
+        Returning the HTTP session shared by all provider requests.
+        The session keeps the connections to the provider hosts open,
+        so repeated checks do not repeat the TCP and TLS handshakes.
+        A session that was not used for longer than "idle_timeout"
+        is closed and replaced by a new one.
 
         Returns:
-            IPv4Address: external IPv4 address.
-            None: if any error occurred.
+            class 'requests.Session': session with a connection pool per host.
         """
-        for func in [self.get_external_ipv4_1, self.get_external_ipv4_2,
-                     self.get_external_ipv4_3]:
-            try:
-                ipv4 = func()
-            except FailedToGetIP as exc:
-                logger.warning(f'Method {func.__name__} returned an error: {exc}')
-                raise
-            except Exception as exc:
-                logger.error(f'An unknown error was found in the\
-                             method {str(func.__name__)}: {exc}')
-                raise
-            if ipv4 is not None:
-                return ipv4
-            logger.warning('Failed one attempt to find an IPv4 address')
-        raise FailedToGetIP('All attempts to get an IPv4 address failed:\
-                            all methods returned None')
+        with self._session_lock:
+            now = time.monotonic()
+            if (self._session is not None
+                    and now - self._session_last_used > self.idle_timeout):
+                logger.info('The HTTP session was idle too long, reconnecting')
+                self._session.close()
+                self._session = None
+            if self._session is None:
+                self._session = requests.Session()
+                if self.source_address is None and self.source_interface is None:
+                    adapter = HTTPAdapter(pool_connections=len(self.list_providers()),
+                                          pool_maxsize=self.pool_size)
+                else:
+                    adapter = SourceAddressAdapter(self.source_address,
+                                                   self.source_interface,
+                                                   pool_connections=len(self.list_providers()),
+                                                   pool_maxsize=self.pool_size)
+                self._session.mount('http://', adapter)
+                self._session.mount('https://', adapter)
+                if self.proxy is not None:
+                    self._session.proxies = {'http': self.proxy, 'https': self.proxy}
+            self._session_last_used = now
+            return self._session
 
+    def get_async_pool(self) -> async_http.ConnectionPool:
+        """
+        Returning the keep-alive connections of the running event loop,
+        the asynchronous counterpart of the session of "get_session".
+        The pools of the event loops that have been closed are dropped.
 
-    def make_requests(self, url:str, headers:dict|None = None) -> Union[requests.Response, None]:
+        Returns:
+            async_http.ConnectionPool: pool used by the asynchronous requests.
         """
-        Receiving a response and checking the result.
+        loop = asyncio.get_running_loop()
+        with self._session_lock:
+            for closed in [other for other in self._async_pools if other.is_closed()]:
+                del self._async_pools[closed]
+            pool = self._async_pools.get(loop)
+            if pool is None:
+                pool = self._async_pools[loop] = async_http.ConnectionPool(
+                        self.pool_size, self.idle_timeout)
+            return pool
 
-        Parameters:
-            url (str): a string containing a link to the site that will be
-                subsequently processed by this method;
-            headers (dict | None): additional information for the http request,
-                in this case the "User-Agent" header.
+    def close(self) -> None:
+        """
+        Closing the HTTP session and all connections kept in its pool,
+        also the connections of the asynchronous requests (on their
+        event loops), letting the helper threads of "call_within" end
+        and writing the state if a write is pending.
+        The instance stays usable, the next request opens a new session.
+        """
+        self.flush_state()
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            pools, self._async_pools = self._async_pools, {}
+            executor, self._deadline_executor = self._deadline_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False) # A call past its deadline ends in the background
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        for loop, pool in pools.items():
+            if loop.is_closed():
+                continue
+            if loop is running_loop or not loop.is_running():
+                pool.close()
+            else:
+                loop.call_soon_threadsafe(pool.close)
+
+    def get_cached(self) -> Union[IPLookupResult, None]:
+        """
+        Returning the cached answer if it has not expired yet.
 
         Returns:
-            class 'requests.model.Response': HTTP response body and other supporting information;
-            None: if any error occurred.
+            IPLookupResult: cached answer with the "cached" flag set;
+            None: nothing valid in the cache.
+
+        Exceptions:
+            FailedToGetIP: the last lookup failed less than "failure_ttl" seconds ago.
         """
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-        except requests.exceptions.ConnectionError as exc:
-            raise FailedToGetIP('Failed to get IP: connection error') from exc
-        except requests.exceptions.MissingSchema as exc:
-            logger.error(f'Failed to get IP: invalid URL. Value: ({url}). {exc}')
-            return None # Positive scenario - website is off
-        if response.status_code != 200:
-            logger.info(f'Expected server response (200) was not received.\
-                        Value: ({str(response.status_code)})')
-            return None # Positive scenario - response is not 200
-        if response is not None:
-            return response
+        with self._cache_lock:
+            now = time.monotonic()
+            if self._failure is not None and now < self._failure_expires:
+                raise FailedToGetIP(f'Cached failure: {self._failure}') from self._failure
+            if self._result is not None and now < self._result_expires:
+                return self._result._replace(cached=True)
         return None
 
+    def store_result(self, ipv4:IPv4, generation:int|None = None) -> IPLookupResult:
+        """
+        Saving a successful answer in the cache. The answer of a lookup
+        that started before "invalidate" is returned but not saved:
+        it may describe the network as it was before the change.
+
+        Parameters:
+            ipv4 (IPv4): the address received from a provider;
+            generation (int | None): "self._generation" at the start of
+                the lookup, None - always save.
 
-    def make_control(self, line_with_ip_address:str) -> Union[IPv4Address, None]:
+        Returns:
+            IPLookupResult: the same answer marked as fresh.
         """
-        Checking the contents of a variable to see if it contains an
-        IPv4 address and creating another variable based on this
-        variable with the IPv4Address data type.
+        result = IPLookupResult(ipv4=ipv4, cached=False, obtained_at=time.time())
+        with self._cache_lock:
+            if generation is not None and generation != self._generation:
+                logger.debug('The cache was invalidated during the lookup, '
+                             'its answer is not cached')
+                return result
+            self._failure = None
+            if self.cache_ttl > 0:
+                self._result = result
+                self._result_expires = time.monotonic() + self.cache_ttl
+            self._last_known = LastKnownIP(ipv4, result.obtained_at)
+        self.save_state()
+        return result
+
+    def store_failure(self, exc:FailedToGetIP, generation:int|None = None) -> None:
+        """
+        Saving a failed lookup, so that the providers are not asked
+        again during the "failure_ttl" back-off window. Like in
+        "store_result", a lookup that started before "invalidate"
+        is not saved.
 
         Parameters:
-            ip (str): external IPv4 address of the user.
+            exc (FailedToGetIP): the error raised by the lookup;
+            generation (int | None): "self._generation" at the start of
+                the lookup, None - always save.
+        """
+        with self._cache_lock:
+            stale = generation is not None and generation != self._generation
+            if not stale and self.failure_ttl > 0:
+                self._failure = exc
+                self._failure_expires = time.monotonic() + self.failure_ttl
+        self.save_state() # The statistics of the failed providers
+
+    def invalidate(self) -> None:
+        """
+        Forgetting the cached answer and the cached failure,
+        the next call of "get" asks the providers again. A lookup
+        already running is detached and its answer will not be cached.
+        """
+        with self._cache_lock:
+            self._result = None
+            self._failure = None
+            self._flight = None # A lookup already running may be out of date too
+            self._generation += 1
+
+    def last_known(self) -> Union[LastKnownIP, None]:
+        """
+        Returning the last address found, without asking the providers.
+        Unlike the cache it does not expire and may come from a previous
+        run (see "state_file"), so it should be shown as stale.
+
+        Returns:
+            LastKnownIP: the address and when it was obtained (time.time);
+            None: no address has been found yet.
+        """
+        with self._cache_lock:
+            return self._last_known
+
+    def save_state(self) -> None:
+        """
+        Scheduling a write of the last address and the provider statistics
+        to "state_file". The caller (also an event loop) does not wait for
+        the disk: the file is written on a background thread, at most once
+        per "state_interval" seconds, and the write saves the state as it
+        is at that moment, so the calls in between are merged into it.
+        Nothing is done without a state file.
+        """
+        if self.state_file is None:
+            return
+        with self._state_lock:
+            if self._state_timer is not None:
+                return # The scheduled write will take this state too
+            delay = max(self._state_written + self.state_interval - time.monotonic(), 0.0)
+            self._state_timer = threading.Timer(delay, self.flush_state)
+            self._state_timer.name = 'GetMyIP-state'
+            self._state_timer.daemon = True
+            self._state_timer.start()
+
+    def flush_state(self) -> None:
+        """
+        Writing the state scheduled by "save_state" at once, or waiting
+        for the write that is already running. Nothing is done if no
+        write is pending.
+        """
+        with self._state_write_lock:
+            with self._state_lock:
+                timer, self._state_timer = self._state_timer, None
+                if timer is None:
+                    return
+                # Counted from the start, the calls during the write wait for the interval
+                self._state_written = time.monotonic()
+            timer.cancel() # Nothing happens if the timer itself called this method
+            if not self.state_file.write(self.last_known(), self.health.snapshot()):
+                logger.warning('The state file {} could not be written', self.state_file.path)
+
+    def list_providers(self) -> list[Callable[[], Union[IPv4, None]]]:
+        """
+        Methods that return the external IPv4 address, in the order
+        in which they are called: the methods of every backend from
+        "self.backends", one backend after another.
+
+        Returns:
+            list: bound provider methods.
+        """
+        methods = []
+        for backend in self.backends:
+            if backend == 'http':
+                methods += self.list_http_providers()
+            elif backend == 'dns':
+                methods += [self.make_dns_method(resolver) for resolver in self.dns_resolvers]
+            elif backend == 'stun':
+                methods += [self.make_stun_method(server) for server in self.stun_servers]
+        return methods
+
+    def list_http_providers(self) -> list[Callable[[], Union[IPv4, None]]]:
+        """
+        Methods of the "http" backend. If the instance was created with
+        "providers", one method per provider record is returned.
+
+        Returns:
+            list: bound provider methods.
+        """
+        if self.providers is not None:
+            return [self.make_provider_method(provider) for provider in self.providers]
+        return [self.get_external_ipv4_1, self.get_external_ipv4_2,
+                self.get_external_ipv4_3]
+
+    def make_dns_method(self, resolver:DNSResolver) -> Callable[[], Union[IPv4, None]]:
+        """
+        Creating a provider method that asks a DNS server.
+
+        Parameters:
+            resolver (DNSResolver): server and name to ask.
+
+        Returns:
+            Callable: function without arguments, like "get_external_ipv4_1".
+        """
+        def get_from_dns():
+            return self.get_from_dns(resolver)
+        get_from_dns.__name__ = f'dns:{resolver.name}'
+        get_from_dns.provider_name = f'dns:{resolver.name}'
+        return get_from_dns
+
+    def get_from_dns(self, resolver:DNSResolver) -> Union[IPv4, None]:
+        """
+        Getting the external IPv4 address with one UDP DNS query.
+
+        Parameters:
+            resolver (DNSResolver): server and name to ask.
 
         Returns:
-            class 'ipaddress.IPv4Address': the user's external IPv4 address
-                in IPv4Address format after checking against this data type;
+            IPv4: external IPv4 address.
             None: if any error occurred.
         """
         try:
-            ipv4 = ip_address(line_with_ip_address)
-        except ValueError as exc:
-            logger.error(f'The variable does not contain an IP address.\
-                         Value: ({line_with_ip_address}). {exc}')
+            values = dns_ip.query(resolver, self.attempt_timeout_ms(self.dns_timeout_ms,
+                                                                    self.dns_retries),
+                                  self.dns_retries)
+        except dns_ip.DNSError as exc:
+            logger.error('Invalid answer of the DNS server {}. {}', resolver.name, exc)
             return None
-        try:
-            if ipv4.version == 4:
-                return ipv4 # Positive scenario
-        except AttributeError as exc:
-            logger.error(f'The variable does not contain an IPv4 address. Value: {ipv4}. {exc}')
+        except OSError as exc: # The next server may be reachable
+            logger.warning('The DNS server {} can not be reached. {}', resolver.name, exc)
+            return None
+        return self.control_dns_values(resolver, values)
+
+    def control_dns_values(self, resolver:DNSResolver,
+                           values:Union[list[str], None]) -> Union[IPv4, None]:
+        """
+        Choosing the address among the values of a DNS answer.
+
+        Parameters:
+            resolver (DNSResolver): the server that answered;
+            values (list | None): A addresses and TXT strings of the answer.
+
+        Returns:
+            IPv4: the first value that passed "make_control".
+            None: no suitable value.
+        """
+        if values is None:
+            logger.info('The DNS server {} did not answer in time', resolver.name)
             return None
+        for value in values:
+            ipv4 = self.make_control(value.strip())
+            if ipv4 is not None:
+                return ipv4
         return None
 
+    def make_stun_method(self, server:STUNServer) -> Callable[[], Union[IPv4, None]]:
+        """
+        Creating a provider method that asks a STUN server.
+
+        Parameters:
+            server (STUNServer): server to ask.
+
+        Returns:
+            Callable: function without arguments, like "get_external_ipv4_1".
+        """
+        def get_from_stun():
+            return self.get_from_stun(server)
+        get_from_stun.__name__ = f'stun:{server.name}'
+        get_from_stun.provider_name = f'stun:{server.name}'
+        return get_from_stun
 
-    def get_external_ipv4_1(self) -> Union[IPv4Address, None]:
+    def get_from_stun(self, server:STUNServer) -> Union[IPv4, None]:
         """
-        Request to site 1 to get the device's external IPv4 address.
+        Getting the external IPv4 address with a STUN Binding Request.
+
+        Parameters:
+            server (STUNServer): server to ask.
 
         Returns:
-            IPv4Address: external IPv4 address.
+            IPv4: external IPv4 address.
             None: if any error occurred.
         """
-        url = 'http://checkip.dyndns.org'
-        def do_parsing(response):
-            try:
-                soup = BeautifulSoup(response.text, 'html.parser')
-            except AttributeError as exc:
-                logger.error(f'{exc}')
-                return None
-            find = soup.find('body')
-            if find is None:
-                logger.error('The parsing function returned None')
-                return None
-            find_string = find.text
-            prefix = 'Current IP Address: '
-            ipv4 = find_string.replace(prefix, "")
-            return ipv4
-        response = self.make_requests(url)
-        if response is None:
+        try:
+            mapped = stun_ip.query(server, self.attempt_timeout_ms(self.stun_timeout_ms,
+                                                                   self.stun_retries),
+                                   self.stun_retries)
+        except stun_ip.STUNError as exc:
+            logger.error('Invalid answer of the STUN server {}. {}', server.name, exc)
             return None
-        ipv4 = do_parsing(response)
-        if ipv4 is None:
+        except OSError as exc: # The next server may be reachable
+            logger.warning('The STUN server {} can not be reached. {}', server.name, exc)
             return None
-        ipv4 = self.make_control(ipv4)
-        return ipv4
+        if mapped is None:
+            logger.info('The STUN server {} did not answer in time', server.name)
+            return None
+        return self.make_control(mapped[0])
+
+    def make_provider_method(self, provider:Provider) -> Callable[[], Union[IPv4, None]]:
+        """
+        Creating a provider method from a declarative provider record.
 
+        Parameters:
+            provider (Provider): provider record.
 
-    def get_external_ipv4_2(self) -> Union[IPv4Address, None]:
+        Returns:
+            Callable: function without arguments, like "get_external_ipv4_1".
         """
-        Request to site 1 to get the device's external IPv4 address.
+        def get_from_provider():
+            return self.get_from_provider(provider)
+        get_from_provider.__name__ = provider.name
+        get_from_provider.provider_name = provider.name
+        get_from_provider.provider_weight = provider.weight
+        return get_from_provider
+
+    def get_from_provider(self, provider:Provider,
+                          control:Callable[[str], Union[IPv4, IPv6Address, None]]|None = None
+                          ) -> Union[IPv4, IPv6Address, None]:
+        """
+        Request to a provider described by a record. The answer is read
+        only up to "byte_budget" bytes (for a "regex" provider - only until
+        the pattern matches).
+
+        Parameters:
+            provider (Provider): provider record;
+            control (Callable | None): check of the found address,
+                "make_control" by default, "make_control6" for IPv6.
 
         Returns:
-            IPv4Address: external IPv4 address.
+            IPv4: external IPv4 address.
             None: if any error occurred.
         """
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)\
-            AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-            }
-        url = 'https://www.ipaddress.com'
-        def do_parsing(response):
-            try:
-                soup = BeautifulSoup(response, 'html.parser')
-            except AttributeError as exc:
-                logger.error(f'{exc}')
-                return None
-            find = soup.find('div', {'id' : 'ipv4'})
-            if find is None:
-                logger.error('The parsing function returned None')
-                return None
-            find_string = find.text
-            prefix = 'My IPv4 Address'
-            ipv4 = find_string.replace(prefix, "")
-            return ipv4
-        response = self.make_requests(url, headers)
-        if response is not None:
-            response = response.content
-        else:
+        control = control if control is not None else self.make_control
+        response = self.make_requests(provider.url, provider.headers, stream=True)
+        if response is None:
             return None
-        ipv4 = do_parsing(response)
+        with response:
+            try:
+                chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+                if provider.extractor == providers.REGEX:
+                    ipv4, _ = extract.scan_chunks(
+                            chunks, providers.compile_pattern(provider), self.byte_budget)
+                    return None if ipv4 is None else control(ipv4)
+                page = bytearray()
+                for chunk in chunks:
+                    page += chunk
+                    if len(page) >= self.byte_budget:
+                        break
+            except requests.exceptions.RequestException as exc:
+                raise FailedToGetIP('Failed to get IP: connection error') from exc
+        ipv4 = providers.extract_address(provider, bytes(page))
         if ipv4 is None:
             return None
-        ipv4 = self.make_control(ipv4)
+        return control(ipv4)
+
+    def provider_name(self, func:Callable) -> str:
+        """
+        Name under which the health statistics of a provider are kept.
+        The blocking and the asynchronous method of the same site share
+        one name ("aget_external_ipv4_1" -> "get_external_ipv4_1").
+
+        Parameters:
+            func (Callable): provider method.
+
+        Returns:
+            str: provider name.
+        """
+        if hasattr(func, 'provider_name'):
+            return func.provider_name
+        if asyncio.iscoroutinefunction(func):
+            return func.__name__.removeprefix('a')
+        return func.__name__
+
+    def provider_weight(self, func:Callable) -> float:
+        """
+        Weight of a provider method (Provider.weight), 1 for the methods
+        that are not made from a Provider record.
+
+        Parameters:
+            func (Callable): provider method.
+
+        Returns:
+            float: weight.
+        """
+        return getattr(func, 'provider_weight', 1.0)
+
+    def ordered_providers(self) -> list[Callable[[], Union[IPv4, None]]]:
+        """
+        Provider methods in the order they should be called now: the
+        fastest healthy provider first, the ones with an open circuit
+        breaker left out. Without "adaptive" the order of "list_providers".
+
+        Returns:
+            list: bound provider methods.
+        """
+        if not self.adaptive:
+            return self.list_providers()
+        return self.health.order(self.list_providers(), self.provider_name,
+                                 self.provider_weight)
+
+    def call_provider(self, func:Callable[[], Union[IPv4, None]],
+                      until:float|None = None) -> Union[IPv4, None]:
+        """
+        Calling a provider method and saving its latency and result
+        in the health statistics.
+
+        Parameters:
+            func (Callable): provider method;
+            until (float | None): time (time.monotonic) by which the call
+                must end, its requests get shorter timeouts to meet it.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if the provider did not give an address.
+        """
+        name = self.provider_name(func)
+        token = _current_call.set(_ProviderCall(name, until))
+        self.health.begin(name)
+        started = time.monotonic()
+        try:
+            ipv4 = func()
+        except Exception:
+            self.health.record_failure(name, time.monotonic() - started)
+            raise
+        finally:
+            _current_call.reset(token)
         if ipv4 is None:
-            return None
+            self.health.record_failure(name, time.monotonic() - started)
+        else:
+            self.health.record_success(name, time.monotonic() - started)
         return ipv4
 
+    def attempt_deadline(self, func:Callable, until:float|None,
+                         remaining:int = 1) -> Union[float, None]:
+        """
+        The part of the deadline of a lookup given to one provider: an
+        equal share of the time left among the providers not asked yet,
+        or the read timeout of the provider if it is longer and its answer
+        times are known (a provider that usually answers in time is not
+        cut short), but never beyond the deadline of the lookup.
+
+        Parameters:
+            func (Callable): provider method;
+            until (float | None): deadline (time.monotonic) of the lookup;
+            remaining (int): providers left, including this one.
+
+        Returns:
+            float: time (time.monotonic) by which the call must end;
+            None: the lookup has no deadline.
+
+        Exceptions:
+            DeadlineExceeded: the deadline has already passed.
+        """
+        if until is None:
+            return None
+        now = time.monotonic()
+        if now >= until:
+            raise DeadlineExceeded('No IPv4 address within the deadline')
+        share = (until - now) / max(remaining, 1)
+        name = self.provider_name(func)
+        if self.adaptive and self.health.percentile(name, 0.99) is not None:
+            share = max(share, self.health.timeouts(name)[1])
+        return min(until, now + share)
 
-    def get_external_ipv4_3(self) -> Union[IPv4Address, None]:
+    def request_timeouts(self) -> tuple[float, float]:
         """
-        Request to site 1 to get the device's external IPv4 address.
+        Timeouts of a request made by the provider being called: derived
+        from its answer times (see HealthTracker.timeouts) when "adaptive"
+        is set, "max_timeout" of the tracker otherwise, and cut to the
+        time left before the end of the call.
 
         Returns:
-            IPv4Address: external IPv4 address.
-            None: if any error occurred.
+            tuple: connect and read timeouts in seconds.
         """
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)\
-            AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-            }
-        url = 'https://www.iplocation.net'
-        def do_parsing(response):
-            try:
-                soup = BeautifulSoup(response, 'html.parser')
-            except AttributeError as exc:
-                logger.error(f'{exc}')
-                return None
-            find = soup.find('span', class_ = 'home-ip')
-            if find is None:
-                logger.error('The parsing function returned None')
-                return None
-            ipv4 = find.text
-            return ipv4
-        response = self.make_requests(url, headers)
-        if response is not None:
-            response = response.content
+        call = _current_call.get()
+        if call is not None and self.adaptive:
+            connect, read = self.health.timeouts(call.name)
         else:
-            return None
-        ipv4 = do_parsing(response)
-        if ipv4 is None:
-            return None
-        ipv4 = self.make_control(ipv4)
-        if ipv4 is None:
-            return None
-        return ipv4
+            connect = read = self.health.max_timeout
+        if call is not None and call.until is not None:
+            left = max(call.until - time.monotonic(), 0.001)
+            connect, read = min(connect, left), min(read, left)
+        return connect, read
+
+    def attempt_timeout_ms(self, timeout_ms:int, retries:int) -> int:
+        """
+        Timeout of one attempt of a DNS or STUN query: "timeout_ms", or
+        less if all the attempts would not fit in the time left before
+        the end of the call.
 
+        Parameters:
+            timeout_ms (int): the usual timeout of an attempt;
+            retries (int): attempts after the first one.
+
+        Returns:
+            int: milliseconds.
+        """
+        call = _current_call.get()
+        if call is None or call.until is None:
+            return timeout_ms
+        left_ms = (call.until - time.monotonic()) * 1000
+        return max(1, min(timeout_ms, int(left_ms / (retries + 1))))
+
+    def get(self, deadline:float|None = None) -> Union[IPv4, None]:
+        """
+        Getting the external IPv4 address. The answer is taken from the
+        cache when it is still valid, otherwise the providers are asked
+        (see "lookup").
+
+        Parameters:
+            deadline (float | None): seconds to wait for the answer,
+                "self.deadline" by default.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        return self.lookup(deadline).ipv4
+
+
+    def lookup(self, deadline:float|None = None) -> IPLookupResult:
+        """
+        Getting the external IPv4 address together with the information
+        whether it came from the cache. A successful answer is cached
+        for "cache_ttl" seconds, a FailedToGetIP for "failure_ttl" seconds;
+        while a failure is cached it is raised again without asking the providers.
+        With "coalesce" the callers that arrive while a lookup is running
+        (in any thread or event loop) wait for it and get the same answer
+        or the same FailedToGetIP.
+        With a deadline the time is split among the providers (see
+        "attempt_deadline") and the call returns or raises DeadlineExceeded
+        when it expires, even if a request is still running.
+
+        Parameters:
+            deadline (float | None): seconds to wait for the answer,
+                "self.deadline" by default.
+
+        Returns:
+            IPLookupResult: address, "cached" flag and the time it was obtained.
+
+        Exceptions:
+            FailedToGetIP: no provider returned an IPv4 address;
+            DeadlineExceeded: no provider returned it within the deadline.
+        """
+        cached = self.get_cached()
+        if cached is not None:
+            return cached
+        deadline = self.deadline if deadline is None else deadline
+        if deadline is None:
+            return self.lookup_shared()
+        until = time.monotonic() + deadline
+        return self.call_within(until, self.lookup_shared, until)
+
+
+    def call_within(self, until:float, func:Callable, *args):
+        """
+        Running a blocking call on a helper thread and waiting for it no
+        longer than "until". The timeouts of its requests already aim at
+        the deadline; a request that still hangs past it is left to end
+        (and fill the cache) in the background. The helper threads are
+        kept between the calls, at most DEADLINE_WORKERS of them; "close"
+        lets them end.
+
+        Parameters:
+            until (float): deadline (time.monotonic);
+            func (Callable): the call;
+            args: its arguments.
+
+        Returns:
+            The result of the call.
+
+        Exceptions:
+            DeadlineExceeded: the call did not end before the deadline.
+        """
+        with self._session_lock:
+            if self._deadline_executor is None:
+                self._deadline_executor = ThreadPoolExecutor(
+                        max_workers=DEADLINE_WORKERS, thread_name_prefix='GetMyIP-deadline')
+            future = self._deadline_executor.submit(func, *args)
+        try:
+            return future.result(timeout=max(until - time.monotonic(), 0))
+        except FutureTimeoutError:
+            raise DeadlineExceeded('No IPv4 address within the deadline') from None
+
+
+    def lookup_shared(self, until:float|None = None) -> IPLookupResult:
+        """
+        Asking the providers or, with "coalesce", joining the lookup
+        that is already running.
+
+        Parameters:
+            until (float | None): deadline (time.monotonic) of the lookup.
+
+        Returns:
+            IPLookupResult: the fresh answer.
+        """
+        if not self.coalesce:
+            return self.lookup_uncached(until)
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        with self._cache_lock:
+            flight = self._flight
+            if flight is None:
+                flight = self._flight = _Flight()
+                leader = True
+            elif flight.loop is not None and flight.loop is running_loop:
+                # Blocking here would stop the loop that runs the lookup
+                flight, leader = None, False
+            else:
+                flight.waiters += 1
+                leader = False
+        if flight is None:
+            return self.lookup_uncached(until)
+        if not leader:
+            try:
+                return flight.future.result()
+            except DeadlineExceeded:
+                if until is not None and time.monotonic() >= until:
+                    raise
+                # The joined lookup had a shorter deadline than this caller
+                return self.lookup_shared(until)
+        try:
+            result = self.lookup_uncached(until)
+        except BaseException as exc:
+            self.finish_flight(flight, exception=exc)
+            raise
+        self.finish_flight(flight, result)
+        return result
+
+
+    def lookup_uncached(self, until:float|None = None) -> IPLookupResult:
+        """
+        One lookup without joining other callers: asking the providers
+        and saving the answer (or the failure) in the cache. A missed
+        deadline is not cached: it says nothing about the providers.
+
+        Parameters:
+            until (float | None): deadline (time.monotonic) of the lookup.
+
+        Returns:
+            IPLookupResult: the fresh answer.
+        """
+        generation = self._generation
+        try:
+            ipv4 = self.find(until)
+        except DeadlineExceeded:
+            raise
+        except FailedToGetIP as exc:
+            self.store_failure(exc, generation)
+            raise
+        return self.store_result(ipv4, generation)
+
+
+    def finish_flight(self, flight:_Flight, result:IPLookupResult|None = None,
+                      exception:BaseException|None = None) -> None:
+        """
+        Passing the outcome of a shared lookup to the callers waiting
+        for it. The lookup is removed first, so a caller arriving
+        afterwards does not get a finished one.
+
+        Parameters:
+            flight (_Flight): the lookup;
+            result (IPLookupResult | None): its answer;
+            exception (BaseException | None): or its error.
+        """
+        with self._cache_lock:
+            if self._flight is flight:
+                self._flight = None
+        if flight.future.done():
+            return
+        if isinstance(exception, (asyncio.CancelledError, CancelledError)):
+            flight.future.cancel()
+        elif exception is not None:
+            flight.future.set_exception(exception)
+        else:
+            flight.future.set_result(result)
+
+
+    def find(self, until:float|None = None) -> IPv4:
+        """
+        Asking the providers, bypassing the cache. Depending on "self.race"
+        the work is passed to "get_racing" or "get_sequential".
+
+        Parameters:
+            until (float | None): deadline (time.monotonic) of the lookup.
+
+        Returns:
+            IPv4: external IPv4 address.
+        """
+        if self.race:
+            return self.get_racing(until)
+        return self.get_sequential(until)
+
+
+    def get_sequential(self, until:float|None = None) -> IPv4:
+        """
+        Sequentially calling other class methods to get the external
+        IP address. If one of the called methods returns None, the next
+        method is requested until the current external
+        IPv4 address is obtained. The order is given by "ordered_providers".
+
+        Parameters:
+            until (float | None): deadline (time.monotonic), split among
+                the providers by "attempt_deadline".
+
+        Returns:
+            IPv4: external IPv4 address.
+        """
+        providers = self.ordered_providers()
+        for index, func in enumerate(providers):
+            attempt_until = self.attempt_deadline(func, until, len(providers) - index)
+            try:
+                ipv4 = self.call_provider(func, attempt_until)
+            except FailedToGetIP as exc:
+                logger.warning('Method {} returned an error: {}', func.__name__, exc)
+                raise
+            except Exception as exc:
+                logger.error('An unknown error was found in the method {}: {}',
+                             func.__name__, exc)
+                raise
+            if ipv4 is not None:
+                return ipv4
+            logger.warning('Failed one attempt to find an IPv4 address')
+        if until is not None and time.monotonic() >= until:
+            # The last providers had no time left to answer
+            raise DeadlineExceeded('No IPv4 address within the deadline')
+        raise FailedToGetIP('All attempts to get an IPv4 address failed:\
+                            all methods returned None')
+
+
+    def get_racing(self, until:float|None = None) -> IPv4:
+        """
+        Calling the providers in parallel on a thread pool. The first
+        answer that passed "make_control" is returned, the calls that have
+        not started yet are cancelled. Unlike "get_sequential", an error of
+        one provider does not stop the search.
+        A blocking request can not be interrupted, so the requests already
+        sent by the losers run on in the background until they are answered
+        or reach their timeouts (see "request_timeouts"), no longer than
+        "health.max_timeout" seconds or the deadline. Their answers are
+        not waited for, but still go into the health statistics. The shared
+        session is not closed for them: other lookups may be using it.
+
+        Parameters:
+            until (float | None): deadline (time.monotonic), every provider
+                may use all the time left.
+
+        Returns:
+            IPv4: external IPv4 address.
+
+        Exceptions:
+            FailedToGetIP: there are no providers, or none of them returned an address.
+        """
+        providers = self.ordered_providers()[:self.race_width]
+        if not providers: # ThreadPoolExecutor needs at least one worker
+            raise FailedToGetIP('All attempts to get an IPv4 address failed:\
+                                there are no providers')
+        executor = ThreadPoolExecutor(max_workers=len(providers),
+                                      thread_name_prefix='GetMyIP')
+        futures = {executor.submit(self.call_provider, func, until): func for func in providers}
+        try:
+            for future in as_completed(futures, timeout=None if until is None
+                                       else max(until - time.monotonic(), 0)):
+                func = futures[future]
+                try:
+                    ipv4 = future.result()
+                except FailedToGetIP as exc:
+                    logger.warning('Method {} returned an error: {}', func.__name__, exc)
+                    continue
+                except Exception as exc:
+                    logger.error('An unknown error was found in the method {}: {}',
+                                 func.__name__, exc)
+                    continue
+                if ipv4 is not None:
+                    return ipv4
+                logger.warning('Failed one attempt to find an IPv4 address')
+        except FutureTimeoutError:
+            raise DeadlineExceeded('No IPv4 address within the deadline') from None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        raise FailedToGetIP('All attempts to get an IPv4 address failed:\
+                            no provider won the race')
+
+
+    def list_ipv6_providers(self) -> list[Callable[[], Union[IPv6Address, None]]]:
+        """
+        Methods of the IPv6 lookup, one per record of "ipv6_providers",
+        in the order of the health statistics when "adaptive" is set.
+
+        Returns:
+            list: provider methods.
+        """
+        methods = [self.make_ipv6_method(provider) for provider in self.ipv6_providers]
+        if not self.adaptive:
+            return methods
+        return self.health.order(methods, self.provider_name, self.provider_weight)
+
+
+    def make_ipv6_method(self, provider:Provider) -> Callable[[], Union[IPv6Address, None]]:
+        """
+        Creating a provider method that asks a site for the IPv6 address.
+
+        Parameters:
+            provider (Provider): provider record.
+
+        Returns:
+            Callable: function without arguments, like "get_external_ipv4_1".
+        """
+        def get_from_provider():
+            return self.get_from_provider(provider, self.make_control6)
+        get_from_provider.__name__ = f'ipv6:{provider.name}'
+        get_from_provider.provider_name = f'ipv6:{provider.name}'
+        get_from_provider.provider_weight = provider.weight
+        return get_from_provider
+
+
+    def find_ipv6(self) -> IPv6Address:
+        """
+        Asking the IPv6 providers one after another, bypassing the cache.
+        Unlike "get_sequential", a connection error does not stop the
+        search: without an IPv6 route every provider fails at once.
+
+        Returns:
+            IPv6Address: external IPv6 address.
+
+        Exceptions:
+            FailedToGetIP: no provider returned an IPv6 address.
+        """
+        for func in self.list_ipv6_providers():
+            try:
+                ipv6 = self.call_provider(func)
+            except FailedToGetIP as exc:
+                logger.info('Method {} returned an error: {}', func.__name__, exc)
+                continue
+            if ipv6 is not None:
+                return ipv6
+        raise FailedToGetIP('All attempts to get an IPv6 address failed')
+
+
+    def get_dual(self) -> DualStackResult:
+        """
+        Getting the external IPv4 and IPv6 addresses concurrently, on two
+        threads. Each family has its own timeout, so a missing IPv6 route
+        never delays the IPv4 answer. As in "happy eyeballs", once the IPv4
+        lookup is over the IPv6 lookup gets only "ipv6_grace" seconds more,
+        so the total time stays close to the time of the IPv4 lookup.
+        The IPv4 address is taken from the cache like in "get".
+
+        Returns:
+            DualStackResult: both addresses, None for a family without an answer.
+        """
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='GetMyIP-dual')
+        started = time.monotonic()
+        futures = {executor.submit(self.get): 4, executor.submit(self.find_ipv6): 6}
+        deadlines = {4: started + self.ipv4_timeout, 6: started + self.ipv6_timeout}
+        addresses = {4: None, 6: None}
+        pending = set(futures)
+        try:
+            while pending:
+                now = time.monotonic()
+                for future in [future for future in pending if deadlines[futures[future]] <= now]:
+                    logger.warning('No IPv{} address within the timeout', futures[future])
+                    pending.discard(future)
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED,
+                                     timeout=min(deadlines[futures[future]]
+                                                 for future in pending) - now)
+                for future in done:
+                    family = futures[future]
+                    try:
+                        addresses[family] = future.result()
+                    except FailedToGetIP as exc:
+                        logger.warning('Failed to get the IPv{} address: {}', family, exc)
+                    except Exception as exc:
+                        logger.error('An unknown error was found in the IPv{} lookup: {}', family, exc)
+                    if family == 4 and self.ipv6_grace is not None:
+                        deadlines[6] = min(deadlines[6], time.monotonic() + self.ipv6_grace)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return DualStackResult(addresses[4], addresses[6])
+
+
+    def bound_to(self, source_address:str, interface:str|None = None) -> 'GetMyIP':
+        """
+        Creating an instance with the same providers and lookup settings
+        whose requests leave from "source_address". It has its own session,
+        cache and health statistics: every interface is a different path.
+
+        Parameters:
+            source_address (str): local IPv4 address;
+            interface (str | None): name of its interface, the blocking
+                requests are also bound to it (see "source_interface").
+
+        Returns:
+            GetMyIP: the bound instance.
+        """
+        return GetMyIP(race=self.race, race_width=self.race_width,
+                       pool_size=self.pool_size, idle_timeout=self.idle_timeout,
+                       byte_budget=self.byte_budget, adaptive=self.adaptive,
+                       providers=self.providers, provider_urls=self.provider_urls,
+                       coalesce=self.coalesce, source_address=source_address,
+                       source_interface=interface, proxy=self.proxy,
+                       deadline=self.deadline)
+
+
+    def get_per_interface(self, interfaces:Iterable[Interface]|None = None,
+                          timeout:float|None = None) -> dict[str, Union[IPv4, None]]:
+        """
+        Getting the external address of the traffic of every local
+        interface. One lookup bound to the address of each interface runs
+        on its own thread, so the total time is close to the time of the
+        slowest interface. Different addresses mean that the traffic of
+        some interfaces goes around the VPN (split tunnelling).
+
+        The lookups are bound to the interface with SO_BINDTODEVICE where
+        the system allows it. Otherwise only the source address is bound,
+        and the result is right only if the system routes by the source
+        address; a warning is logged then. An instance whose lookup has
+        not ended within "timeout" is closed when the lookup ends.
+
+        Parameters:
+            interfaces (Iterable[Interface] | None): interfaces to check, by
+                default all interfaces with an IPv4 address except loopback;
+            timeout (float | None): seconds to wait for all interfaces.
+
+        Returns:
+            dict: interface name -> external IPv4 address, None if the
+                lookup through the interface failed or did not end in time.
+        """
+        interfaces = list_interfaces() if interfaces is None else list(interfaces)
+        results: dict[str, Union[IPv4, None]] = {interface.name: None
+                                                 for interface in interfaces}
+        if not interfaces:
+            return results
+        searches = {}
+        for interface in interfaces:
+            device = interface.name if can_bind_to_device(interface.name) else None
+            if device is None:
+                logger.warning('The lookup through {} can not be bound to the interface, '
+                               'only to its address {}: the result is right only with '
+                               'source-based routing', interface.name, interface.address)
+            searches[interface.name] = self.bound_to(interface.address, device)
+        executor = ThreadPoolExecutor(max_workers=len(searches),
+                                      thread_name_prefix='GetMyIP-interface')
+        futures = {executor.submit(search.get): name for name, search in searches.items()}
+        try:
+            done, not_done = wait(futures, timeout=timeout)
+            for future in not_done:
+                logger.warning('No answer through the interface {} within the timeout',
+                               futures[future])
+            for future in done:
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except FailedToGetIP as exc:
+                    logger.warning('Failed to get the IP through the interface {}: {}', name, exc)
+                except Exception as exc:
+                    logger.error('An unknown error was found in the lookup through {}: {}',
+                                 name, exc)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future, name in futures.items():
+                # At once if the lookup is over, otherwise when it ends
+                future.add_done_callback(lambda _, search=searches[name]: search.close())
+        return results
+
+
+    def make_requests(self, url:str, headers:dict|None = None,
+                      stream:bool = False) -> Union[requests.Response, None]:
+        """
+        Receiving a response and checking the result. The timeouts
+        follow the provider being called (see "request_timeouts").
+
+        Parameters:
+            url (str): a string containing a link to the site that will be
+                subsequently processed by this method;
+            headers (dict | None): additional information for the http request,
+                in this case the "User-Agent" header;
+            stream (bool): do not download the body in advance, the caller
+                reads it in chunks and must close the response.
+
+        Returns:
+            class 'requests.model.Response': HTTP response body and other supporting information;
+            None: if any error occurred.
+        """
+        try:
+            response = self.get_session().get(url, headers=headers,
+                                              timeout=self.request_timeouts(), stream=stream)
+        except requests.exceptions.Timeout as exc:
+            logger.info('No answer within the timeout. Value: ({}). {}', url, exc)
+            return None # The next provider gets the rest of the time
+        except requests.exceptions.ConnectionError as exc:
+            raise FailedToGetIP('Failed to get IP: connection error') from exc
+        except requests.exceptions.InvalidSchema as exc: # SOCKS without PySocks
+            raise FailedToGetIP(f'Failed to get IP: {exc}') from exc
+        except requests.exceptions.MissingSchema as exc:
+            logger.error('Failed to get IP: invalid URL. Value: ({}). {}', url, exc)
+            return None # Positive scenario - website is off
+        if response.status_code != 200:
+            logger.info('Expected server response (200) was not received. Value: ({})',
+                        response.status_code)
+            response.close()
+            return None # Positive scenario - response is not 200
+        if response is not None:
+            return response
+        return None
+
+
+    def make_control(self, line_with_ip_address:str) -> Union[IPv4, None]:
+        """
+        Checking the contents of a variable to see if it contains an
+        IPv4 address and creating another variable based on this
+        variable with the IPv4 data type (see the "ipv4" module).
+
+        Parameters:
+            ip (str): external IPv4 address of the user.
+
+        Returns:
+            class 'ipv4.IPv4': the user's external IPv4 address
+                after checking against this data type;
+            None: if any error occurred.
+        """
+        ipv4 = IPv4.parse(line_with_ip_address)
+        if ipv4 is not None:
+            return ipv4 # Positive scenario
+        if isinstance(line_with_ip_address, str) and ':' in line_with_ip_address:
+            logger.error('The variable does not contain an IPv4 address. Value: ({})',
+                         line_with_ip_address)
+        else:
+            logger.error('The variable does not contain an IP address. Value: ({})',
+                         line_with_ip_address)
+        return None
+
+
+    def make_control6(self, line_with_ip_address:str) -> Union[IPv6Address, None]:
+        """
+        The same as "make_control" for an IPv6 address.
+        IPv4-mapped addresses ("::ffff:1.2.3.4") are rejected: the
+        answer came over IPv4.
+
+        Parameters:
+            line_with_ip_address (str): external IPv6 address of the user.
+
+        Returns:
+            IPv6Address: the user's external IPv6 address;
+            None: if any error occurred.
+        """
+        if not isinstance(line_with_ip_address, str) or ':' not in line_with_ip_address:
+            logger.error('The variable does not contain an IPv6 address. Value: ({})',
+                         line_with_ip_address)
+            return None
+        try:
+            ipv6 = IPv6Address(line_with_ip_address)
+        except ValueError as exc:
+            logger.error('The variable does not contain an IPv6 address. Value: ({}). {}',
+                         line_with_ip_address, exc)
+            return None
+        if ipv6.ipv4_mapped is not None:
+            logger.error('The IPv6 address is a mapped IPv4 address. Value: ({})', ipv6)
+            return None
+        return ipv6
+
+
+    def parse_page_1(self, page:Union[bytes, str]) -> Union[str, None]:
+        """
+        Extracting the IPv4 address string from the page of site 1.
+
+        Parameters:
+            page (bytes | str): body of the HTTP response.
+
+        Returns:
+            str: text that should contain the IPv4 address;
+            None: if any error occurred.
+        """
+        try:
+            soup = BeautifulSoup(page, 'html.parser')
+        except AttributeError as exc:
+            logger.error('{}', exc)
+            return None
+        find = soup.find('body')
+        if find is None:
+            logger.error('The parsing function returned None')
+            return None
+        find_string = find.text
+        prefix = 'Current IP Address: '
+        ipv4 = find_string.replace(prefix, "")
+        return ipv4
+
+
+    def parse_page_2(self, page:Union[bytes, str]) -> Union[str, None]:
+        """
+        Extracting the IPv4 address string from the page of site 2.
+
+        Parameters:
+            page (bytes | str): body of the HTTP response.
+
+        Returns:
+            str: text that should contain the IPv4 address;
+            None: if any error occurred.
+        """
+        try:
+            soup = BeautifulSoup(page, 'html.parser')
+        except AttributeError as exc:
+            logger.error('{}', exc)
+            return None
+        find = soup.find('div', {'id' : 'ipv4'})
+        if find is None:
+            logger.error('The parsing function returned None')
+            return None
+        find_string = find.text
+        prefix = 'My IPv4 Address'
+        ipv4 = find_string.replace(prefix, "")
+        return ipv4
+
+
+    def parse_page_3(self, page:Union[bytes, str]) -> Union[str, None]:
+        """
+        Extracting the IPv4 address string from the page of site 3.
+
+        Parameters:
+            page (bytes | str): body of the HTTP response.
+
+        Returns:
+            str: text that should contain the IPv4 address;
+            None: if any error occurred.
+        """
+        try:
+            soup = BeautifulSoup(page, 'html.parser')
+        except AttributeError as exc:
+            logger.error('{}', exc)
+            return None
+        find = soup.find('span', class_ = 'home-ip')
+        if find is None:
+            logger.error('The parsing function returned None')
+            return None
+        ipv4 = find.text
+        return ipv4
+
+
+    def process_page(self, page:Union[bytes, str, None],
+                     parser:Callable[[Union[bytes, str]], Union[str, None]],
+                     pattern:re.Pattern|None = None) -> Union[IPv4, None]:
+        """
+        Finding the address in a downloaded page and checking the result
+        with "make_control". The fast byte pattern is tried first, the
+        BeautifulSoup parser is used only when the pattern misses.
+        Without a pattern only the parser is used (the fallback of the
+        streamed reading).
+
+        Parameters:
+            page (bytes | str | None): body of the HTTP response;
+            parser: one of the "parse_page_N" methods;
+            pattern (re.Pattern | None): fast pattern from the "extract" module.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        if page is None:
+            return None
+        if pattern is not None:
+            ipv4 = extract.search_bytes(pattern, page, self.byte_budget)
+            if ipv4 is not None:
+                ipv4 = self.make_control(ipv4)
+                if ipv4 is not None:
+                    return ipv4
+            logger.info('The fast extraction missed, parsing the whole page')
+        ipv4 = parser(page)
+        if ipv4 is None:
+            return None
+        return self.make_control(ipv4)
+
+
+    def process_response(self, response:requests.Response,
+                         parser:Callable[[Union[bytes, str]], Union[str, None]],
+                         pattern:re.Pattern) -> Union[IPv4, None]:
+        """
+        Reading a streamed response in chunks until the fast pattern finds
+        the address or "byte_budget" bytes have been read. The rest of the
+        page is not downloaded. If the pattern misses, the remaining body
+        is read and the page is given to the BeautifulSoup parser.
+
+        Parameters:
+            response (requests.Response): response opened with stream=True;
+            parser: one of the "parse_page_N" methods;
+            pattern (re.Pattern): fast pattern from the "extract" module.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        with response:
+            try:
+                chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+                ipv4, page = extract.scan_chunks(chunks, pattern, self.byte_budget)
+                if ipv4 is not None:
+                    ipv4 = self.make_control(ipv4)
+                    if ipv4 is not None:
+                        return ipv4
+                logger.info('The fast extraction missed, parsing the whole page')
+                page += b''.join(chunks)
+            except requests.exceptions.RequestException as exc:
+                raise FailedToGetIP('Failed to get IP: connection error') from exc
+        return self.process_page(page, parser)
+
+
+    def get_external_ipv4_1(self) -> Union[IPv4, None]:
+        """
+        Request to site 1 to get the device's external IPv4 address.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        response = self.make_requests(self.provider_urls[0], stream=True)
+        if response is None:
+            return None
+        return self.process_response(response, self.parse_page_1,
+                                     extract.CHECKIP_PATTERN)
+
+
+    def get_external_ipv4_2(self) -> Union[IPv4, None]:
+        """
+        Request to site 2 to get the device's external IPv4 address.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        response = self.make_requests(self.provider_urls[1], BROWSER_HEADERS, stream=True)
+        if response is None:
+            return None
+        return self.process_response(response, self.parse_page_2,
+                                     extract.IPADDRESS_COM_PATTERN)
+
+
+    def get_external_ipv4_3(self) -> Union[IPv4, None]:
+        """
+        Request to site 3 to get the device's external IPv4 address.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        response = self.make_requests(self.provider_urls[2], BROWSER_HEADERS, stream=True)
+        if response is None:
+            return None
+        return self.process_response(response, self.parse_page_3,
+                                     extract.IPLOCATION_PATTERN)
+
+
+    def alist_providers(self) -> list[Callable[[], Awaitable[Union[IPv4, None]]]]:
+        """
+        Asynchronous provider methods, in the same order as "list_providers".
+
+        Returns:
+            list: bound coroutine methods.
+        """
+        methods = []
+        for backend in self.backends:
+            if backend == 'http':
+                methods += self.alist_http_providers()
+            elif backend == 'dns':
+                methods += [self.amake_dns_method(resolver) for resolver in self.dns_resolvers]
+            elif backend == 'stun':
+                methods += [self.amake_stun_method(server) for server in self.stun_servers]
+        return methods
+
+
+    def alist_http_providers(self) -> list[Callable[[], Awaitable[Union[IPv4, None]]]]:
+        """
+        Asynchronous counterpart of "list_http_providers".
+
+        Returns:
+            list: bound coroutine methods.
+        """
+        if self.providers is not None:
+            return [self.amake_provider_method(provider) for provider in self.providers]
+        return [self.aget_external_ipv4_1, self.aget_external_ipv4_2,
+                self.aget_external_ipv4_3]
+
+
+    def amake_dns_method(self, resolver:DNSResolver
+                         ) -> Callable[[], Awaitable[Union[IPv4, None]]]:
+        """
+        Asynchronous counterpart of "make_dns_method".
+
+        Parameters:
+            resolver (DNSResolver): server and name to ask.
+
+        Returns:
+            Callable: coroutine function without arguments.
+        """
+        async def aget_from_dns():
+            return await self.aget_from_dns(resolver)
+        aget_from_dns.__name__ = f'dns:{resolver.name}'
+        aget_from_dns.provider_name = f'dns:{resolver.name}'
+        return aget_from_dns
+
+
+    async def aget_from_dns(self, resolver:DNSResolver) -> Union[IPv4, None]:
+        """
+        Asynchronous counterpart of "get_from_dns".
+
+        Parameters:
+            resolver (DNSResolver): server and name to ask.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        try:
+            values = await dns_ip.aquery(resolver, self.attempt_timeout_ms(self.dns_timeout_ms,
+                                                                           self.dns_retries),
+                                         self.dns_retries)
+        except dns_ip.DNSError as exc:
+            logger.error('Invalid answer of the DNS server {}. {}', resolver.name, exc)
+            return None
+        except OSError as exc: # The next server may be reachable
+            logger.warning('The DNS server {} can not be reached. {}', resolver.name, exc)
+            return None
+        return self.control_dns_values(resolver, values)
+
+
+    def aordered_providers(self) -> list[Callable[[], Awaitable[Union[IPv4, None]]]]:
+        """
+        Asynchronous counterpart of "ordered_providers".
+
+        Returns:
+            list: bound coroutine methods.
+        """
+        if not self.adaptive:
+            return self.alist_providers()
+        return self.health.order(self.alist_providers(), self.provider_name,
+                                 self.provider_weight)
+
+
+    async def acall_provider(self, func:Callable[[], Awaitable[Union[IPv4, None]]],
+                             until:float|None = None) -> Union[IPv4, None]:
+        """
+        Asynchronous counterpart of "call_provider". A call cancelled
+        because another provider won the race is not counted as a failure.
+
+        Parameters:
+            func (Callable): coroutine provider method;
+            until (float | None): time (time.monotonic) by which the call must end.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if the provider did not give an address.
+        """
+        name = self.provider_name(func)
+        token = _current_call.set(_ProviderCall(name, until))
+        self.health.begin(name)
+        started = time.monotonic()
+        try:
+            ipv4 = await func()
+        except asyncio.CancelledError:
+            self.health.release(name)
+            raise
+        except Exception:
+            self.health.record_failure(name, time.monotonic() - started)
+            raise
+        finally:
+            _current_call.reset(token)
+        if ipv4 is None:
+            self.health.record_failure(name, time.monotonic() - started)
+        else:
+            self.health.record_success(name, time.monotonic() - started)
+        return ipv4
+
+
+    async def amake_requests(self, url:str, headers:dict|None = None,
+                             byte_limit:int|None = None,
+                             stop:Callable[[bytes], object]|None = None) -> Union[bytes, None]:
+        """
+        Non-blocking version of "make_requests". The connections are
+        kept open for the next requests of the same event loop (see
+        "get_async_pool"). The read timeout limits the whole request. Like a streamed
+        response, the body is read in pieces and the reading ends early
+        at "byte_limit" bytes or when "stop" asks for it.
+
+        Parameters:
+            url (str): link to the site;
+            headers (dict | None): additional information for the http request;
+            byte_limit (int | None): the most bytes of the body to read;
+            stop (Callable | None): called with every piece of the body,
+                a true answer ends the reading (StreamExtractor.feed).
+
+        Returns:
+            bytes: HTTP response body (or its beginning);
+            None: if any error occurred.
+        """
+        connect_timeout, timeout = self.request_timeouts()
+        try:
+            response = await async_http.fetch(url, headers, timeout=timeout,
+                                              connect_timeout=connect_timeout,
+                                              source_address=self.source_address,
+                                              proxy=self.proxy, byte_limit=byte_limit,
+                                              stop=stop, pool=self.get_async_pool())
+        except asyncio.TimeoutError:
+            logger.info('No answer within the timeout. Value: ({})', url)
+            return None # The next provider gets the rest of the time
+        except OSError as exc:
+            raise FailedToGetIP('Failed to get IP: connection error') from exc
+        except ValueError as exc:
+            logger.error('Failed to get IP: invalid URL. Value: ({}). {}', url, exc)
+            return None
+        if response.status_code != 200:
+            logger.info('Expected server response (200) was not received. Value: ({})',
+                        response.status_code)
+            return None
+        return response.content
+
+
+    async def aprocess_url(self, url:str,
+                           parser:Callable[[Union[bytes, str]], Union[str, None]],
+                           pattern:re.Pattern,
+                           headers:dict|None = None) -> Union[IPv4, None]:
+        """
+        Asynchronous counterpart of "make_requests" with "process_response":
+        the page is scanned as it arrives and the reading ends as soon as
+        the fast pattern finds the address. If the pattern misses within
+        "byte_budget" bytes, the whole page is given to the BeautifulSoup parser.
+
+        Parameters:
+            url (str): link to the site;
+            parser: one of the "parse_page_N" methods;
+            pattern (re.Pattern): fast pattern from the "extract" module;
+            headers (dict | None): additional information for the http request.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        extractor = extract.StreamExtractor(pattern, self.byte_budget)
+        page = await self.amake_requests(url, headers, stop=extractor.feed)
+        if page is None:
+            return None
+        if extractor.finish() is not None:
+            ipv4 = self.make_control(extractor.found)
+            if ipv4 is not None:
+                return ipv4
+        logger.info('The fast extraction missed, parsing the whole page')
+        return self.process_page(page, parser)
+
+
+    def amake_stun_method(self, server:STUNServer
+                          ) -> Callable[[], Awaitable[Union[IPv4, None]]]:
+        """
+        Asynchronous counterpart of "make_stun_method".
+
+        Parameters:
+            server (STUNServer): server to ask.
+
+        Returns:
+            Callable: coroutine function without arguments.
+        """
+        async def aget_from_stun():
+            return await self.aget_from_stun(server)
+        aget_from_stun.__name__ = f'stun:{server.name}'
+        aget_from_stun.provider_name = f'stun:{server.name}'
+        return aget_from_stun
+
+
+    async def aget_from_stun(self, server:STUNServer) -> Union[IPv4, None]:
+        """
+        Asynchronous counterpart of "get_from_stun".
+
+        Parameters:
+            server (STUNServer): server to ask.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        try:
+            mapped = await stun_ip.aquery(server, self.attempt_timeout_ms(self.stun_timeout_ms,
+                                                                          self.stun_retries),
+                                          self.stun_retries)
+        except stun_ip.STUNError as exc:
+            logger.error('Invalid answer of the STUN server {}. {}', server.name, exc)
+            return None
+        except OSError as exc: # The next server may be reachable
+            logger.warning('The STUN server {} can not be reached. {}', server.name, exc)
+            return None
+        if mapped is None:
+            logger.info('The STUN server {} did not answer in time', server.name)
+            return None
+        return self.make_control(mapped[0])
+
+
+    def amake_provider_method(self, provider:Provider
+                              ) -> Callable[[], Awaitable[Union[IPv4, None]]]:
+        """
+        Asynchronous counterpart of "make_provider_method".
+
+        Parameters:
+            provider (Provider): provider record.
+
+        Returns:
+            Callable: coroutine function without arguments.
+        """
+        async def aget_from_provider():
+            return await self.aget_from_provider(provider)
+        aget_from_provider.__name__ = provider.name
+        aget_from_provider.provider_name = provider.name
+        aget_from_provider.provider_weight = provider.weight
+        return aget_from_provider
+
+
+    async def aget_from_provider(self, provider:Provider,
+                                 control:Callable[[str], Union[IPv4, IPv6Address, None]]|None = None
+                                 ) -> Union[IPv4, IPv6Address, None]:
+        """
+        Non-blocking request to a provider described by a record.
+
+        Parameters:
+            provider (Provider): provider record;
+            control (Callable | None): check of the found address,
+                "make_control" by default, "make_control6" for IPv6.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        control = control if control is not None else self.make_control
+        if provider.extractor == providers.REGEX:
+            extractor = extract.StreamExtractor(providers.compile_pattern(provider),
+                                                self.byte_budget)
+            page = await self.amake_requests(provider.url, provider.headers,
+                                             byte_limit=self.byte_budget, stop=extractor.feed)
+            if page is None or extractor.finish() is None:
+                return None
+            return control(extractor.found)
+        page = await self.amake_requests(provider.url, provider.headers,
+                                         byte_limit=self.byte_budget)
+        if page is None:
+            return None
+        ipv4 = providers.extract_address(provider, page)
+        if ipv4 is None:
+            return None
+        return control(ipv4)
+
+
+    async def aget_external_ipv4_1(self) -> Union[IPv4, None]:
+        """
+        Non-blocking request to site 1.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        return await self.aprocess_url(self.provider_urls[0], self.parse_page_1,
+                                       extract.CHECKIP_PATTERN)
+
+
+    async def aget_external_ipv4_2(self) -> Union[IPv4, None]:
+        """
+        Non-blocking request to site 2.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        return await self.aprocess_url(self.provider_urls[1], self.parse_page_2,
+                                       extract.IPADDRESS_COM_PATTERN, BROWSER_HEADERS)
+
+
+    async def aget_external_ipv4_3(self) -> Union[IPv4, None]:
+        """
+        Non-blocking request to site 3.
+
+        Returns:
+            IPv4: external IPv4 address.
+            None: if any error occurred.
+        """
+        return await self.aprocess_url(self.provider_urls[2], self.parse_page_3,
+                                       extract.IPLOCATION_PATTERN, BROWSER_HEADERS)
+
+
+    async def aget(self, race:bool|None = None, deadline:float|None = None) -> IPv4:
+        """
+        Asynchronous counterpart of "get", uses the same cache.
+
+        Parameters:
+            race (bool | None): overrides "self.race" for this call;
+            deadline (float | None): seconds to wait for the answer,
+                "self.deadline" by default.
+
+        Returns:
+            IPv4: external IPv4 address.
+        """
+        return (await self.alookup(race, deadline)).ipv4
+
+
+    async def alookup(self, race:bool|None = None,
+                      deadline:float|None = None) -> IPLookupResult:
+        """
+        Asynchronous counterpart of "lookup". Callers from all threads and
+        event loops share one lookup. A caller that is cancelled stops
+        waiting; the lookup itself is cancelled (and its connections
+        closed) only when no caller waits for it any more. So a caller
+        whose deadline expires first cancels the lookup, unless other
+        callers still wait for it.
+
+        Parameters:
+            race (bool | None): overrides "self.race" for this call;
+            deadline (float | None): seconds to wait for the answer,
+                "self.deadline" by default.
+
+        Returns:
+            IPLookupResult: address, "cached" flag and the time it was obtained.
+
+        Exceptions:
+            FailedToGetIP: no provider returned an IPv4 address;
+            DeadlineExceeded: no provider returned it within the deadline.
+        """
+        cached = self.get_cached()
+        if cached is not None:
+            return cached
+        deadline = self.deadline if deadline is None else deadline
+        if deadline is None:
+            return await self.alookup_shared(race)
+        try:
+            return await asyncio.wait_for(
+                    self.alookup_shared(race, time.monotonic() + deadline), deadline)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded('No IPv4 address within the deadline') from None
+
+
+    async def alookup_shared(self, race:bool|None = None,
+                             until:float|None = None) -> IPLookupResult:
+        """
+        Asynchronous counterpart of "lookup_shared".
+
+        Parameters:
+            race (bool | None): overrides "self.race" for this call;
+            until (float | None): deadline (time.monotonic) of the lookup.
+
+        Returns:
+            IPLookupResult: the fresh answer.
+        """
+        if not self.coalesce:
+            return await self.alookup_uncached(race, until)
+        loop = asyncio.get_running_loop()
+        with self._cache_lock:
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight(loop)
+                flight.task = loop.create_task(self.alookup_uncached(race, until))
+                flight.task.add_done_callback(
+                        lambda task: self.finish_flight_task(flight, task))
+            else:
+                flight.waiters += 1
+        try:
+            if flight.loop is loop:
+                return await asyncio.shield(flight.task)
+            return await asyncio.shield(asyncio.wrap_future(flight.future))
+        except DeadlineExceeded:
+            if leader or (until is not None and time.monotonic() >= until):
+                raise
+            # The joined lookup had a shorter deadline than this caller
+            return await self.alookup_shared(race, until)
+        except (asyncio.CancelledError, CancelledError):
+            # The lookup is cancelled only when nobody waits for it any more
+            with self._cache_lock:
+                flight.waiters -= 1
+                abandoned = flight.waiters == 0 and flight.task is not None
+            if abandoned:
+                flight.loop.call_soon_threadsafe(flight.task.cancel)
+            raise
+
+
+    def finish_flight_task(self, flight:_Flight, task:asyncio.Task) -> None:
+        """
+        Passing the outcome of the task of a shared asynchronous lookup
+        to "finish_flight" (also to the callers in other threads).
+
+        Parameters:
+            flight (_Flight): the lookup;
+            task (asyncio.Task): its finished task.
+        """
+        if task.cancelled():
+            self.finish_flight(flight, exception=CancelledError())
+        elif task.exception() is not None:
+            self.finish_flight(flight, exception=task.exception())
+        else:
+            self.finish_flight(flight, task.result())
+
+
+    async def alookup_uncached(self, race:bool|None = None,
+                               until:float|None = None) -> IPLookupResult:
+        """
+        Asynchronous counterpart of "lookup_uncached".
+
+        Parameters:
+            race (bool | None): overrides "self.race" for this call;
+            until (float | None): deadline (time.monotonic) of the lookup.
+
+        Returns:
+            IPLookupResult: the fresh answer.
+        """
+        generation = self._generation
+        try:
+            ipv4 = await self.afind(race, until)
+        except DeadlineExceeded:
+            raise
+        except FailedToGetIP as exc:
+            self.store_failure(exc, generation)
+            raise
+        return self.store_result(ipv4, generation)
+
+
+    async def afind(self, race:bool|None = None, until:float|None = None) -> IPv4:
+        """
+        Asking the providers asynchronously, bypassing the cache. Without
+        racing the providers are awaited one after another and, as in
+        "get_sequential", an error of a provider
+        stops the search. With racing all providers run as tasks on the
+        current event loop, the first valid answer wins and the other
+        tasks are cancelled.
+
+        Parameters:
+            race (bool | None): overrides "self.race" for this call;
+            until (float | None): deadline (time.monotonic), split among
+                the providers as in "get_sequential" and "get_racing".
+
+        Returns:
+            IPv4: external IPv4 address.
+        """
+        if race is None:
+            race = self.race
+        if not race:
+            providers = self.aordered_providers()
+            for index, func in enumerate(providers):
+                attempt_until = self.attempt_deadline(func, until, len(providers) - index)
+                try:
+                    ipv4 = await self.acall_provider(func, attempt_until)
+                except FailedToGetIP as exc:
+                    logger.warning('Method {} returned an error: {}', func.__name__, exc)
+                    raise
+                if ipv4 is not None:
+                    return ipv4
+                logger.warning('Failed one attempt to find an IPv4 address')
+            if until is not None and time.monotonic() >= until:
+                raise DeadlineExceeded('No IPv4 address within the deadline')
+            raise FailedToGetIP('All attempts to get an IPv4 address failed:\
+                                all methods returned None')
+
+        tasks = {asyncio.ensure_future(self.acall_provider(func, until)): func
+                 for func in self.aordered_providers()[:self.race_width]}
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=None if until is None
+                                                  else max(until - time.monotonic(), 0)):
+                try:
+                    ipv4 = await next_done
+                except asyncio.TimeoutError: # Of "as_completed"
+                    raise DeadlineExceeded('No IPv4 address within the deadline') from None
+                except FailedToGetIP as exc:
+                    logger.warning('A provider returned an error: {}', exc)
+                    continue
+                except Exception as exc:
+                    logger.error('An unknown error was found in a provider: {}', exc)
+                    continue
+                if ipv4 is not None:
+                    return ipv4
+                logger.warning('Failed one attempt to find an IPv4 address')
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        raise FailedToGetIP('All attempts to get an IPv4 address failed:\
+                            no provider won the race')
+
+
+    async def agather(self) -> dict[str, Union[IPv4, Exception, None]]:
+        """
+        Asking all providers at once and collecting every answer,
+        for example to see whether the providers agree with each other.
+
+        Returns:
+            dict: provider method name -> IPv4, None or the raised exception.
+        """
+        providers = self.alist_providers()[:self.race_width]
+        results = await asyncio.gather(*(self.acall_provider(func) for func in providers),
+                                       return_exceptions=True)
+        return {func.__name__: result for func, result in zip(providers, results)}
+
+
+    def alist_ipv6_providers(self) -> list[Callable[[], Awaitable[Union[IPv6Address, None]]]]:
+        """
+        Asynchronous counterpart of "list_ipv6_providers".
+
+        Returns:
+            list: coroutine functions.
+        """
+        methods = [self.amake_ipv6_method(provider) for provider in self.ipv6_providers]
+        if not self.adaptive:
+            return methods
+        return self.health.order(methods, self.provider_name, self.provider_weight)
+
+
+    def amake_ipv6_method(self, provider:Provider
+                          ) -> Callable[[], Awaitable[Union[IPv6Address, None]]]:
+        """
+        Asynchronous counterpart of "make_ipv6_method".
+
+        Parameters:
+            provider (Provider): provider record.
+
+        Returns:
+            Callable: coroutine function without arguments.
+        """
+        async def aget_from_provider():
+            return await self.aget_from_provider(provider, self.make_control6)
+        aget_from_provider.__name__ = f'ipv6:{provider.name}'
+        aget_from_provider.provider_name = f'ipv6:{provider.name}'
+        aget_from_provider.provider_weight = provider.weight
+        return aget_from_provider
+
+
+    async def afind_ipv6(self) -> IPv6Address:
+        """
+        Asynchronous counterpart of "find_ipv6".
+
+        Returns:
+            IPv6Address: external IPv6 address.
+        """
+        for func in self.alist_ipv6_providers():
+            try:
+                ipv6 = await self.acall_provider(func)
+            except FailedToGetIP as exc:
+                logger.info('Method {} returned an error: {}', func.__name__, exc)
+                continue
+            if ipv6 is not None:
+                return ipv6
+        raise FailedToGetIP('All attempts to get an IPv6 address failed')
+
+
+    async def aget_dual(self) -> DualStackResult:
+        """
+        Asynchronous counterpart of "get_dual": both lookups run as tasks
+        on the current event loop, a lookup that missed its deadline
+        is cancelled.
+
+        Returns:
+            DualStackResult: both addresses, None for a family without an answer.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = {asyncio.ensure_future(self.aget()): 4,
+                 asyncio.ensure_future(self.afind_ipv6()): 6}
+        deadlines = {4: started + self.ipv4_timeout, 6: started + self.ipv6_timeout}
+        addresses = {4: None, 6: None}
+        pending = set(tasks)
+        try:
+            while pending:
+                now = loop.time()
+                for task in [task for task in pending if deadlines[tasks[task]] <= now]:
+                    logger.warning('No IPv{} address within the timeout', tasks[task])
+                    pending.discard(task)
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED,
+                        timeout=min(deadlines[tasks[task]] for task in pending) - now)
+                for task in done:
+                    family = tasks[task]
+                    try:
+                        addresses[family] = task.result()
+                    except FailedToGetIP as exc:
+                        logger.warning('Failed to get the IPv{} address: {}', family, exc)
+                    except Exception as exc:
+                        logger.error('An unknown error was found in the IPv{} lookup: {}', family, exc)
+                    if family == 4 and self.ipv6_grace is not None:
+                        deadlines[6] = min(deadlines[6], loop.time() + self.ipv6_grace)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return DualStackResult(addresses[4], addresses[6])
+
+
+if __name__ == '__main__':
+    import log_config
+    log_config.configure()
 
-if __name__ == '__main__':
     @logger.catch
     def start_module():
         """
@@ -273,7 +2426,7 @@ if __name__ == '__main__':
         try:
             ipv4 = ip_search.get()
         except FailedToGetIP as exc:
-            logger.error(f'{exc}')
+            logger.error('{}', exc)
             sys.exit()
         if ipv4 is None:
             print('The program could not find your external IPv4 address.')
@@ -0,0 +1,376 @@
+"""
+Health statistics of the external IP providers: latency, success rate
+and a circuit breaker per provider. Used by GetMyIP to call the fastest
+live provider first, to skip the ones that keep failing and to choose
+the timeouts of a request from the recent answer times of its provider.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, TypeVar, Union
+
+T = TypeVar('T')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+# Answers needed before the timeouts follow the percentiles of a provider
+MIN_SAMPLES = 5
+# Weights below it (zero, negative) count as it when a provider is ordered
+MIN_WEIGHT = 0.05
+
+
+class ProviderHealth():
+    """
+    Statistics of one provider.
+
+    Class level variables:
+        self.latency: EWMA of the answer time in seconds, None before the first call;
+        self.success_rate: EWMA of successful calls, from 0 to 1;
+        self.last_failure: time (time.time) of the last failed call or None;
+        self.consecutive_failures: failed calls in a row;
+        self.state: circuit breaker state - "closed", "open" or "half-open";
+        self.opened_at: time (time.monotonic) when the breaker was opened;
+        self.probing: True while the single half-open probe is running;
+        self.samples: the latest times of successful answers in seconds, for
+            the percentiles; failures are counted by "consecutive_failures".
+    """
+
+    def __init__(self, window:int = 64):
+        self.latency: float | None = None
+        self.success_rate = 1.0
+        self.last_failure: float | None = None
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.samples: deque[float] = deque(maxlen=window)
+
+
+class HealthTracker():
+    """
+    Keeping the statistics of all providers and deciding in which order
+    they should be called.
+
+    Methods:
+        __init__: class initialization;
+        get: statistics of one provider;
+        available: whether the circuit breaker lets a call to the provider through;
+        begin: marking the start of a call (the half-open probe);
+        release: marking a call that ended without a result;
+        expected_time: expected time to get an answer from the provider;
+        percentile: percentile of the latest answer times of the provider;
+        timeouts: connect and read timeouts of a request to the provider;
+        order: sorting providers by expected time and removing the blocked ones;
+        record_success: saving a successful call;
+        record_failure: saving a failed call;
+        snapshot: copy of the statistics as plain dictionaries;
+        restore: loading statistics saved by "snapshot", for example in a previous run.
+
+    Class level variables:
+        self.alpha: weight of the newest measurement in the EWMA;
+        self.failure_threshold: failures in a row that open the breaker;
+        self.cooldown: seconds the breaker stays open before a probe is allowed;
+        self.default_latency: latency assumed for a provider never called;
+        self.window: how many latest answer times are kept per provider;
+        self.timeout_factor: how many times the timeouts exceed the percentiles;
+        self.min_timeout, self.max_timeout: limits of the timeouts in seconds,
+            "max_timeout" is also used until enough answers are seen.
+    """
+
+    def __init__(self, alpha:float = 0.3, failure_threshold:int = 3,
+                 cooldown:float = 60.0, default_latency:float = 1.0,
+                 window:int = 64, timeout_factor:float = 3.0,
+                 min_timeout:float = 0.25, max_timeout:float = 5.0):
+        if not 0 < alpha <= 1:
+            raise ValueError(f'alpha must be in (0, 1]. Value: {alpha}')
+        if window < 1:
+            raise ValueError(f'window must be positive. Value: {window}')
+        if not 0 < min_timeout <= max_timeout:
+            raise ValueError('min_timeout must be positive and not above max_timeout. '
+                             f'Value: {min_timeout}, {max_timeout}')
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.default_latency = default_latency
+        self.window = window
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._providers: dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name:str) -> ProviderHealth:
+        """
+        Statistics of one provider, created on the first request.
+
+        Parameters:
+            name (str): provider name.
+
+        Returns:
+            ProviderHealth: statistics of the provider.
+        """
+        with self._lock:
+            return self._get(name)
+
+    def _get(self, name:str) -> ProviderHealth:
+        health = self._providers.get(name)
+        if health is None:
+            health = self._providers[name] = ProviderHealth(self.window)
+        return health
+
+    def available(self, name:str) -> bool:
+        """
+        Checking whether the provider may be called now: its breaker is
+        closed, or the cool-down has passed and no probe is running yet.
+
+        Parameters:
+            name (str): provider name.
+
+        Returns:
+            bool: True if the call is allowed.
+        """
+        with self._lock:
+            health = self._get(name)
+            if health.state == OPEN:
+                return time.monotonic() - health.opened_at >= self.cooldown
+            if health.state == HALF_OPEN:
+                return not health.probing
+            return True
+
+    def begin(self, name:str) -> None:
+        """
+        Marking the start of a call. After the cool-down an open breaker
+        becomes half-open and the call is the single probe, other callers
+        skip the provider until its result is recorded.
+
+        Parameters:
+            name (str): provider name.
+        """
+        with self._lock:
+            health = self._get(name)
+            if (health.state == OPEN
+                    and time.monotonic() - health.opened_at >= self.cooldown):
+                health.state = HALF_OPEN
+            if health.state == HALF_OPEN:
+                health.probing = True
+
+    def release(self, name:str) -> None:
+        """
+        Marking a call that ended without a result (for example it was
+        cancelled because another provider answered first).
+
+        Parameters:
+            name (str): provider name.
+        """
+        with self._lock:
+            self._get(name).probing = False
+
+    def expected_time(self, name:str, weight:float = 1.0) -> float:
+        """
+        Expected time to get an answer: the average latency divided by
+        the success rate, so a fast but unreliable provider is not favoured.
+        Until the provider has answered, "default_latency" divided by the
+        weight of the provider is assumed, so a heavier provider is tried first.
+
+        Parameters:
+            name (str): provider name;
+            weight (float): weight of the provider (Provider.weight).
+
+        Returns:
+            float: seconds.
+        """
+        with self._lock:
+            health = self._get(name)
+            latency = (self.default_latency / max(weight, MIN_WEIGHT)
+                       if health.latency is None else health.latency)
+            return latency / max(health.success_rate, 0.05)
+
+    def percentile(self, name:str, share:float) -> Union[float, None]:
+        """
+        Parameters:
+            name (str): provider name;
+            share (float): from 0 to 1, for example 0.99.
+
+        Returns:
+            float: the percentile of the latest answer times in seconds;
+            None: fewer than MIN_SAMPLES answers are known.
+        """
+        with self._lock:
+            samples = sorted(self._get(name).samples)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(share * len(samples)))]
+
+    def timeouts(self, name:str) -> tuple[float, float]:
+        """
+        Timeouts of a request to the provider, derived from its answer
+        times instead of a constant: the connection should be made
+        within "timeout_factor" times the median, the answer should come
+        within "timeout_factor" times the 99th percentile. Every failure
+        in a row doubles both, so after timeouts they grow instead of
+        staying too short for the provider. Both stay between
+        "min_timeout" and "max_timeout"; until enough answers are seen
+        both are "max_timeout".
+
+        Parameters:
+            name (str): provider name.
+
+        Returns:
+            tuple: connect and read timeouts in seconds.
+        """
+        median = self.percentile(name, 0.5)
+        tail = self.percentile(name, 0.99)
+        if median is None or tail is None:
+            return self.max_timeout, self.max_timeout
+        with self._lock:
+            # The cap only keeps the number small, "max_timeout" is reached long before
+            backoff = 2 ** min(self._get(name).consecutive_failures, 16)
+
+        def limit(seconds:float) -> float:
+            return min(max(seconds * self.timeout_factor * backoff, self.min_timeout),
+                       self.max_timeout)
+
+        return limit(median), limit(tail)
+
+    def order(self, providers:Iterable[T], key:Callable[[T], str],
+              weight:Union[Callable[[T], float], None] = None) -> list[T]:
+        """
+        Sorting providers by expected time to answer. Providers with an
+        open breaker are left out; if all of them are blocked, all are
+        returned anyway, so a lookup is never refused outright.
+        The weights are the prior of the providers that have not answered
+        yet (see "expected_time") and decide between equal scores, the
+        heavier provider first; otherwise the original order is kept.
+
+        Parameters:
+            providers (Iterable): providers in the default order;
+            key (Callable): function returning the name of a provider;
+            weight (Callable | None): function returning the weight of a provider.
+
+        Returns:
+            list: providers in the order they should be called.
+        """
+        def score(provider:T) -> tuple[float, float]:
+            prior = 1.0 if weight is None else weight(provider)
+            return self.expected_time(key(provider), prior), -prior
+
+        ordered = sorted(providers, key=score)
+        allowed = [provider for provider in ordered if self.available(key(provider))]
+        return allowed or ordered
+
+    def record_success(self, name:str, latency:float) -> None:
+        """
+        Saving a successful call and closing the breaker.
+
+        Parameters:
+            name (str): provider name;
+            latency (float): seconds the call took.
+        """
+        with self._lock:
+            health = self._get(name)
+            health.latency = (latency if health.latency is None
+                              else self.alpha * latency + (1 - self.alpha) * health.latency)
+            health.samples.append(latency)
+            health.success_rate = self.alpha + (1 - self.alpha) * health.success_rate
+            health.consecutive_failures = 0
+            health.state = CLOSED
+            health.probing = False
+
+    def record_failure(self, name:str, latency:Union[float, None] = None) -> None:
+        """
+        Saving a failed call. The breaker opens after "failure_threshold"
+        failures in a row, or at once if a half-open probe fails.
+        A failure is counted as taking at least "default_latency" in the
+        average latency, so a provider that fails quickly does not look
+        like a fast one. It is not kept among the answer times, which
+        give the percentiles of the successful answers only; the
+        timeouts grow with the failures in a row instead (see "timeouts").
+
+        Parameters:
+            name (str): provider name;
+            latency (float | None): seconds the call took, if known.
+        """
+        with self._lock:
+            health = self._get(name)
+            latency = max(latency or 0.0, self.default_latency)
+            health.latency = (latency if health.latency is None
+                              else self.alpha * latency + (1 - self.alpha) * health.latency)
+            health.success_rate = (1 - self.alpha) * health.success_rate
+            health.last_failure = time.time()
+            health.consecutive_failures += 1
+            if (health.state == HALF_OPEN
+                    or health.consecutive_failures >= self.failure_threshold):
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+            health.probing = False
+
+    def snapshot(self) -> dict[str, dict]:
+        """
+        Copy of the statistics, for logs or for saving to disk.
+
+        Returns:
+            dict: provider name -> dictionary of its statistics.
+        """
+        with self._lock:
+            return {name: {'latency': health.latency,
+                           'success_rate': health.success_rate,
+                           'last_failure': health.last_failure,
+                           'consecutive_failures': health.consecutive_failures,
+                           'state': health.state,
+                           'samples': [round(sample, 4) for sample in health.samples]}
+                    for name, health in self._providers.items()}
+
+    def restore(self, snapshot:dict[str, dict]) -> int:
+        """
+        Loading statistics saved by "snapshot", for example by a previous
+        run of the program, so the providers are ordered well from the
+        first request. An open breaker stays open for the rest of its
+        cool-down, counted from the time of its last failure; a breaker
+        that was half-open is restored as open. Broken entries are skipped.
+
+        Parameters:
+            snapshot (dict): provider name -> dictionary of its statistics.
+
+        Returns:
+            int: number of providers restored.
+        """
+        restored = 0
+        now = time.time()
+        with self._lock:
+            for name, values in snapshot.items():
+                try:
+                    latency = values['latency']
+                    latency = None if latency is None else float(latency)
+                    success_rate = min(max(float(values['success_rate']), 0.0), 1.0)
+                    last_failure = values['last_failure']
+                    last_failure = None if last_failure is None else float(last_failure)
+                    consecutive_failures = int(values['consecutive_failures'])
+                    state = values['state']
+                    samples = [float(sample) for sample in values.get('samples', ())]
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if state not in (CLOSED, OPEN, HALF_OPEN):
+                    continue
+                health = self._get(name)
+                health.latency = latency
+                health.success_rate = success_rate
+                health.last_failure = last_failure
+                health.consecutive_failures = consecutive_failures
+                health.samples.clear()
+                health.samples.extend(samples)
+                health.probing = False
+                if state == CLOSED:
+                    health.state = CLOSED
+                else:
+                    health.state = OPEN
+                    since_failure = 0.0 if last_failure is None else max(now - last_failure, 0.0)
+                    health.opened_at = time.monotonic() - since_failure
+                restored += 1
+        return restored
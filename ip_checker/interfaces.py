@@ -0,0 +1,118 @@
+"""
+Local network interfaces and their IPv4 addresses. A lookup bound to
+the address of an interface shows the external address of the traffic
+leaving through it (for example "tun0" of the VPN versus "eth0"), see
+GetMyIP.get_per_interface.
+
+The addresses are read with the SIOCGIFADDR ioctl (Linux), only the
+primary IPv4 address of every interface is returned. On other systems
+the list is empty and the interfaces have to be given explicitly.
+
+Binding a socket to a source address chooses the address the packets
+carry, but not the route: without source-based routing (a rule per
+source address, as VPN clients usually add for their tunnel) the
+packets of every interface still leave by the default route. Where
+SO_BINDTODEVICE is available (Linux; before 5.7 it needs CAP_NET_RAW)
+the lookups are also bound to the interface itself, see
+"can_bind_to_device".
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import socket
+import struct
+import sys
+from typing import NamedTuple, Union
+
+try:
+    import fcntl
+except ImportError: # Not a Unix system
+    fcntl = None
+
+SIOCGIFADDR = 0x8915
+# Linux only; 25 is its value where the constant is missing from the socket module
+SO_BINDTODEVICE = getattr(socket, 'SO_BINDTODEVICE', 25 if sys.platform.startswith('linux')
+                          else None)
+# Offset of the address in "struct ifreq": the name (16 bytes), family and port
+_ADDRESS_OFFSET = 20
+
+
+class Interface(NamedTuple):
+    """
+    Description of a local interface.
+
+    name: name of the interface ("eth0", "tun0");
+    address: its IPv4 address, the source address of the bound lookups.
+    """
+    name: str
+    address: str
+
+
+def interface_address(name:str) -> Union[str, None]:
+    """
+    Parameters:
+        name (str): name of the interface.
+
+    Returns:
+        str: the primary IPv4 address of the interface;
+        None: the interface has no IPv4 address or it can not be read.
+    """
+    if fcntl is None:
+        return None
+    request = struct.pack('256s', name.encode()[:15])
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            answer = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, request)
+    except OSError:
+        return None
+    return socket.inet_ntoa(answer[_ADDRESS_OFFSET:_ADDRESS_OFFSET + 4])
+
+
+def list_interfaces(include_loopback:bool = False) -> list[Interface]:
+    """
+    Listing the interfaces that have an IPv4 address.
+
+    Parameters:
+        include_loopback (bool): also return the loopback interface.
+
+    Returns:
+        list: Interface records in the order of the interface indexes.
+    """
+    try:
+        names = [name for _, name in socket.if_nameindex()]
+    except OSError:
+        return []
+    interfaces = []
+    for name in names:
+        address = interface_address(name)
+        if address is None:
+            continue
+        if not include_loopback and address.startswith('127.'):
+            continue
+        interfaces.append(Interface(name, address))
+    return interfaces
+
+
+def can_bind_to_device(name:str) -> bool:
+    """
+    Checking whether sockets can be bound to the interface with
+    SO_BINDTODEVICE: the option exists, the interface exists and the
+    process is allowed to use it.
+
+    Parameters:
+        name (str): name of the interface.
+
+    Returns:
+        bool: True if the option can be used.
+    """
+    if SO_BINDTODEVICE is None:
+        return False
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, SO_BINDTODEVICE, name.encode())
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,135 @@
+"""
+Compact IPv4 address type. The address is kept as one integer, so
+comparing is an integer operation, and the parser is one precompiled
+pattern that returns None instead of raising an exception on a bad
+string (no attempt to read it as IPv6 either). The type is used where an address is
+checked many times (the polling loops), "ipaddress.IPv4Address" is
+still available through the conversion methods.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import re
+from functools import total_ordering
+from ipaddress import IPv4Address
+from typing import Union
+
+# One octet from 0 to 255 without leading zeros, ASCII digits only
+_OCTET = r'(25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])'
+_DOTTED_QUAD = re.compile(r'\.'.join([_OCTET] * 4)).fullmatch
+_new = object.__new__
+
+
+@total_ordering
+class IPv4():
+    """
+    IPv4 address stored as an unsigned 32 bit integer.
+
+    Methods:
+        __init__: class initialization from an integer;
+        parse: creating an address from a string without exceptions;
+        from_ipaddress: creating an address from "ipaddress.IPv4Address";
+        to_ipaddress: conversion to "ipaddress.IPv4Address";
+        __int__, __str__, __eq__, __lt__, __hash__: the address as a number
+            (the other comparisons are added by total_ordering).
+
+    Class level variables:
+        version: always 4, as in "ipaddress";
+        self.packed: the address as 4 bytes in network order.
+
+    An IPv4 is equal to an IPv4 or an "ipaddress.IPv4Address" with the
+    same number. It is not equal to strings and plain integers.
+    """
+
+    __slots__ = ('_value',)
+    version = 4
+
+    def __init__(self, value:int):
+        if not 0 <= value <= 0xFFFFFFFF:
+            raise ValueError(f'An IPv4 address is a 32 bit number. Value: {value}')
+        self._value = value
+
+    @classmethod
+    def parse(cls, text:Union[str, 'IPv4', IPv4Address]) -> Union['IPv4', None]:
+        """
+        Converting a dotted-quad string into an address. The rules are
+        the same as in "ipaddress": four decimal octets from 0 to 255,
+        ASCII digits only, no leading zeros, no spaces.
+
+        Parameters:
+            text (str | IPv4 | IPv4Address): the string to parse, addresses
+                are returned as IPv4 without parsing.
+
+        Returns:
+            IPv4: the address;
+            None: the value is not an IPv4 address.
+        """
+        if not isinstance(text, str):
+            if isinstance(text, IPv4):
+                return text
+            if isinstance(text, IPv4Address):
+                return cls(int(text))
+            return None
+        found = _DOTTED_QUAD(text)
+        if found is None:
+            return None
+        first, second, third, fourth = found.groups()
+        address = _new(cls)
+        address._value = int(first) << 24 | int(second) << 16 | int(third) << 8 | int(fourth)
+        return address
+
+    @classmethod
+    def from_ipaddress(cls, address:IPv4Address) -> 'IPv4':
+        """
+        Parameters:
+            address (IPv4Address): address of the "ipaddress" module.
+
+        Returns:
+            IPv4: the same address.
+        """
+        return cls(int(address))
+
+    def to_ipaddress(self) -> IPv4Address:
+        """
+        Returns:
+            IPv4Address: the same address as an "ipaddress" object.
+        """
+        return IPv4Address(self._value)
+
+    @property
+    def packed(self) -> bytes:
+        return self._value.to_bytes(4, 'big')
+
+    def __int__(self) -> int:
+        return self._value
+
+    def __str__(self) -> str:
+        value = self._value
+        return f'{value >> 24}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}'
+
+    def __repr__(self) -> str:
+        return f"IPv4('{self}')"
+
+    def __format__(self, format_spec:str) -> str:
+        return format(str(self), format_spec)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, IPv4):
+            return self._value == other._value
+        if isinstance(other, IPv4Address):
+            return self._value == int(other)
+        return NotImplemented
+
+    def __lt__(self, other) -> bool:
+        if isinstance(other, IPv4):
+            return self._value < other._value
+        if isinstance(other, IPv4Address):
+            return self._value < int(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        # The same hash as IPv4Address, the two types are equal to each other
+        return hash(hex(self._value))
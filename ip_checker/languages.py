@@ -33,4 +33,16 @@ lang = dict(
                                          'Введите IP адрес'),
         network_problem             =   ('Possible network problem',\
                                          'Проблемы с интернет-соединением?'),
+        check_stopped               =   ('Check stopped',\
+                                         'Проверка остановлена'),
+        monitor_mode                =   ('Monitor',\
+                                         'Следить'),
+        ip_leak                     =   ('Leak:',\
+                                         'Утечка:'),
+        last_known_ip               =   ('Last known IP:',\
+                                         'Последний известный IP:'),
+        stale                       =   ('stale, {} min ago',\
+                                         'устарело, {} мин. назад'),
+        current_ip                  =   ('Current IP:',\
+                                         'Текущий IP:'),
         )
@@ -0,0 +1,104 @@
+"""
+Central configuration of logging. The modules of the program only
+write messages, the sinks are added here once by the entry point
+(the window, the command line scripts). Every sink is queued: a message
+is put into a queue and written, rotated and compressed by a background
+thread of loguru, so a lookup never waits for the disk or the terminal.
+
+The messages are written with arguments ("logger.info('Value: {}', value)"),
+not f-strings: a message is formatted only when a sink accepts its level.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import os
+import sys
+import threading
+from loguru import logger
+
+LOG_FORMAT = '{time}, {level}, {module}:{line} -> {message}. {exception}'
+CONSOLE_FORMAT = '{time:HH:mm:ss} | {level: <8} | {module}:{line} - {message}'
+LOG_FILE_NAME = 'ip_checker.log.txt'
+
+# The log directory can be moved with the IP_CHECKER_LOG_DIR environment variable
+DEFAULT_LOG_DIR = os.path.join(os.path.expanduser('~'), '.ip_checker')
+
+# The id of the stderr sink loguru adds on import
+DEFAULT_HANDLER_ID = 0
+
+_lock = threading.Lock()
+_configured = False
+# Ids of the sinks added by "configure", the sinks of others are kept
+_handler_ids: list[int] = []
+
+
+def configure(directory:str|None = None, file_level:str|None = 'ERROR',
+              console_level:str|None = 'WARNING') -> None:
+    """
+    Replacing the default sink of the logger with queued ones. Can be
+    called again to change the settings, the sinks of the previous call
+    are removed (their queues are written out first). Sinks added by an
+    application that embeds the program (or by pytest) are kept.
+
+    Parameters:
+        directory (str | None): directory of the log file, by default
+            IP_CHECKER_LOG_DIR or "~/.ip_checker";
+        file_level (str | None): the lowest level written to the file,
+            None - no log file. The file is rotated at 10 MB and the old
+            one is compressed to zip;
+        console_level (str | None): the lowest level written to stderr,
+            None - nothing is written to the terminal.
+    """
+    global _configured
+    with _lock:
+        _remove_own()
+        try:
+            logger.remove(DEFAULT_HANDLER_ID) # Synchronous, replaced by the queued one
+        except ValueError: # Already removed
+            pass
+        if console_level is not None and sys.stderr is not None:
+            _handler_ids.append(logger.add(sys.stderr, format=CONSOLE_FORMAT,
+                                           level=console_level, enqueue=True))
+        if file_level is not None:
+            if directory is None:
+                directory = os.environ.get('IP_CHECKER_LOG_DIR', DEFAULT_LOG_DIR)
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError as exc:
+                logger.warning('The log directory {} can not be created: {}', directory, exc)
+            else:
+                _handler_ids.append(logger.add(os.path.join(directory, LOG_FILE_NAME),
+                                               format=LOG_FORMAT, level=file_level,
+                                               rotation='10MB', compression='zip',
+                                               enqueue=True, serialize=False))
+        _configured = True
+
+
+def _remove_own() -> None:
+    while _handler_ids:
+        try:
+            logger.remove(_handler_ids.pop())
+        except ValueError: # Removed by someone else
+            pass
+
+
+def is_configured() -> bool:
+    """
+    Returns:
+        bool: True if "configure" has been called.
+    """
+    return _configured
+
+
+def shutdown() -> None:
+    """
+    Writing out the queued messages and removing the sinks added by
+    "configure". Called when the program ends.
+    """
+    global _configured
+    with _lock:
+        _remove_own()
+        _configured = False
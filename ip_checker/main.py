@@ -3,27 +3,29 @@ The module manages the graphical interface of the program (gtk3) and
 the main logic.
 
 Author: Mikhail Gurov
-Last Modified: Feb 06, 2023
+Last Modified: Oct 16, 2026
 """
 #!/usr/bin/env python3.10
 # -- coding: utf-8 --
 
+import concurrent.futures
+import time
 from find_ip import GetMyIP, FailedToGetIP
-from check_ip import IPAddressVerification
+from check_ip import IPAddressVerification, IPComparisonResult, DualStackComparisonResult
+from monitor import VPNMonitor, MonitorEvent
+from state import StateFile
+from worker import WorkerLoop
 import languages
+import log_config
 from loguru import logger
 
 import gi
 gi.require_version('Gtk', '3.0')
+from gi.repository import GLib
 from gi.repository import Gtk as gtk
 
-logger.add(
-        'main.log.txt',
-        format='{time}, {level}, {module}:{line} -> {message}. {exception}',
-        level='ERROR',
-        rotation='10MB', compression='zip',
-        serialize=False,
-        )
+# Clicks following the previous one faster than this are ignored (seconds)
+DEBOUNCE_SECONDS = 0.3
 
 class VisibleWindow(gtk.Window):
     """
@@ -37,8 +39,19 @@ class VisibleWindow(gtk.Window):
         add_display_middle: adding a display to a program;
         add_display_lower: adding a display to a program;
         add_entry_ip: adding a text input field to a program;
+        add_check_monitor: adding the switch of the monitor mode;
         add_stable_text: adding a line of text to a program;
-        main: application logic management.
+        main: application logic management, starts a check on the worker thread;
+        show_last_known: showing the address saved by the previous run;
+        refresh: getting the current address in the background at start (worker thread);
+        on_refresh_done: showing the address found by "refresh";
+        check: getting the current address and comparing it (worker thread);
+        monitor: checking periodically until stopped (worker thread);
+        on_monitor_event: showing a change of the VPN state found by the monitor;
+        on_check_done: showing the result of a check on the GTK thread;
+        show_result: showing the comparison result on the displays;
+        leak_text: the line about the addresses that leak past the VPN;
+        stop_check: cancelling the running check;
         on_close: the method of disabling the program, triggered by pressing the cross.
         start: method for launching the program logic module.
         template_main: creation of the main window of the application.
@@ -70,6 +83,9 @@ class VisibleWindow(gtk.Window):
         # Add input field
         self.entry_ip = self.add_entry_ip()
 
+        # Add the switch of the monitor mode
+        self.check_monitor = self.add_check_monitor()
+
         # Set default interface language
         self.user_language = 1 # 0=en, 1=ru
         # Passing a language dictionary to a variable
@@ -89,12 +105,14 @@ class VisibleWindow(gtk.Window):
         self.display_lower.set_text('')
         self.button.set_label(
                 self.lang_dict['make_comparison'][self.user_language])
+        self.check_monitor.set_label(
+                self.lang_dict['monitor_mode'][self.user_language])
 
         # Initialization of the program name in the top line
         WINDOW.set_title(self.lang_dict['program_name'][self.user_language])
 
         # Initialization of parameters for the input string
-        self.entry_ip.set_max_length(16) # Maximum number of characters to enter
+        self.entry_ip.set_max_length(45) # Maximum number of characters to enter (IPv6)
         self.entry_ip.set_placeholder_text(
                 self.lang_dict['default_input_field_value'][self.user_language])
         self.entry_ip.set_text('') # Default search value
@@ -102,11 +120,29 @@ class VisibleWindow(gtk.Window):
         #  TODO: need to fix
         self.your_request_is_user_input = ''
 
+        # One instance for all checks, so connections to the sites are reused:
+        # the checks run on one long-lived loop that keeps them in its pool.
+        # The state file keeps the last address and the provider statistics between runs
+        self.ip_search = GetMyIP(state_file=StateFile())
+
+        # The checks run on an event loop in a separate thread
+        self.worker = WorkerLoop()
+        self.lookup_future = None # The check in progress
+        self.last_click = 0.0
+
+        # The last known address is shown at once, the current one is asked in the background
+        self.idle_display = True # Nothing but the start screen has been shown
+        self.show_last_known()
+        refresh_future = self.worker.submit(self.refresh())
+        refresh_future.add_done_callback(
+                lambda future: GLib.idle_add(self.on_refresh_done, future))
+
     def main(self):
         """
         Application logic management.
         """
         logger.info('The button was pressed, exiting the standby mode')
+        self.idle_display = False
 
         # Default value of displays
         self.stable_text.set_label(
@@ -158,55 +194,195 @@ class VisibleWindow(gtk.Window):
 
         logger.info('We begin the procedure for obtaining the current external IPv4 address')
 
-        try:
-            ip_search = GetMyIP()
-        except NameError  as exc:
-            logger.error(f'An attempt to create an instance of the GetMyIP class failed: {exc}')
+        # The lookup runs on the worker thread, so the window is not blocked
+        # by a slow network. The result comes back to the GTK thread via idle_add.
+        if self.check_monitor.get_active():
+            work = self.monitor(str(input_field_data))
+        else:
+            work = self.check(str(input_field_data))
+        self.lookup_future = self.worker.submit(work)
+        self.lookup_future.add_done_callback(
+                lambda future: GLib.idle_add(self.on_check_done, future))
+        return None
+
+
+    def show_last_known(self):
+        """
+        Showing the address saved by the previous run on the middle
+        display, marked as stale, until the current one is known.
+        """
+        last = self.ip_search.last_known()
+        if last is None:
             return None
+        minutes = max(int(time.time() - last.obtained_at) // 60, 0)
+        self.display_middle.set_text(
+                f"{self.lang_dict['last_known_ip'][self.user_language]} {last.ipv4} "
+                f"({self.lang_dict['stale'][self.user_language].format(minutes)})")
+        return None
 
+
+    async def refresh(self) -> str:
+        """
+        Getting the current external IPv4 address when the program starts.
+        Runs on the worker thread, must not touch the widgets.
+
+        Returns:
+            str: the current external address.
+        """
+        return str(await self.ip_search.aget())
+
+
+    def on_refresh_done(self, future:concurrent.futures.Future) -> bool:
+        """
+        Showing the address found by "refresh", unless the user has
+        already started a check. Called on the GTK thread.
+
+        Parameters:
+            future: the finished refresh.
+
+        Returns:
+            bool: False, so that GLib calls the method only once.
+        """
+        if not self.idle_display:
+            return False
         try:
-            # DEBUG: If there is connection problem - the process slows down the program
-            current_ip = str(ip_search.get())
-            logger.info(f'External IP lookup module returned result: {current_ip}')
-        except FailedToGetIP as exc:
-            logger.error(f'Attempt to get IP failed: {exc}')
-            # Customization of displays and button
+            current_ip = future.result()
+        except Exception as exc:
+            logger.warning('The address could not be refreshed at start: {}', exc)
+            return False
+        self.display_middle.set_text(
+                f"{self.lang_dict['current_ip'][self.user_language]} {current_ip}")
+        return False
+
+
+    async def check(self, user_input:str) -> tuple[str, DualStackComparisonResult|None]:
+        """
+        Getting the current external IPv4 and IPv6 addresses and comparing
+        them with the user input. Runs on the worker thread, must not touch
+        the widgets.
+
+        Parameters:
+            user_input (str): the address entered by the user.
+
+        Returns:
+            tuple: the current external address and the comparison result.
+        """
+        addresses = await self.ip_search.aget_dual()
+        if addresses.ipv4 is None and addresses.ipv6 is None:
+            raise FailedToGetIP('Neither the IPv4 nor the IPv6 address was obtained')
+        current_ip = None if addresses.ipv4 is None else str(addresses.ipv4)
+        current_ipv6 = None if addresses.ipv6 is None else str(addresses.ipv6)
+        logger.info('External IP lookup module returned result: {}, {}', current_ip, current_ipv6)
+
+        # Starting the comparison process
+        logger.info('Starting the comparison process')
+        comparison = IPAddressVerification(user_input, current_ip,
+                                           current_ipv6=current_ipv6)
+        result = comparison.run_dual()
+        logger.info('The comparison procedure is completed. Comparison result obtained: {}',
+                    result)
+        return current_ip, result
+
+
+    async def monitor(self, user_input:str) -> None:
+        """
+        Monitor mode: checking the address periodically and when the
+        network changes until the Stop button is pressed. Every change
+        of the VPN state is shown by "on_monitor_event". Runs on the
+        worker thread.
+
+        Parameters:
+            user_input (str): the address entered by the user.
+        """
+        vpn_monitor = VPNMonitor(user_input, self.ip_search, watch_network=True)
+        vpn_monitor.subscribe(
+                lambda event: GLib.idle_add(self.on_monitor_event, event))
+        await vpn_monitor.arun()
+
+
+    def on_monitor_event(self, event:MonitorEvent) -> bool:
+        """
+        Showing a change of the VPN state found by the monitor.
+        Called on the GTK thread.
+
+        Parameters:
+            event (MonitorEvent): the change.
+
+        Returns:
+            bool: False, so that GLib calls the method only once.
+        """
+        if self.lookup_future is None:
+            return False # The monitor has already been stopped
+        if event.current_ip is None:
             self.display_upper.set_text(
                     self.lang_dict['vpn_status_unknown'][self.user_language])
             self.display_middle.set_text(
                     self.lang_dict['failed_to_get_ip'][self.user_language])
             self.display_lower.set_text(
                     self.lang_dict['network_problem'][self.user_language])
+        else:
+            self.show_result(event.result)
+        # The monitor keeps running, the button still stops it
+        self.button.set_label(
+                self.lang_dict['stop'][self.user_language])
+        return False
+
+
+    def on_check_done(self, future:concurrent.futures.Future) -> bool:
+        """
+        Showing the result of the "check" method. Called on the GTK thread.
+
+        Parameters:
+            future: the finished (or cancelled) check.
+
+        Returns:
+            bool: False, so that GLib calls the method only once.
+        """
+        if future is not self.lookup_future:
+            return False # The result of a check that was replaced by a newer one
+        self.lookup_future = None
+
+        if future.cancelled():
+            logger.info('The check was stopped by the user')
+            self.display_upper.set_text(
+                    self.lang_dict['vpn_status_unknown'][self.user_language])
+            self.display_middle.set_text(
+                    self.lang_dict['check_stopped'][self.user_language])
+            self.display_lower.set_text('')
             self.button.set_label(
                     self.lang_dict['make_comparison'][self.user_language])
-            return None
+            return False
 
-        if current_ip is None:
-            logger.info('Failed to get external IP address')
+        try:
+            _, result = future.result()
+        except FailedToGetIP as exc:
+            logger.error('Attempt to get IP failed: {}', exc)
             # Customization of displays and button
             self.display_upper.set_text(
-                    self.lang_dict['vpn_status_checked'][self.user_language])
+                    self.lang_dict['vpn_status_unknown'][self.user_language])
             self.display_middle.set_text(
                     self.lang_dict['failed_to_get_ip'][self.user_language])
             self.display_lower.set_text(
-                    self.lang_dict['try_again'][self.user_language])
+                    self.lang_dict['network_problem'][self.user_language])
             self.button.set_label(
                     self.lang_dict['make_comparison'][self.user_language])
-            return None
+            return False
+        except Exception as exc:
+            logger.error('An unknown error was found in the check: {}', exc)
+            result = None
+
+        self.show_result(result)
+        return False
 
-        # Starting the comparison process
-        logger.info('Starting the comparison process')
-        try:
-            comparison = IPAddressVerification(
-                    str(input_field_data), str(current_ip))
-        except NameError as exc:
-            logger.info('An attempt to instantiate the\
-                        IPAddressVerification class failed.')
-            return None
-        result = comparison.run()
-        logger.info(f'The comparison procedure is completed.\
-                    Comparison result obtained: {str(result)}')
 
+    def show_result(self, result:IPComparisonResult|DualStackComparisonResult|None):
+        """
+        Showing the comparison result on the displays.
+
+        Parameters:
+            result (IPComparisonResult | DualStackComparisonResult | None):
+                result of IPAddressVerification.run or run_dual.
+        """
         if result is None:
             logger.warning('Comparison failed.')
             # Customization of displays and button
@@ -226,22 +402,54 @@ class VisibleWindow(gtk.Window):
                 self.display_upper.set_text(
                         self.lang_dict['vpn_status_active'][self.user_language])
                 self.display_middle.set_text(f'{str(result[1])} = {result[2]}')
-                self.display_lower.set_text('')
+                self.display_lower.set_text(self.leak_text(result))
                 self.button.set_label(
                         self.lang_dict['make_comparison'][self.user_language])
             elif result[0] is False:
                 self.display_upper.set_text(
                         self.lang_dict['vpn_status_not_active'][self.user_language])
                 self.display_middle.set_text(f'{str(result[1])} ≠ {result[2]}')
-                self.display_lower.set_text('')
+                self.display_lower.set_text(self.leak_text(result))
                 self.button.set_label(
                         self.lang_dict['make_comparison'][self.user_language])
         except IndexError as exc:
-            logger.warning(f'Attempt to contact IPComparisonResult by index failed: {exc}')
+            logger.warning('Attempt to contact IPComparisonResult by index failed: {}', exc)
             return None
         return None
 
 
+    def leak_text(self, result:IPComparisonResult|DualStackComparisonResult) -> str:
+        """
+        The line for the lower display: the current addresses of the
+        other family that leak past the VPN (the compared address is
+        already shown on the middle display).
+
+        Parameters:
+            result (IPComparisonResult | DualStackComparisonResult): comparison result.
+
+        Returns:
+            str: the line, empty if nothing leaks or the result has no leak data.
+        """
+        if not isinstance(result, DualStackComparisonResult):
+            return ''
+        leaks = [address for address, leak in ((result.current_ipv4, result.ipv4_leak),
+                                               (result.current_ipv6, result.ipv6_leak))
+                 if leak and address != result.current_ip]
+        if not leaks:
+            return ''
+        return f"{self.lang_dict['ip_leak'][self.user_language]} {', '.join(leaks)}"
+
+
+    def stop_check(self):
+        """
+        Stopping the running check. The request in progress is cancelled
+        and its connection is closed; "on_check_done" then resets the displays.
+        """
+        if self.lookup_future is not None:
+            logger.info('Stopping the running check')
+            self.lookup_future.cancel()
+
+
     def template_main(self):
         """
         Creation of the main window of the application.
@@ -293,6 +501,14 @@ class VisibleWindow(gtk.Window):
         return value
 
 
+    def add_check_monitor(self):
+        """
+        Adding the switch of the monitor mode to the program.
+        """
+        value = self.builder.get_object('id_check_monitor')
+        return value
+
+
     def add_button_toggle_start(self):
         """
         Adding a control button to the program.
@@ -311,6 +527,9 @@ class VisibleWindow(gtk.Window):
             event: will be written...
         """
         logger.info('The cross has been pressed.')
+        self.stop_check()
+        self.ip_search.close() # Before the loop stops: its connections are closed on it
+        self.worker.close()
         gtk.main_quit() # Close window
 
 
@@ -319,10 +538,20 @@ class VisibleWindow(gtk.Window):
         """
         Method for launching the program logic module.
         Issued separately in order to catch exceptions with a logger.
+        While a check is running the button stops it. Repeated clicks
+        within DEBOUNCE_SECONDS are ignored.
 
         Parameters:
             button: will be written...
         """
+        now = time.monotonic()
+        if now - self.last_click < DEBOUNCE_SECONDS:
+            logger.info('Repeated click ignored')
+            return
+        self.last_click = now
+        if self.lookup_future is not None:
+            self.stop_check()
+            return
         self.main()
 
 class Activate:
@@ -333,5 +562,7 @@ class Activate:
         self.WINDOW = VisibleWindow()
 
 if __name__ == '__main__':
+    log_config.configure()
     Activate()
     gtk.main()
+    log_config.shutdown()
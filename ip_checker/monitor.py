@@ -0,0 +1,253 @@
+"""
+Continuous monitoring of the VPN connection: the external IPv4 address
+is checked periodically and compared with the expected address.
+The poll interval adapts: it grows while the state is stable and drops
+to the minimum after a change or a failed check, so a change is noticed
+quickly while the providers are asked as rarely as possible. With "watch_network"
+(Linux) the asynchronous loop also checks as soon as the network
+changes instead of waiting out the interval (see "network_watch").
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import asyncio
+import sys
+import threading
+import time
+from typing import Callable, NamedTuple, Union
+from loguru import logger
+from find_ip import GetMyIP, FailedToGetIP
+from check_ip import IPAddressVerification, IPComparisonResult
+from netlink import NetlinkEventSource
+from network_watch import NetworkCheckResult, NetworkWatcher
+
+ACTIVE = 'active'
+NOT_ACTIVE = 'not_active'
+UNKNOWN = 'unknown'
+
+
+class MonitorEvent(NamedTuple):
+    """
+    Description of a change of the VPN state.
+
+    previous: state before the change;
+    state: new state - "active", "not_active" or "unknown";
+    current_ip: the external address, None if it could not be obtained;
+    result: result of IPAddressVerification.run or None;
+    timestamp: time of the check (time.time).
+    """
+    previous: str
+    state: str
+    current_ip: Union[str, None]
+    result: Union[IPComparisonResult, None]
+    timestamp: float
+
+
+class VPNMonitor():
+    """
+    Periodic comparison of the external IPv4 address with the expected one.
+
+    Methods:
+        __init__: class initialization;
+        subscribe: adding a function called on every state change;
+        check_once: one blocking check;
+        acheck_once: one asynchronous check;
+        update: applying the result of a check to the state and the interval;
+        on_network_check: applying a check made after network changes;
+        run: blocking monitoring loop (headless mode);
+        arun: asynchronous monitoring loop (used by the GUI).
+
+    Class level variables:
+        self.expected_ip: the address expected while the VPN is active;
+        self.ip_search: GetMyIP instance used for the checks;
+        self.min_interval: seconds between checks after a change;
+        self.max_interval: the longest pause between checks, it limits the time
+            needed to notice a change (plus the time of one lookup);
+        self.backoff: factor by which the interval grows while nothing changes;
+        self.interval: the current pause between checks;
+        self.state: the current VPN state;
+        self.checks: number of checks made;
+        self.watcher: NetworkWatcher used by "arun", or None.
+    """
+
+    def __init__(self, expected_ip:str, ip_search:GetMyIP|None = None,
+                 min_interval:float = 10.0, max_interval:float = 300.0,
+                 backoff:float = 2.0, watch_network:bool = False,
+                 event_source:NetlinkEventSource|None = None, debounce:float = 0.5):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError('Expected 0 < min_interval <= max_interval. '
+                             f'Values: {min_interval}, {max_interval}')
+        if backoff < 1:
+            raise ValueError(f'backoff must be at least 1. Value: {backoff}')
+        self.expected_ip = expected_ip
+        self.ip_search = ip_search if ip_search is not None else GetMyIP()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.state = UNKNOWN
+        self.checks = 0
+        self._callbacks: list[Callable[[MonitorEvent], None]] = []
+        self._wake: asyncio.Event | None = None
+        self.watcher = None
+        if watch_network:
+            self.watcher = NetworkWatcher(self.ip_search, source=event_source,
+                                          debounce=debounce, on_check=self.on_network_check)
+
+    def subscribe(self, callback:Callable[[MonitorEvent], None]) -> None:
+        """
+        Adding a function called with a MonitorEvent on every state change.
+
+        Parameters:
+            callback (Callable): function taking one MonitorEvent.
+        """
+        self._callbacks.append(callback)
+
+    def check_once(self) -> Union[MonitorEvent, None]:
+        """
+        Getting a fresh external address and comparing it with the expected one.
+
+        Returns:
+            MonitorEvent: if the state changed;
+            None: the state is the same.
+        """
+        self.ip_search.invalidate()
+        try:
+            current_ip = str(self.ip_search.get())
+        except FailedToGetIP as exc:
+            logger.warning('The monitor could not get the external IP: {}', exc)
+            current_ip = None
+        return self.update(current_ip)
+
+    async def acheck_once(self) -> Union[MonitorEvent, None]:
+        """
+        Asynchronous counterpart of "check_once".
+
+        Returns:
+            MonitorEvent: if the state changed;
+            None: the state is the same.
+        """
+        self.ip_search.invalidate()
+        try:
+            current_ip = str(await self.ip_search.aget())
+        except FailedToGetIP as exc:
+            logger.warning('The monitor could not get the external IP: {}', exc)
+            current_ip = None
+        return self.update(current_ip)
+
+    def update(self, current_ip:Union[str, None]) -> Union[MonitorEvent, None]:
+        """
+        Comparing the address with the expected one, saving the new state
+        and choosing the pause before the next check: the minimum after
+        a change or a failure (no address, or it could not be compared),
+        otherwise the previous pause multiplied by "backoff".
+
+        Parameters:
+            current_ip (str | None): the external address or None if
+                it could not be obtained.
+
+        Returns:
+            MonitorEvent: if the state changed;
+            None: the state is the same.
+        """
+        result = None
+        state = UNKNOWN
+        if current_ip is not None:
+            result = IPAddressVerification(self.expected_ip, current_ip).run()
+            if result is not None:
+                state = ACTIVE if result.result else NOT_ACTIVE
+        previous = self.state
+        self.state = state
+        self.checks += 1
+        if state != previous or state == UNKNOWN:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        if state == previous:
+            return None
+        event = MonitorEvent(previous, state, current_ip, result, time.time())
+        logger.info('VPN state changed: {} -> {}', previous, state)
+        for callback in self._callbacks:
+            callback(event)
+        return event
+
+    def on_network_check(self, check:NetworkCheckResult) -> None:
+        """
+        Applying the check made by "watcher" after network changes, the
+        waiting loop of "arun" starts a new pause.
+
+        Parameters:
+            check (NetworkCheckResult): the result of the check.
+        """
+        self.update(str(check.ipv4) if check.ipv4 is not None else None)
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _watch_network(self) -> None:
+        try:
+            await self.watcher.run()
+        except OSError as exc:
+            logger.warning('Network changes can not be watched, only the interval '
+                           'is used: {}', exc)
+
+    def run(self, stop:threading.Event|None = None,
+            max_checks:int|None = None) -> None:
+        """
+        Checking until "stop" is set or "max_checks" checks are made.
+
+        Parameters:
+            stop (threading.Event | None): event that ends the loop at once;
+            max_checks (int | None): number of checks, None - without limit.
+        """
+        stop = stop if stop is not None else threading.Event()
+        while not stop.is_set():
+            self.check_once()
+            if max_checks is not None and self.checks >= max_checks:
+                return
+            stop.wait(self.interval)
+
+    async def arun(self, max_checks:int|None = None) -> None:
+        """
+        Asynchronous counterpart of "run", ends when the task is cancelled
+        or "max_checks" checks are made. With "watcher" a check made after
+        network changes replaces the check at the end of the pause.
+
+        Parameters:
+            max_checks (int | None): number of checks, None - without limit.
+        """
+        self._wake = asyncio.Event()
+        watch_task = None
+        if self.watcher is not None:
+            watch_task = asyncio.ensure_future(self._watch_network())
+        try:
+            await self.acheck_once()
+            while max_checks is None or self.checks < max_checks:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    await self.acheck_once()
+        finally:
+            self._wake = None
+            if watch_task is not None:
+                watch_task.cancel()
+                await asyncio.gather(watch_task, return_exceptions=True)
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('Usage: python monitor.py <expected IPv4 address>')
+        sys.exit(2)
+    import log_config
+    log_config.configure()
+    vpn_monitor = VPNMonitor(sys.argv[1])
+    vpn_monitor.subscribe(lambda event: print(
+            f'{time.strftime("%H:%M:%S", time.localtime(event.timestamp))} '
+            f'VPN {event.previous} -> {event.state} (current IP: {event.current_ip})',
+            flush=True))
+    try:
+        vpn_monitor.run()
+    except KeyboardInterrupt:
+        pass
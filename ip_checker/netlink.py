@@ -0,0 +1,234 @@
+"""
+Notifications of the Linux kernel about network changes (rtnetlink):
+links going up or down, addresses added or removed, routes changed -
+for example the "tun0" interface of a VPN disappearing or the default
+route moving to another interface. They let a check follow the network
+instead of a timer (see the "network_watch" module):
+
+    async with NetlinkEventSource() as source:
+        while True:
+            for event in await source.read():
+                print(event.kind, event.action, event.name, event.address)
+
+Only Linux has rtnetlink; elsewhere opening the source raises OSError.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import asyncio
+import errno
+import socket
+import struct
+from typing import NamedTuple, Union
+
+NETLINK_ROUTE = 0
+# Multicast groups of rtnetlink
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+DEFAULT_GROUPS = (RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE
+                  | RTMGRP_IPV6_IFADDR | RTMGRP_IPV6_ROUTE)
+
+# Kinds of the events
+LINK = 'link'
+ADDRESS = 'address'
+ROUTE = 'route'
+OVERFLOW = 'overflow' # Events were lost, anything may have changed
+NEW = 'new'
+DELETED = 'del'
+
+# Message type -> kind and action
+_MESSAGE_TYPES = {16: (LINK, NEW), 17: (LINK, DELETED),
+                  20: (ADDRESS, NEW), 21: (ADDRESS, DELETED),
+                  24: (ROUTE, NEW), 25: (ROUTE, DELETED)}
+_NLMSG_HEADER = struct.Struct('=IHHII')
+_IFINFOMSG = struct.Struct('=BxHiII')
+_IFADDRMSG = struct.Struct('=BBBBI')
+_RTMSG = struct.Struct('=BBBBBBBBI')
+_RTATTR = struct.Struct('=HH')
+IFF_UP = 0x1
+IFLA_IFNAME = 3
+IFA_ADDRESS, IFA_LOCAL, IFA_LABEL = 1, 2, 3
+RTA_DST, RTA_OIF, RTA_GATEWAY = 1, 4, 5
+RT_TABLE_LOCAL = 255
+RTM_F_CLONED = 0x200
+# Receive buffer, large enough for the bursts of a VPN reconnecting
+RECEIVE_BUFFER = 1024 * 1024
+
+
+class NetworkEvent(NamedTuple):
+    """
+    Description of one network change.
+
+    kind: LINK, ADDRESS, ROUTE or OVERFLOW;
+    action: NEW (also a changed link) or DELETED;
+    index: index of the interface, None if unknown;
+    name: name of the interface, None if the message has none;
+    address: the address, the gateway of a route or None;
+    up: whether a link is up, None for other kinds;
+    default: True for a default route (no destination).
+    """
+    kind: str
+    action: str
+    index: Union[int, None] = None
+    name: Union[str, None] = None
+    address: Union[str, None] = None
+    up: Union[bool, None] = None
+    default: bool = False
+
+
+def _attributes(data:bytes, offset:int, end:int) -> dict[int, bytes]:
+    attributes = {}
+    while offset + _RTATTR.size <= end:
+        length, kind = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        attributes[kind] = data[offset + _RTATTR.size:offset + length]
+        offset += (length + 3) & ~3 # Attributes are aligned to 4 bytes
+    return attributes
+
+
+def _address(family:int, value:Union[bytes, None]) -> Union[str, None]:
+    if value is None or len(value) not in (4, 16):
+        return None
+    return socket.inet_ntop(family, value)
+
+
+def _name(value:Union[bytes, None]) -> Union[str, None]:
+    if value is None:
+        return None
+    return value.split(b'\0', 1)[0].decode(errors='replace')
+
+
+def parse_messages(data:bytes) -> list[NetworkEvent]:
+    """
+    Reading the link, address and route messages of one datagram.
+    Routes of the "local" table (added by the kernel with every address)
+    and cloned (cache) routes are left out, as well as other messages.
+
+    Parameters:
+        data (bytes): datagram of a rtnetlink socket.
+
+    Returns:
+        list: NetworkEvent of every message, in their order.
+    """
+    events = []
+    offset = 0
+    while offset + _NLMSG_HEADER.size <= len(data):
+        length, message_type, _, _, _ = _NLMSG_HEADER.unpack_from(data, offset)
+        if length < _NLMSG_HEADER.size or offset + length > len(data):
+            break # Truncated or broken
+        body = offset + _NLMSG_HEADER.size
+        end = offset + length
+        offset += (length + 3) & ~3
+        if message_type not in _MESSAGE_TYPES:
+            continue
+        kind, action = _MESSAGE_TYPES[message_type]
+        if kind == LINK and body + _IFINFOMSG.size <= end:
+            _, _, index, flags, _ = _IFINFOMSG.unpack_from(data, body)
+            attributes = _attributes(data, body + _IFINFOMSG.size, end)
+            events.append(NetworkEvent(kind, action, index, _name(attributes.get(IFLA_IFNAME)),
+                                       up=bool(flags & IFF_UP)))
+        elif kind == ADDRESS and body + _IFADDRMSG.size <= end:
+            family, _, _, _, index = _IFADDRMSG.unpack_from(data, body)
+            attributes = _attributes(data, body + _IFADDRMSG.size, end)
+            value = attributes.get(IFA_LOCAL, attributes.get(IFA_ADDRESS))
+            events.append(NetworkEvent(kind, action, index, _name(attributes.get(IFA_LABEL)),
+                                       _address(family, value)))
+        elif kind == ROUTE and body + _RTMSG.size <= end:
+            family, destination_length, _, _, table, _, _, _, flags = _RTMSG.unpack_from(data,
+                                                                                        body)
+            if table == RT_TABLE_LOCAL or flags & RTM_F_CLONED:
+                continue
+            attributes = _attributes(data, body + _RTMSG.size, end)
+            oif = attributes.get(RTA_OIF)
+            index = struct.unpack('=I', oif)[0] if oif is not None and len(oif) == 4 else None
+            events.append(NetworkEvent(kind, action, index,
+                                       address=_address(family, attributes.get(RTA_GATEWAY)),
+                                       default=destination_length == 0))
+    return events
+
+
+class NetlinkEventSource():
+    """
+    Reading rtnetlink notifications on the current event loop.
+    Any object with the same "read" and "close" methods can replace it,
+    for example in the tests.
+
+    Methods:
+        __init__: class initialization;
+        open: opening and binding the socket, done by "read" if needed;
+        read: waiting for the next notifications;
+        close: closing the socket.
+
+    Class level variables:
+        self.groups: rtnetlink multicast groups listened to;
+        self.receive_buffer: size of the receive buffer of the socket.
+
+    Exceptions:
+        OSError: rtnetlink is not available (not Linux).
+    """
+
+    def __init__(self, groups:int = DEFAULT_GROUPS, receive_buffer:int = RECEIVE_BUFFER):
+        self.groups = groups
+        self.receive_buffer = receive_buffer
+        self._socket: socket.socket | None = None
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self) -> None:
+        """
+        Opening the socket and joining the groups.
+
+        Exceptions:
+            OSError: rtnetlink is not available.
+        """
+        if self._socket is not None:
+            return
+        if not hasattr(socket, 'AF_NETLINK'):
+            raise OSError(errno.EAFNOSUPPORT, 'rtnetlink is available on Linux only')
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer)
+            sock.bind((0, self.groups))
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        self._socket = sock
+
+    async def read(self) -> list[NetworkEvent]:
+        """
+        Waiting for the next datagram of notifications. If the kernel
+        had to drop notifications (the buffer overflowed in an event
+        storm), a single OVERFLOW event is returned instead.
+
+        Returns:
+            list: NetworkEvent records, may be empty (other messages).
+        """
+        self.open()
+        try:
+            data = await asyncio.get_running_loop().sock_recv(self._socket, 64 * 1024)
+        except OSError as exc:
+            if exc.errno != errno.ENOBUFS:
+                raise
+            return [NetworkEvent(OVERFLOW, NEW)]
+        return parse_messages(data)
+
+    def close(self) -> None:
+        """
+        Closing the socket.
+        """
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
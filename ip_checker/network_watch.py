@@ -0,0 +1,250 @@
+"""
+Re-checking the external address when the network changes instead of
+on a timer. Every relevant rtnetlink event (see the "netlink" module) -
+a link going down, an address removed, the default route moved -
+invalidates the cache of GetMyIP at once; after a short quiet period
+(debounce, so a VPN reconnecting with dozens of events costs one check)
+the address is looked up again and compared with the expected one by
+IPAddressVerification:
+
+    watcher = NetworkWatcher(GetMyIP(), expected_ip='203.0.113.5',
+                             on_check=lambda check: print(check.ipv4, check.comparison))
+    await watcher.run()
+
+The source of the events can be replaced by any object with the
+methods "read" (coroutine, a list of NetworkEvent) and "close".
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import asyncio
+import inspect
+import ipaddress
+import socket
+import time
+from typing import Callable, NamedTuple, Union
+from loguru import logger
+from find_ip import GetMyIP, FailedToGetIP
+from check_ip import IPAddressVerification, IPComparisonResult
+from ipv4 import IPv4
+import netlink
+from netlink import NetlinkEventSource, NetworkEvent
+
+
+class NetworkCheckResult(NamedTuple):
+    """
+    Description of a check made after network changes.
+
+    events: the events that led to the check;
+    ipv4: the external address, None if the lookup failed;
+    comparison: result of IPAddressVerification.run, None without an
+        expected address or without "ipv4";
+    error: why the lookup failed, None on success;
+    checked_at: time (time.time) of the end of the check.
+    """
+    events: tuple[NetworkEvent, ...]
+    ipv4: Union[IPv4, None]
+    comparison: Union[IPComparisonResult, None]
+    error: Union[str, None]
+    checked_at: float
+
+
+def loopback_indexes() -> frozenset[int]:
+    """
+    Returns:
+        frozenset: indexes of the loopback interfaces ("lo"), empty if unknown.
+    """
+    try:
+        return frozenset(index for index, name in socket.if_nameindex()
+                         if name == 'lo' or name.startswith('lo:'))
+    except OSError:
+        return frozenset()
+
+
+class NetworkWatcher():
+    """
+    Waiting for network events and re-checking the external address.
+
+    Methods:
+        __init__: class initialization;
+        is_relevant: whether an event can change the external address;
+        notice: handling the events read from the source;
+        check: looking the address up and comparing it;
+        run: reading the events until cancelled;
+        close: stopping the pending check and closing the source.
+
+    Class level variables:
+        self.ip_search: GetMyIP whose cache is invalidated;
+        self.expected_ip: address compared with the new one, or None;
+        self.source: source of the events, NetlinkEventSource by default;
+        self.debounce: seconds without new events before the check;
+        self.max_delay: the check is made at the latest this many seconds
+            after the first event, even if the events keep coming;
+        self.on_check: function (or coroutine function) called with every
+            NetworkCheckResult, or None;
+        self.events, self.checks: counters of the relevant events and of the checks;
+        self.last_check: the latest NetworkCheckResult or None.
+    """
+
+    def __init__(self, ip_search:GetMyIP, expected_ip:str|None = None,
+                 source:NetlinkEventSource|None = None, debounce:float = 0.5,
+                 max_delay:float = 5.0,
+                 on_check:Callable[[NetworkCheckResult], object]|None = None):
+        """
+        Parameters:
+            ip_search (GetMyIP): instance whose cache is invalidated and
+                which looks the address up;
+            expected_ip (str | None): the expected address (the VPN server);
+            source (NetlinkEventSource | None): source of the events, for
+                example a fake one in the tests. rtnetlink by default;
+            debounce (float): seconds without events before the check;
+            max_delay (float): upper limit of the wait for a quiet period;
+            on_check (Callable | None): called with every NetworkCheckResult.
+        """
+        if debounce < 0:
+            raise ValueError(f'debounce must not be negative. Value: {debounce}')
+        if max_delay < debounce:
+            raise ValueError(f'max_delay must not be below debounce. Value: {max_delay}')
+        self.ip_search = ip_search
+        self.expected_ip = expected_ip
+        self.source = source if source is not None else NetlinkEventSource()
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.on_check = on_check
+        self.events = 0
+        self.checks = 0
+        self.last_check: NetworkCheckResult | None = None
+        self._pending: list[NetworkEvent] = []
+        self._first_event = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+        self._check_task: asyncio.Task | None = None
+        self._loopback = loopback_indexes()
+
+    def is_relevant(self, event:NetworkEvent) -> bool:
+        """
+        Events of the loopback interface and of loopback addresses do
+        not change the external address, all other link, address and
+        route events (and lost events) may.
+
+        Parameters:
+            event (NetworkEvent): the event.
+
+        Returns:
+            bool: True if the address should be checked again.
+        """
+        if event.kind == netlink.OVERFLOW:
+            return True
+        if event.index in self._loopback or event.name == 'lo':
+            return False
+        if event.address is not None and ipaddress.ip_address(event.address).is_loopback:
+            return False
+        return True
+
+    def notice(self, events:list[NetworkEvent]) -> int:
+        """
+        Handling the events of one read: the cache of "ip_search" is
+        invalidated at once and the check is (re)scheduled after
+        "debounce" seconds, but not later than "max_delay" seconds after
+        the first of the pending events.
+
+        Parameters:
+            events (list): events read from the source.
+
+        Returns:
+            int: number of relevant events.
+        """
+        relevant = [event for event in events if self.is_relevant(event)]
+        if not relevant:
+            return 0
+        self.ip_search.invalidate()
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if not self._pending:
+            self._first_event = now
+        self._pending.extend(relevant)
+        self.events += len(relevant)
+        for event in relevant:
+            logger.debug('Network event: {} {} {} {}', event.kind, event.action,
+                         event.name or event.index, event.address or '')
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = min(self.debounce, self._first_event + self.max_delay - now)
+        self._timer = loop.call_later(max(delay, 0), self._start_check)
+        return len(relevant)
+
+    def _start_check(self) -> None:
+        self._timer = None
+        events = tuple(self._pending)
+        self._pending = []
+        if self._check_task is not None and not self._check_task.done():
+            self._check_task.cancel() # Its answer would describe the old network
+        self._check_task = asyncio.ensure_future(self.check(events))
+
+    async def check(self, events:tuple[NetworkEvent, ...] = ()) -> NetworkCheckResult:
+        """
+        Looking the external address up and comparing it with
+        "expected_ip". The lookup neither reads the cache nor joins a
+        lookup already running: both may come from before the change.
+
+        Parameters:
+            events (tuple): the events that led to the check.
+
+        Returns:
+            NetworkCheckResult: the result, also passed to "on_check".
+        """
+        logger.info('The network has changed ({} events), checking the external IP',
+                    len(events))
+        ipv4 = None
+        comparison = None
+        error = None
+        try:
+            deadline = self.ip_search.deadline
+            until = None if deadline is None else time.monotonic() + deadline
+            ipv4 = (await self.ip_search.alookup_uncached(until=until)).ipv4
+        except FailedToGetIP as exc:
+            logger.warning('The external IP could not be checked after a network change: {}',
+                           exc)
+            error = str(exc)
+        if ipv4 is not None and self.expected_ip is not None:
+            comparison = IPAddressVerification(self.expected_ip, str(ipv4)).run()
+        result = NetworkCheckResult(events, ipv4, comparison, error, time.time())
+        self.checks += 1
+        self.last_check = result
+        if self.on_check is not None:
+            try:
+                answer = self.on_check(result)
+                if inspect.isawaitable(answer):
+                    await answer
+            except Exception as exc:
+                logger.error('An unknown error was found in the handler of a check: {}', exc)
+        return result
+
+    async def run(self) -> None:
+        """
+        Reading the events and scheduling the checks until the task is
+        cancelled. The source is closed at the end.
+
+        Exceptions:
+            OSError: the source can not be opened (rtnetlink is not available).
+        """
+        try:
+            while True:
+                self.notice(await self.source.read())
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """
+        Cancelling the scheduled and the running check, closing the source.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._check_task is not None:
+            self._check_task.cancel()
+            await asyncio.gather(self._check_task, return_exceptions=True)
+            self._check_task = None
+        self.source.close()
@@ -0,0 +1,277 @@
+"""
+Declarative description of the sites that report the external IP address.
+A provider is a record with the link, the way the address is extracted
+from the answer, the request headers and the weight. Providers can be
+loaded from a JSON file, so the set can be changed without code changes.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import json
+import math
+import re
+from typing import Iterable, Iterator, NamedTuple, Union
+from bs4 import BeautifulSoup
+from loguru import logger
+# Imported as a package (python -m ip_checker) or as scripts from this directory
+if __package__:
+    from . import extract
+else:
+    import extract
+
+TEXT = 'text'
+JSON = 'json'
+REGEX = 'regex'
+HTML = 'html'
+EXTRACTORS = (TEXT, JSON, REGEX, HTML)
+
+_IPV4_TEXT = re.compile(r'\d{1,3}(?:\.\d{1,3}){3}')
+
+
+class Provider(NamedTuple):
+    """
+    Description of one provider.
+
+    name: unique name, also used in the health statistics;
+    url: link that is requested;
+    extractor: how the address is found in the answer:
+        "text" - the whole body is the address;
+        "json" - "query" is a dot separated path to the field ("ip", "data.ip");
+        "regex" - "query" is a regular expression, group 1 is the address;
+        "html" - "query" is a CSS selector of the element with the address;
+    query: see "extractor", not used for "text";
+    headers: additional request headers;
+    weight: providers with a bigger weight are called first; once the health
+        statistics of the providers are known ("health.py") the weight only
+        decides between providers that are expected to answer equally fast.
+    """
+    name: str
+    url: str
+    extractor: str = TEXT
+    query: str | None = None
+    headers: dict | None = None
+    weight: float = 1.0
+
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+    'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+    }
+
+# Endpoints that answer with the bare address, about 15 bytes
+PLAIN_TEXT_PROVIDERS = (
+        Provider('api.ipify.org', 'https://api.ipify.org', weight=3.0),
+        Provider('checkip.amazonaws.com', 'https://checkip.amazonaws.com', weight=3.0),
+        Provider('icanhazip.com', 'https://ipv4.icanhazip.com', weight=2.0),
+        Provider('ifconfig.me', 'https://ifconfig.me/ip', weight=2.0),
+        )
+
+# Endpoints that have only an AAAA record, so the answer is the IPv6 address
+IPV6_PROVIDERS = (
+        Provider('api6.ipify.org', 'https://api6.ipify.org', weight=3.0),
+        Provider('ipv6.icanhazip.com', 'https://ipv6.icanhazip.com', weight=2.0),
+        Provider('v6.ident.me', 'https://v6.ident.me', weight=1.0),
+        )
+
+# The sites used by the GetMyIP methods, described declaratively
+HTML_PROVIDERS = (
+        Provider('checkip.dyndns.org', 'http://checkip.dyndns.org', REGEX,
+                 r'Current IP Address:\s*(\d{1,3}(?:\.\d{1,3}){3})'),
+        Provider('ipaddress.com', 'https://www.ipaddress.com', HTML,
+                 'div#ipv4', BROWSER_HEADERS, weight=0.5),
+        Provider('iplocation.net', 'https://www.iplocation.net', HTML,
+                 'span.home-ip', BROWSER_HEADERS, weight=0.5),
+        )
+
+
+def check_provider(provider:Provider) -> Provider:
+    """
+    Checking that a provider record is complete.
+
+    Parameters:
+        provider (Provider): record to check.
+
+    Returns:
+        Provider: the same record.
+
+    Exceptions:
+        ValueError: the record is not valid.
+    """
+    if not provider.name or not provider.url:
+        raise ValueError(f'A provider needs a name and a url. Value: {provider}')
+    if not isinstance(provider.name, str) or not isinstance(provider.url, str):
+        raise ValueError(f'The name and the url of a provider must be strings. Value: {provider}')
+    if isinstance(provider.weight, bool) or not isinstance(provider.weight, (int, float)) \
+            or not math.isfinite(provider.weight):
+        raise ValueError(f'The weight of "{provider.name}" must be a number. '
+                         f'Value: {provider.weight!r}')
+    if provider.headers is not None and (
+            not isinstance(provider.headers, dict)
+            or not all(isinstance(key, str) and isinstance(value, str)
+                       for key, value in provider.headers.items())):
+        raise ValueError(f'The headers of "{provider.name}" must map strings to strings. '
+                         f'Value: {provider.headers!r}')
+    if provider.extractor not in EXTRACTORS:
+        raise ValueError(f'Unknown extractor "{provider.extractor}". '
+                         f'Expected one of: {", ".join(EXTRACTORS)}')
+    if provider.extractor != TEXT and not provider.query:
+        raise ValueError(f'The "{provider.extractor}" extractor of '
+                         f'"{provider.name}" needs a query')
+    if provider.extractor == REGEX:
+        try:
+            groups = re.compile(provider.query).groups
+        except re.error as exc:
+            raise ValueError(f'Invalid regex of "{provider.name}". {exc}') from exc
+        if groups < 1:
+            raise ValueError(f'The regex of "{provider.name}" needs a group with the address')
+    return provider
+
+
+def compile_pattern(provider:Provider) -> re.Pattern:
+    """
+    Byte pattern of a "regex" provider for the streaming extraction.
+
+    Parameters:
+        provider (Provider): provider with the "regex" extractor.
+
+    Returns:
+        re.Pattern: compiled pattern, group 1 is the address.
+    """
+    return re.compile(provider.query.encode())
+
+
+def extract_address(provider:Provider, page:Union[bytes, str]) -> Union[str, None]:
+    """
+    Finding the address string in the answer of a provider.
+    The result still has to be checked with "GetMyIP.make_control".
+
+    Parameters:
+        provider (Provider): the provider that gave the answer;
+        page (bytes | str): body of the answer.
+
+    Returns:
+        str: text that should contain the IPv4 address;
+        None: the address was not found.
+    """
+    if isinstance(page, bytes):
+        text = page.decode('utf-8', 'replace')
+    else:
+        text = page
+    if provider.extractor == TEXT:
+        return text.strip()
+    if provider.extractor == REGEX:
+        return extract.search_bytes(compile_pattern(provider), page)
+    if provider.extractor == JSON:
+        try:
+            value = json.loads(text)
+        except ValueError as exc:
+            logger.error('The answer of {} is not JSON. {}', provider.name, exc)
+            return None
+        for key in provider.query.split('.'):
+            if not isinstance(value, dict) or key not in value:
+                logger.error('The answer of {} has no field {}', provider.name, provider.query)
+                return None
+            value = value[key]
+        return str(value).strip()
+    element = BeautifulSoup(page, 'html.parser').select_one(provider.query)
+    if element is None:
+        logger.error('The page of {} has no element {}', provider.name, provider.query)
+        return None
+    found = _IPV4_TEXT.search(element.text)
+    if found is None:
+        return element.text.strip()
+    return found.group(0)
+
+
+class ProviderRegistry():
+    """
+    The set of providers used by GetMyIP.
+
+    Methods:
+        __init__: class initialization;
+        __iter__: providers sorted by weight, the biggest first;
+        __len__: number of providers;
+        register: adding or replacing a provider;
+        remove: removing a provider by name;
+        from_file: creating a registry from a JSON file;
+        load_file: adding the providers from a JSON file.
+
+    The JSON file is a list of providers, or an object with the
+    "providers" list. Every provider is an object with the fields of
+    the Provider record:
+        [{"name": "ipify", "url": "https://api.ipify.org"},
+         {"name": "ipify-json", "url": "https://api.ipify.org?format=json",
+          "extractor": "json", "query": "ip", "weight": 0.5}]
+    """
+
+    def __init__(self, providers:Iterable[Provider] = PLAIN_TEXT_PROVIDERS):
+        self._providers: dict[str, Provider] = {}
+        for provider in providers:
+            self.register(provider)
+
+    def __iter__(self) -> Iterator[Provider]:
+        return iter(sorted(self._providers.values(),
+                           key=lambda provider: -provider.weight))
+
+    def __len__(self) -> int:
+        return len(self._providers)
+
+    def register(self, provider:Provider) -> None:
+        """
+        Adding a provider, a provider with the same name is replaced.
+
+        Parameters:
+            provider (Provider): provider record.
+        """
+        self._providers[provider.name] = check_provider(provider)
+
+    def remove(self, name:str) -> None:
+        """
+        Removing a provider.
+
+        Parameters:
+            name (str): provider name.
+        """
+        self._providers.pop(name, None)
+
+    def load_file(self, path:str) -> None:
+        """
+        Adding the providers described in a JSON file.
+
+        Parameters:
+            path (str): path to the file.
+
+        Exceptions:
+            OSError: the file can not be read;
+            ValueError: the file is not valid JSON or a provider is not valid.
+        """
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        if isinstance(data, dict):
+            data = data.get('providers', [])
+        if not isinstance(data, list):
+            raise ValueError(f'Expected a list of providers in {path}')
+        for fields in data:
+            try:
+                provider = Provider(**fields)
+            except TypeError as exc:
+                raise ValueError(f'Invalid provider in {path}: {fields}. {exc}') from exc
+            self.register(provider)
+
+    @classmethod
+    def from_file(cls, path:str) -> 'ProviderRegistry':
+        """
+        Creating a registry that contains only the providers of a JSON file.
+
+        Parameters:
+            path (str): path to the file.
+
+        Returns:
+            ProviderRegistry: new registry.
+        """
+        registry = cls(())
+        registry.load_file(path)
+        return registry
@@ -0,0 +1,273 @@
+"""
+Bulk verification of the addresses that outbound proxies exit from.
+Thousands of HTTP and SOCKS5 proxies are checked concurrently on one
+event loop; the number of proxies checked at once is bounded, every
+proxy has its own timeout and the results are given out as soon as
+each check ends (not in the order of the input):
+
+    checker = ProxyChecker(concurrency=200, timeout=10, expected='203.0.113.5')
+    for result in checker.check(proxies):
+        print(result.proxy, result.ipv4, result.latency, result.error, result.match)
+
+From the command line the proxies are read one per line, the results
+are written as JSON lines:
+
+    python proxy_check.py proxies.txt --concurrency 200 --expected 203.0.113.5
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import argparse
+import asyncio
+import json
+import queue
+import sys
+import threading
+import time
+from typing import AsyncIterator, Iterable, Iterator, Mapping, NamedTuple, Union
+from loguru import logger
+import providers
+from providers import Provider
+from find_ip import GetMyIP, FailedToGetIP
+from check_ip import IPAddressVerification
+from ipv4 import IPv4
+
+
+class ProxyCheckResult(NamedTuple):
+    """
+    Description of the result of one proxy.
+
+    proxy: link of the proxy;
+    ipv4: the address the proxy exits from, None if the check failed;
+    latency: seconds the check took;
+    error: why the check failed, None on success;
+    expected: the expected exit address or None;
+    match: result of IPAddressVerification, None without an expected
+        address or without "ipv4".
+    """
+    proxy: str
+    ipv4: Union[IPv4, None]
+    latency: float
+    error: Union[str, None]
+    expected: Union[str, None] = None
+    match: Union[bool, None] = None
+
+
+class ProxyChecker():
+    """
+    Checking many proxies concurrently.
+
+    Methods:
+        __init__: class initialization;
+        expected_for: the expected address of a proxy;
+        acheck_one: checking one proxy;
+        acheck: checking proxies, the results are yielded as they come;
+        check: blocking counterpart of "acheck".
+
+    Class level variables:
+        self.providers: provider records asked through every proxy;
+        self.concurrency: how many proxies are checked at once;
+        self.timeout: seconds for the whole check of one proxy;
+        self.expected: expected exit address of all proxies, or a mapping
+            proxy -> expected address;
+        self.provider_urls: links of the sites of "get_external_ipv4_N",
+            used when "providers" is None.
+    """
+
+    def __init__(self, providers:Iterable[Provider]|None = providers.PLAIN_TEXT_PROVIDERS,
+                 concurrency:int = 100, timeout:float = 10.0,
+                 expected:Union[str, Mapping[str, str], None] = None,
+                 provider_urls:Iterable[str]|None = None):
+        """
+        Parameters:
+            providers (Iterable[Provider] | None): providers asked through the
+                proxies, the small plain text endpoints by default. None - the
+                three sites of GetMyIP;
+            concurrency (int): how many proxies are checked at once;
+            timeout (float): seconds for the whole check of one proxy,
+                including the fallback to the next provider;
+            expected (str | Mapping | None): expected exit address of all proxies,
+                or a mapping proxy -> expected address;
+            provider_urls (Iterable[str] | None): links of the three sites,
+                with "providers" None (for example the local copies of the sites).
+        """
+        if concurrency < 1:
+            raise ValueError(f'concurrency must be positive. Value: {concurrency}')
+        self.providers = None if providers is None else tuple(providers)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.expected = expected
+        self.provider_urls = provider_urls
+
+    def expected_for(self, proxy:str) -> Union[str, None]:
+        """
+        Parameters:
+            proxy (str): link of the proxy.
+
+        Returns:
+            str: the expected exit address of the proxy;
+            None: nothing is expected.
+        """
+        if self.expected is None or isinstance(self.expected, str):
+            return self.expected
+        return self.expected.get(proxy)
+
+    async def acheck_one(self, proxy:str) -> ProxyCheckResult:
+        """
+        Asking the providers through one proxy, one after another, until
+        one of them answers or the timeout of the proxy expires. The
+        attempts share the keep-alive connections of the check: a
+        connection to an HTTP proxy carries all plain http requests,
+        a tunnel (CONNECT, SOCKS5) only the requests to its own host.
+        The connections are closed at the end of the check.
+
+        Parameters:
+            proxy (str): link of the proxy.
+
+        Returns:
+            ProxyCheckResult: the result, errors are reported in it.
+        """
+        started = time.monotonic()
+        ipv4 = None
+        error = None
+        ip_search = None
+        try:
+            settings = {} if self.provider_urls is None else {'provider_urls': self.provider_urls}
+            # A new instance per proxy: the health statistics of one proxy
+            # must not reorder or block the providers for the others
+            ip_search = GetMyIP(providers=self.providers, proxy=proxy, adaptive=False,
+                                coalesce=False, **settings)
+            ipv4 = await asyncio.wait_for(ip_search.afind(race=False), self.timeout)
+        except FailedToGetIP as exc:
+            error = str(exc)
+        except asyncio.TimeoutError:
+            error = f'No answer within {self.timeout} s'
+        except ValueError as exc:
+            error = str(exc)
+        finally:
+            if ip_search is not None:
+                ip_search.close()
+        latency = time.monotonic() - started
+        expected = self.expected_for(proxy)
+        match = None
+        if ipv4 is not None and expected is not None:
+            comparison = IPAddressVerification(expected, str(ipv4)).run()
+            match = None if comparison is None else comparison.result
+        return ProxyCheckResult(proxy, ipv4, latency, error, expected, match)
+
+    async def acheck(self, proxies:Iterable[str]) -> AsyncIterator[ProxyCheckResult]:
+        """
+        Checking the proxies with at most "concurrency" checks at once.
+        The proxies are taken from the iterable lazily and the results
+        are yielded in the order in which the checks end. If the consumer
+        stops early, the running checks are cancelled.
+
+        Parameters:
+            proxies (Iterable[str]): links of the proxies.
+
+        Returns:
+            AsyncIterator: ProxyCheckResult of every proxy.
+        """
+        pending = iter(proxies)
+        # Bounded, so the checks wait for a slow consumer instead of piling up results
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+
+        async def worker():
+            try:
+                for proxy in pending: # One iterator shared by the workers of this loop
+                    started = time.monotonic()
+                    try:
+                        result = await self.acheck_one(proxy)
+                    except Exception as exc:
+                        # The worker goes on with the next proxy, this one gets the error
+                        logger.error('An unknown error was found in the check of {}: {}',
+                                     proxy, exc)
+                        result = ProxyCheckResult(proxy, None, time.monotonic() - started,
+                                                  f'Unknown error: {exc!r}',
+                                                  self.expected_for(proxy))
+                    await results.put(result)
+            except Exception as exc: # The iterable of the proxies failed
+                logger.error('An unknown error was found in the list of proxies: {}', exc)
+            await results.put(None) # This worker is over
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        running = len(workers)
+        try:
+            while running:
+                result = await results.get()
+                if result is None:
+                    running -= 1
+                else:
+                    yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def check(self, proxies:Iterable[str]) -> Iterator[ProxyCheckResult]:
+        """
+        Blocking counterpart of "acheck": the event loop runs on
+        a background thread, the results are yielded to the caller as
+        they come.
+
+        Parameters:
+            proxies (Iterable[str]): links of the proxies.
+
+        Returns:
+            Iterator: ProxyCheckResult of every proxy.
+        """
+        output: queue.Queue = queue.Queue()
+        finished = object()
+        loop = asyncio.new_event_loop()
+
+        async def produce():
+            try:
+                async for result in self.acheck(proxies):
+                    output.put(result)
+            finally:
+                output.put(finished)
+
+        task = loop.create_task(produce())
+
+        def run():
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                pass # The caller stopped early
+
+        thread = threading.Thread(target=run, name='ProxyChecker', daemon=True)
+        thread.start()
+        try:
+            while (result := output.get()) is not finished:
+                yield result
+        finally:
+            loop.call_soon_threadsafe(task.cancel)
+            thread.join()
+            loop.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Checking the exit addresses of proxies.')
+    parser.add_argument('file', help='file with one proxy link per line, "-" - stdin')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--expected', help='expected exit address of all proxies')
+    args = parser.parse_args()
+    import log_config
+    log_config.configure(console_level='ERROR')
+    source = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')
+    with source:
+        links = (line.strip() for line in source if line.strip() and not line.startswith('#'))
+        checker = ProxyChecker(concurrency=args.concurrency, timeout=args.timeout,
+                               expected=args.expected)
+        for result in checker.check(links):
+            print(json.dumps({'proxy': result.proxy,
+                              'ipv4': None if result.ipv4 is None else str(result.ipv4),
+                              'latency': round(result.latency, 3), 'error': result.error,
+                              'expected': result.expected, 'match': result.match}),
+                  flush=True)
+    logger.info('The proxy check is over')
+    log_config.shutdown()
@@ -0,0 +1,170 @@
+"""
+State kept between the runs of the program: the last external IPv4
+address, when it was obtained and the health statistics of the providers.
+With it the window and the command line can show the last known address
+at once (marked as stale) and the providers are ordered by their
+statistics from the first request.
+
+The file starts with a fixed binary header (the address and the time),
+so the last address is read with one small read and without parsing;
+the statistics follow as JSON and are read only when they are needed.
+The file is replaced atomically, a reader never sees half a file.
+The module imports only the standard library and the "ipv4" module.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import json
+import os
+import struct
+import threading
+from typing import NamedTuple, Union
+# Imported as a package (python -m ip_checker) or as scripts from this directory
+if __package__:
+    from .ipv4 import IPv4
+else:
+    from ipv4 import IPv4
+
+# The state directory can be moved with the IP_CHECKER_STATE_DIR environment variable
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser('~'), '.ip_checker')
+STATE_FILE_NAME = 'state.bin'
+
+# magic, format version, flags, the address (uint32), obtained_at (time.time)
+_HEADER = struct.Struct('<4sBB2xId')
+_MAGIC = b'IPCS'
+_VERSION = 1
+_HAS_IPV4 = 1
+
+
+class LastKnownIP(NamedTuple):
+    """
+    Description of the data returned by the "read_last" method.
+    """
+    ipv4: IPv4
+    obtained_at: float
+
+class SavedState(NamedTuple):
+    """
+    Description of the data returned by the "read" method.
+
+    last: the last known address, None if no address was saved;
+    providers: HealthTracker.snapshot of the providers.
+    """
+    last: Union[LastKnownIP, None]
+    providers: dict[str, dict]
+
+
+def default_path() -> str:
+    """
+    Returns:
+        str: path to the state file, IP_CHECKER_STATE_DIR or "~/.ip_checker".
+    """
+    directory = os.environ.get('IP_CHECKER_STATE_DIR', DEFAULT_STATE_DIR)
+    return os.path.join(directory, STATE_FILE_NAME)
+
+
+class StateFile():
+    """
+    Reading and writing the state file.
+
+    Methods:
+        __init__: class initialization;
+        read_last: the last known address, only the header is read;
+        read: the address and the provider statistics;
+        write: replacing the file.
+
+    Class level variables:
+        self.path: path to the state file.
+
+    Reading never raises an exception: a missing or broken file is
+    the same as no state. Writing errors are ignored too, the state
+    is only an optimisation.
+    """
+
+    def __init__(self, path:Union[str, None] = None):
+        """
+        Parameters:
+            path (str | None): path to the file, "default_path()" by default.
+        """
+        self.path = default_path() if path is None else path
+
+    def _unpack(self, header:bytes) -> Union[LastKnownIP, None]:
+        if len(header) < _HEADER.size:
+            return None
+        magic, version, flags, ipv4, obtained_at = _HEADER.unpack_from(header)
+        if magic != _MAGIC or version != _VERSION or not flags & _HAS_IPV4:
+            return None
+        return LastKnownIP(IPv4(ipv4), obtained_at)
+
+    def read_last(self) -> Union[LastKnownIP, None]:
+        """
+        Reading the last known address from the header of the file.
+
+        Returns:
+            LastKnownIP: the address and when it was obtained (time.time);
+            None: no file, a broken file or no address saved.
+        """
+        try:
+            with open(self.path, 'rb') as file:
+                return self._unpack(file.read(_HEADER.size))
+        except OSError:
+            return None
+
+    def read(self) -> Union[SavedState, None]:
+        """
+        Reading the whole state.
+
+        Returns:
+            SavedState: the last address and the provider statistics;
+            None: no file or a broken file.
+        """
+        try:
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        if len(data) < _HEADER.size or data[:len(_MAGIC)] != _MAGIC:
+            return None
+        try:
+            providers = json.loads(data[_HEADER.size:] or b'{}')
+        except ValueError:
+            return None
+        if not isinstance(providers, dict):
+            return None
+        return SavedState(self._unpack(data), providers)
+
+    def write(self, last:Union[LastKnownIP, None], providers:dict[str, dict]) -> bool:
+        """
+        Replacing the state file. The new content is written to
+        a temporary file in the same directory and renamed over the old one.
+
+        Parameters:
+            last (LastKnownIP | None): the last known address;
+            providers (dict): HealthTracker.snapshot of the providers.
+
+        Returns:
+            bool: True if the file was written.
+        """
+        if last is None:
+            header = _HEADER.pack(_MAGIC, _VERSION, 0, 0, 0.0)
+        else:
+            header = _HEADER.pack(_MAGIC, _VERSION, _HAS_IPV4,
+                                  int(last.ipv4), last.obtained_at)
+        body = json.dumps(providers, separators=(',', ':')).encode()
+        # One temporary file per writer, so concurrent writers do not mix their data
+        temporary = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(temporary, 'wb') as file:
+                file.write(header + body)
+            os.replace(temporary, self.path)
+        except OSError:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return False
+        return True
@@ -0,0 +1,270 @@
+"""
+Getting the external IPv4 address with a STUN Binding Request (RFC 5389).
+One small UDP packet is sent and the server answers with the address
+and port it saw (the XOR-MAPPED-ADDRESS attribute).
+The module also contains a local STUN responder for tests and benchmarks.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import os
+import socket
+import struct
+import threading
+from typing import NamedTuple, Union
+# Imported as a package (python -m ip_checker) or as scripts from this directory
+if __package__:
+    from . import udp_request
+else:
+    import udp_request
+
+MAGIC_COOKIE = 0x2112A442
+BINDING_REQUEST = 0x0001
+BINDING_SUCCESS = 0x0101
+ATTR_MAPPED_ADDRESS = 0x0001
+ATTR_XOR_MAPPED_ADDRESS = 0x0020
+FAMILY_IPV4 = 0x01
+
+_HEADER = struct.Struct('!HHI12s')
+_ATTRIBUTE = struct.Struct('!HH')
+_ADDRESS = struct.Struct('!xBH4s')
+
+
+class STUNError(ValueError):
+    """
+    This exception is raised if a STUN answer is malformed or is not a success.
+    """
+
+
+class STUNServer(NamedTuple):
+    """
+    Description of a STUN server.
+
+    name: name used in the health statistics;
+    host: host name or address of the server;
+    port: UDP port of the server.
+    """
+    name: str
+    host: str
+    port: int = 3478
+
+
+DEFAULT_STUN_SERVERS = (
+        STUNServer('google', 'stun.l.google.com', 19302),
+        STUNServer('cloudflare', 'stun.cloudflare.com', 3478),
+        )
+
+
+def encode_request(transaction_id:bytes) -> bytes:
+    """
+    Encoding a Binding Request without attributes.
+
+    Parameters:
+        transaction_id (bytes): 12 random bytes repeated in the answer.
+
+    Returns:
+        bytes: UDP payload.
+    """
+    return _HEADER.pack(BINDING_REQUEST, 0, MAGIC_COOKIE, transaction_id)
+
+
+def encode_response(transaction_id:bytes, address:str, port:int) -> bytes:
+    """
+    Encoding a Binding Success Response with the XOR-MAPPED-ADDRESS attribute.
+
+    Parameters:
+        transaction_id (bytes): identifier of the request;
+        address (str): IPv4 address to report;
+        port (int): port to report.
+
+    Returns:
+        bytes: UDP payload.
+    """
+    xor_port = port ^ (MAGIC_COOKIE >> 16)
+    xor_address = (int.from_bytes(socket.inet_aton(address), 'big') ^ MAGIC_COOKIE
+                   ).to_bytes(4, 'big')
+    value = _ADDRESS.pack(FAMILY_IPV4, xor_port, xor_address)
+    attribute = _ATTRIBUTE.pack(ATTR_XOR_MAPPED_ADDRESS, len(value)) + value
+    return _HEADER.pack(BINDING_SUCCESS, len(attribute), MAGIC_COOKIE,
+                        transaction_id) + attribute
+
+
+def decode_response(message:bytes, transaction_id:bytes) -> tuple[str, int]:
+    """
+    Decoding a Binding Success Response.
+
+    Parameters:
+        message (bytes): UDP payload of the answer;
+        transaction_id (bytes): identifier of the request.
+
+    Returns:
+        tuple: the mapped IPv4 address and port.
+
+    Exceptions:
+        STUNError: the answer is malformed, belongs to another request,
+            is not a success or has no IPv4 mapped address.
+    """
+    if len(message) < _HEADER.size:
+        raise STUNError('The answer is shorter than the STUN header')
+    message_type, length, cookie, answer_id = _HEADER.unpack_from(message)
+    if cookie != MAGIC_COOKIE or answer_id != transaction_id:
+        raise STUNError('The answer belongs to another request')
+    if message_type != BINDING_SUCCESS:
+        raise STUNError(f'Unexpected message type 0x{message_type:04x}')
+    end = min(len(message), _HEADER.size + length)
+    offset = _HEADER.size
+    mapped = None
+    while offset + _ATTRIBUTE.size <= end:
+        attr_type, attr_length = _ATTRIBUTE.unpack_from(message, offset)
+        offset += _ATTRIBUTE.size
+        value = message[offset:offset + attr_length]
+        offset += (attr_length + 3) & ~3 # Attributes are padded to 4 bytes
+        if attr_type not in (ATTR_XOR_MAPPED_ADDRESS, ATTR_MAPPED_ADDRESS):
+            continue
+        if len(value) < _ADDRESS.size or value[1] != FAMILY_IPV4:
+            continue
+        family, port, raw_address = _ADDRESS.unpack_from(value)
+        if attr_type == ATTR_XOR_MAPPED_ADDRESS:
+            port ^= MAGIC_COOKIE >> 16
+            raw_address = (int.from_bytes(raw_address, 'big') ^ MAGIC_COOKIE
+                           ).to_bytes(4, 'big')
+            return socket.inet_ntoa(raw_address), port
+        mapped = socket.inet_ntoa(raw_address), port
+    if mapped is None:
+        raise STUNError('The answer has no IPv4 mapped address')
+    return mapped
+
+
+def make_request() -> tuple[bytes, bytes]:
+    """
+    Encoding a new Binding Request with a random transaction id.
+
+    Returns:
+        tuple: UDP payload and the transaction id.
+    """
+    transaction_id = os.urandom(12)
+    return encode_request(transaction_id), transaction_id
+
+
+def answer_id(message:bytes) -> bytes:
+    """
+    Parameters:
+        message (bytes): UDP payload of an answer.
+
+    Returns:
+        bytes: transaction id of the request it answers.
+    """
+    return message[8:20]
+
+
+def query(server:STUNServer, timeout_ms:int = 500,
+          retries:int = 2) -> Union[tuple[str, int], None]:
+    """
+    Sending a Binding Request and waiting for the answer. A late answer
+    to an earlier attempt is accepted (see the "udp_request" module).
+
+    Parameters:
+        server (STUNServer): server to ask;
+        timeout_ms (int): milliseconds to wait for each attempt;
+        retries (int): additional attempts after the first one.
+
+    Returns:
+        tuple: the mapped IPv4 address and port;
+        None: no answer within the attempts.
+
+    Exceptions:
+        OSError: the server can not be reached (no network);
+        STUNError: the answer is malformed or is not a success.
+    """
+    answer = udp_request.request((server.host, server.port), make_request, answer_id,
+                                 timeout_ms, retries, buffer_size=2048)
+    return None if answer is None else decode_response(*answer)
+
+
+async def aquery(server:STUNServer, timeout_ms:int = 500,
+                 retries:int = 2) -> Union[tuple[str, int], None]:
+    """
+    Asynchronous counterpart of "query".
+
+    Parameters:
+        server (STUNServer): server to ask;
+        timeout_ms (int): milliseconds to wait for each attempt;
+        retries (int): additional attempts after the first one.
+
+    Returns:
+        tuple: the mapped IPv4 address and port;
+        None: no answer within the attempts.
+    """
+    answer = await udp_request.arequest((server.host, server.port), make_request,
+                                        answer_id, timeout_ms, retries)
+    return None if answer is None else decode_response(*answer)
+
+
+class StunResponder():
+    """
+    Local STUN server for tests and benchmarks. Answers every Binding
+    Request with the address of the sender, or with "mapped_address"
+    if it is given (to pretend to be seen from the Internet).
+
+    Methods:
+        __init__: class initialization, the server starts at once;
+        server: STUNServer record pointing to this responder;
+        close: stopping the responder.
+
+    Class level variables:
+        self.port: UDP port the responder listens on;
+        self.requests: number of requests received.
+    """
+
+    def __init__(self, mapped_address:str|None = None, host:str = '127.0.0.1'):
+        self.mapped_address = mapped_address
+        self.requests = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, 0))
+        self._sock.settimeout(0.1)
+        self._stopped = threading.Event()
+        self.host, self.port = self._sock.getsockname()
+        self._thread = threading.Thread(target=self._serve, daemon=True,
+                                        name='StunResponder')
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                message, (address, port) = self._sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if len(message) < _HEADER.size:
+                continue
+            message_type, _, cookie, transaction_id = _HEADER.unpack_from(message)
+            if message_type != BINDING_REQUEST or cookie != MAGIC_COOKIE:
+                continue
+            self.requests += 1
+            self._sock.sendto(encode_response(
+                    transaction_id, self.mapped_address or address, port), (address, port))
+
+    def server(self) -> STUNServer:
+        """
+        Returns:
+            STUNServer: record pointing to this responder.
+        """
+        return STUNServer('local', self.host, self.port)
+
+    def close(self) -> None:
+        """
+        Stopping the responder.
+        """
+        self._stopped.set()
+        self._thread.join()
+        self._sock.close()
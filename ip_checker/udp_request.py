@@ -0,0 +1,131 @@
+"""
+One request over UDP with retries, shared by the DNS ("dns_ip") and the
+STUN ("stun_ip") backends. Every attempt sends a new request with a new
+identifier and waits at most the timeout of the attempt; an answer to
+any earlier attempt is accepted too, so a late answer is not thrown away
+because the request was already repeated. Datagrams that do not answer
+one of the requests are skipped without extending the wait.
+
+    answer = request(('1.1.1.1', 53), make_request, answer_id, timeout_ms=500, retries=2)
+    if answer is not None:
+        message, identifier = answer
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import asyncio
+import socket
+import time
+from typing import Callable, Hashable, Union
+
+# A new request: the payload to send and the identifier the answer repeats
+RequestFactory = Callable[[], tuple[bytes, Hashable]]
+# The identifier found in a received datagram
+AnswerId = Callable[[bytes], Hashable]
+
+
+def request(address:tuple[str, int], make_request:RequestFactory, answer_id:AnswerId,
+            timeout_ms:int = 500, retries:int = 2, buffer_size:int = 4096,
+            family:int = socket.AF_INET) -> Union[tuple[bytes, Hashable], None]:
+    """
+    Sending a request and waiting for the answer.
+
+    Parameters:
+        address (tuple): host and UDP port of the server;
+        make_request (Callable): returns the payload of a new attempt and its identifier;
+        answer_id (Callable): returns the identifier of a received datagram;
+        timeout_ms (int): milliseconds to wait for each attempt;
+        retries (int): additional attempts after the first one;
+        buffer_size (int): the largest datagram read;
+        family (int): address family of the socket.
+
+    Returns:
+        tuple: the answer and the identifier of the attempt it answers;
+        None: no answer within the attempts.
+
+    Exceptions:
+        OSError: the server can not be reached (no network).
+    """
+    sent = set()
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.connect(address)
+        for _ in range(retries + 1):
+            payload, identifier = make_request()
+            sent.add(identifier)
+            sock.send(payload)
+            deadline = time.monotonic() + timeout_ms / 1000
+            while (remaining := deadline - time.monotonic()) > 0:
+                sock.settimeout(remaining) # A stray datagram does not restart the wait
+                try:
+                    message = sock.recv(buffer_size)
+                except socket.timeout:
+                    break
+                identifier = answer_id(message)
+                if identifier in sent:
+                    return message, identifier
+    return None
+
+
+class _AnswerProtocol(asyncio.DatagramProtocol):
+    """
+    Receiving the answers of "arequest" on the event loop.
+    """
+
+    def __init__(self, answers:asyncio.Queue):
+        self.answers = answers
+
+    def datagram_received(self, data, addr):
+        self.answers.put_nowait(data)
+
+    def error_received(self, exc):
+        self.answers.put_nowait(exc)
+
+
+async def arequest(address:tuple[str, int], make_request:RequestFactory,
+                   answer_id:AnswerId, timeout_ms:int = 500, retries:int = 2,
+                   family:int = socket.AF_INET) -> Union[tuple[bytes, Hashable], None]:
+    """
+    Asynchronous counterpart of "request".
+
+    Parameters:
+        address (tuple): host and UDP port of the server;
+        make_request (Callable): returns the payload of a new attempt and its identifier;
+        answer_id (Callable): returns the identifier of a received datagram;
+        timeout_ms (int): milliseconds to wait for each attempt;
+        retries (int): additional attempts after the first one;
+        family (int): address family of the socket.
+
+    Returns:
+        tuple: the answer and the identifier of the attempt it answers;
+        None: no answer within the attempts.
+
+    Exceptions:
+        OSError: the server can not be reached (no network).
+    """
+    answers: asyncio.Queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+            lambda: _AnswerProtocol(answers), remote_addr=address, family=family)
+    sent = set()
+    try:
+        for _ in range(retries + 1):
+            payload, identifier = make_request()
+            sent.add(identifier)
+            transport.sendto(payload)
+            deadline = loop.time() + timeout_ms / 1000
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    message = await asyncio.wait_for(answers.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if isinstance(message, Exception):
+                    raise message
+                identifier = answer_id(message)
+                if identifier in sent:
+                    return message, identifier
+    finally:
+        transport.close()
+    return None
@@ -0,0 +1,89 @@
+"""
+Event loop on a background thread that runs the checks of the GUI, so
+the window is not blocked by a slow network. The coroutines are handed
+over from the GTK thread and their results come back as
+concurrent.futures.Future; cancelling the future (the Stop button)
+cancels the coroutine on the loop and closes its connections:
+
+    worker = WorkerLoop()
+    future = worker.submit(ip_search.aget())
+    future.add_done_callback(lambda future: GLib.idle_add(show, future))
+    ...
+    future.cancel()
+
+The loop lives as long as the program, so the keep-alive connections
+of GetMyIP (see GetMyIP.get_async_pool) are reused by all checks.
+
+Author: Mikhail Gurov
+Last Modified: Oct 16, 2026
+"""
+#!/usr/bin/env python3.10
+# -- coding: utf-8 --
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Coroutine
+
+
+class WorkerLoop():
+    """
+    Event loop running on its own thread.
+
+    Methods:
+        __init__: class initialization, the thread starts at once;
+        submit: running a coroutine on the loop;
+        close: cancelling the running coroutines and stopping the thread.
+
+    Class level variables:
+        self.loop: the event loop;
+        self.thread: the thread that runs it.
+    """
+
+    def __init__(self, name:str = 'ip-check-worker'):
+        """
+        Parameters:
+            name (str): name of the thread.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, coroutine:Coroutine) -> concurrent.futures.Future:
+        """
+        Running a coroutine on the loop, from any other thread.
+
+        Parameters:
+            coroutine (Coroutine): the work, for example "ip_search.aget()".
+
+        Returns:
+            concurrent.futures.Future: its result; "cancel" stops the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def close(self, timeout:float = 5.0) -> None:
+        """
+        Cancelling the coroutines still running, stopping the loop and
+        waiting for the thread. Must not be called from the loop itself.
+
+        Parameters:
+            timeout (float): seconds to wait for the coroutines to end.
+        """
+        if self.loop.is_closed():
+            return
+
+        async def cancel_all():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self.thread.is_alive():
+            try:
+                self.submit(cancel_all()).result(timeout)
+            except concurrent.futures.TimeoutError:
+                pass # Left to the daemon thread
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
@@ -1,76 +1,71 @@
+"""
+Tests of the class GetMyIP from the module find_ip against local copies
+of the provider sites (see the "fake_providers" module), without the Internet.
+"""
+import asyncio
+import json
+import os
+import subprocess
 import sys
-import argparse
+import time
 
-sys.path.append('/home/gurov/code/chatGPT/ip_checker/ip_checker/')
-from find_ip import GetMyIP
+import pytest
 
-class Tests_GetMyIP():
-    def __init__(self):
-        pass
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker')
+sys.path.append(PACKAGE_DIR)
+from find_ip import GetMyIP, FailedToGetIP
+from fake_providers import FakeProviderServer, FakeSites, SITES
+from providers import ProviderRegistry
 
-    def getArgv(self):
-        """
-        If argument details is enabled - will return 1.
-        """
-        parser = argparse.ArgumentParser(description="Getting a command line argument.")
-        parser.add_argument("-d", "--details", action="store_true",\
-                            help="Displaying detailed information on the tests performed.")
-        args = parser.parse_args()
-        if args.details:
-            return 1
-        else:
-            return None
 
-    def runningTests(self):
-        """
-        All tests should be run here in turn. 
-        Don't forget to add new tests here!
-        """
-        results: list = []
-        tests: tuple = (
-                # Make a new test challenge!
-                self.test_GetMyIP_positiveScenario(),
-                )
-        quantity_tests = range(len(tests))
-        for i in tests:
-            results.append(i)
-        args = self.getArgv()
-        if args == 1: 
-            for i,q in zip(results,quantity_tests):
-                print(f'Test №{q} have results: {i[1]}, and test description: {i[2]}\n')
-        elif args == None:
-            for i in results:
-                if i[0] == True:
-                    print(f'OK')
-                elif i[0] == False:
-                    print(f'WRONG!')
-                else:
-                    exit()
-        else:
-            exit()
-        
-    def test_GetMyIP_positiveScenario(self):
-        """
-        This is a test for a positive scenario of working 
-        function "manager" from class GetMyIP from module find_ip.
-        """
-        obj = GetMyIP()
-        ipv4 = obj.get()
-        discription = self.test_GetMyIP_positiveScenario.__doc__
-        discription_string = discription.replace('\n', '').strip().replace('         ', '')
-        if ipv4 is None:
-            result = (True, f'OK. IPv4 is {ipv4}', discription_string)
-            return result
-        elif ipv4.version == 4:
-            result = (True, f'OK. IPv4 is {ipv4}, type is {type(ipv4)}', discription_string)
-            return result
-        else: 
-            result = (False, f'WRONG! {ipv4}, type is {type(ipv4)}', discription_string)
-            return result
+def test_GetMyIP_positiveScenario():
+    with FakeSites(address='198.51.100.23') as sites, \
+            GetMyIP(provider_urls=sites.urls()) as ip_search:
+        ipv4 = ip_search.get()
+        assert ipv4.version == 4 and str(ipv4) == '198.51.100.23'
+        for method in (ip_search.get_external_ipv4_1, ip_search.get_external_ipv4_2,
+                       ip_search.get_external_ipv4_3):
+            assert str(method()) == '198.51.100.23'
 
 
+def test_GetMyIP_large_pages_and_failures():
+    with FakeSites(page_size=256 * 1024) as sites, \
+            GetMyIP(race=True, provider_urls=sites.urls()) as ip_search:
+        assert str(ip_search.get()) == '203.0.113.7'
+    with FakeSites(failure_rate=1.0) as sites, \
+            GetMyIP(provider_urls=sites.urls()) as ip_search:
+        with pytest.raises(FailedToGetIP):
+            ip_search.get()
+        assert all(server.requests == 1 for server in sites.servers)
 
-# Check
-test = Tests_GetMyIP()
-test.runningTests()
 
+def test_GetMyIP_race_does_not_wait_for_the_losers():
+    with FakeProviderServer(SITES[0], latency=1.0) as slow, \
+            FakeProviderServer(SITES[1], address='198.51.100.24') as fast, \
+            FakeProviderServer(SITES[2], latency=1.0) as slower, \
+            GetMyIP(race=True, provider_urls=[slow.url, fast.url, slower.url],
+                    adaptive=False) as ip_search:
+        started = time.monotonic()
+        assert str(ip_search.get()) == '198.51.100.24'
+        assert time.monotonic() - started < 0.8
+
+
+def test_GetMyIP_race_without_providers():
+    with GetMyIP(race=True, providers=ProviderRegistry(()), backends=('http',)) as ip_search:
+        with pytest.raises(FailedToGetIP):
+            ip_search.get()
+        with pytest.raises(FailedToGetIP):
+            asyncio.run(ip_search.aget())
+
+
+def test_benchmark_writes_json(tmp_path):
+    output = tmp_path / 'results.json'
+    subprocess.run([sys.executable, 'benchmark.py', '--output', str(output),
+                    '--get-iterations', '3', '--parse-iterations', '3',
+                    '--run-iterations', '10', '--proxies', '5'],
+                   cwd=PACKAGE_DIR, check=True, timeout=120)
+    results = json.loads(output.read_text())['results']
+    assert results['get']['sequential']['count'] == 3
+    assert set(results['parse']) == {'checkip', 'ipaddress', 'iplocation'}
+    assert results['run']['match_ops_per_s'] > 0
+    assert results['proxies']['count'] == 5
@@ -0,0 +1,54 @@
+"""
+Tests of the allowlist index and of IPAddressVerification with an allowlist.
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from allowlist import Allowlist
+from check_ip import IPAddressVerification
+
+ENTRIES = ['10.0.0.0/8', '10.1.0.0/16', '10.1.2.3', '192.168.0.7/24  # host bits are dropped',
+           '', '# comment', '172.16.0.0/12']
+
+
+def test_most_specific_range_is_returned():
+    allowlist = Allowlist(ENTRIES)
+    assert allowlist.lookup('10.1.2.3') == '10.1.2.3/32'
+    assert allowlist.lookup('10.1.9.9') == '10.1.0.0/16'
+    assert allowlist.lookup('10.200.0.1') == '10.0.0.0/8'
+    assert allowlist.lookup('192.168.0.255') == '192.168.0.0/24'
+    assert '11.0.0.0' not in allowlist
+    assert len(allowlist) == 5
+
+
+def test_invalid_entry_is_reported():
+    try:
+        Allowlist(['10.0.0.0/8', '10.0.0/8'])
+    except ValueError as exc:
+        assert 'Entry 2' in str(exc)
+        return
+    raise AssertionError('An invalid entry was accepted')
+
+
+def test_prefix_must_be_plain_digits():
+    for entry in ('10.0.0.0/+8', '10.0.0.0/ 8', '10.0.0.0/-0', '10.0.0.0/33', '10.0.0.0/',
+                  '10.0.0.0/٨', '10.0.0.0/8.0'):
+        try:
+            Allowlist([entry])
+        except ValueError as exc:
+            assert 'Entry 1' in str(exc)
+            continue
+        raise AssertionError(f'An invalid entry was accepted: {entry}')
+    assert Allowlist(['0.0.0.0/0', '10.0.0.0/08']).lookup('10.1.1.1') == '10.0.0.0/8'
+
+
+def test_verification_with_allowlist():
+    allowlist = Allowlist(ENTRIES)
+    result = IPAddressVerification('', ' 172,20,1,1 ', allowlist).run()
+    assert result.result is True
+    assert result.matched == '172.16.0.0/12'
+    assert result.current_ip == '172.20.1.1'
+    result = IPAddressVerification('', '8.8.8.8', allowlist).run()
+    assert result.result is False
+    assert result.matched is None
@@ -0,0 +1,103 @@
+"""
+Tests of the cache of GetMyIP: the lifetime of a found address and of
+a failed lookup, the "cached" flag and "invalidate".
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from find_ip import GetMyIP, FailedToGetIP
+from fake_providers import FakeSites
+
+
+def requests(sites):
+    return sum(server.requests for server in sites.servers)
+
+
+def test_answer_is_reused_until_the_ttl_expires():
+    with FakeSites(address='198.51.100.40') as sites, \
+            GetMyIP(provider_urls=sites.urls(), cache_ttl=0.3) as ip_search:
+        first = ip_search.lookup()
+        assert not first.cached and str(first.ipv4) == '198.51.100.40'
+        second = ip_search.lookup()
+        assert second.cached and second.ipv4 == first.ipv4
+        assert second.obtained_at == first.obtained_at # The time of the real lookup
+        assert str(ip_search.get()) == '198.51.100.40'
+        assert requests(sites) == 1
+        time.sleep(0.35)
+        assert ip_search.get_cached() is None
+        third = ip_search.lookup()
+        assert not third.cached and third.obtained_at > first.obtained_at
+        assert requests(sites) == 2
+
+
+def test_zero_ttl_disables_the_cache():
+    with FakeSites(address='198.51.100.41') as sites, \
+            GetMyIP(provider_urls=sites.urls()) as ip_search:
+        assert not ip_search.lookup().cached and not ip_search.lookup().cached
+        assert ip_search.get_cached() is None and requests(sites) == 2
+        assert str(ip_search.last_known().ipv4) == '198.51.100.41' # Kept anyway
+
+
+def test_failure_is_raised_again_until_the_failure_ttl_expires():
+    with FakeSites(failure_rate=1.0) as sites, \
+            GetMyIP(provider_urls=sites.urls(), failure_ttl=0.3) as ip_search:
+        with pytest.raises(FailedToGetIP):
+            ip_search.lookup()
+        asked = requests(sites)
+        assert asked == 3
+        with pytest.raises(FailedToGetIP, match='Cached failure'):
+            ip_search.get()
+        assert requests(sites) == asked # The providers are not asked again
+        time.sleep(0.35)
+        assert ip_search.get_cached() is None
+        with pytest.raises(FailedToGetIP) as error:
+            ip_search.lookup()
+        assert 'Cached failure' not in str(error.value)
+        assert requests(sites) > asked
+
+
+def test_invalidate_forgets_the_answer_and_the_failure():
+    with FakeSites(address='198.51.100.42') as sites, \
+            GetMyIP(provider_urls=sites.urls(), cache_ttl=3600) as ip_search:
+        ip_search.lookup()
+        assert ip_search.lookup().cached
+        ip_search.invalidate()
+        assert ip_search.get_cached() is None
+        assert not ip_search.lookup().cached and requests(sites) == 2
+    with FakeSites(failure_rate=1.0) as sites, \
+            GetMyIP(provider_urls=sites.urls(), failure_ttl=3600) as ip_search:
+        with pytest.raises(FailedToGetIP):
+            ip_search.lookup()
+        ip_search.invalidate()
+        assert ip_search.get_cached() is None # The failure is not raised again
+        with pytest.raises(FailedToGetIP) as error:
+            ip_search.lookup()
+        assert 'Cached failure' not in str(error.value)
+
+
+def test_lookups_started_before_invalidate_are_not_cached():
+    # The generation guard: the answer or the failure of a lookup that was
+    # running when the cache was invalidated is returned but not saved
+    with FakeSites(address='198.51.100.43', latency=0.3) as sites, \
+            GetMyIP(provider_urls=sites.urls(), cache_ttl=3600) as ip_search, \
+            ThreadPoolExecutor(max_workers=1) as executor:
+        old = executor.submit(ip_search.lookup)
+        time.sleep(0.1)
+        ip_search.invalidate()
+        assert str(old.result().ipv4) == '198.51.100.43'
+        assert ip_search.get_cached() is None and ip_search.last_known() is None
+        assert not ip_search.lookup().cached and ip_search.lookup().cached
+    with FakeSites(failure_rate=1.0, latency=0.3) as sites, \
+            GetMyIP(provider_urls=sites.urls(), failure_ttl=3600) as ip_search, \
+            ThreadPoolExecutor(max_workers=1) as executor:
+        old = executor.submit(ip_search.lookup)
+        time.sleep(0.1)
+        ip_search.invalidate()
+        with pytest.raises(FailedToGetIP):
+            old.result()
+        assert ip_search.get_cached() is None
@@ -0,0 +1,113 @@
+"""
+Tests of the command line interface: exit codes, JSON output and the
+import-time budget of a check answered from the state file and the package
+imports of "python -m ip_checker".
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(ROOT, 'ip_checker'))
+import cli
+from ipv4 import IPv4
+from state import LastKnownIP, StateFile
+
+# Modules that must not be imported when the answer comes from the cache
+HEAVY_MODULES = ('requests', 'bs4', 'loguru', 'numpy', 'gi', 'find_ip', 'check_ip')
+# The modules "python -m ip_checker" imports beyond the interpreter start may take
+# at most IMPORT_FACTOR times the import of argparse and json (needed anyway) plus
+# IMPORT_SLACK_US microseconds. Both are measured on the same machine, so a slow
+# machine does not fail the test, while one eager heavy import (requests alone
+# takes about 100 ms) does
+IMPORT_FACTOR = 3
+IMPORT_SLACK_US = 10_000
+# The least of several runs is compared, it is the least disturbed by other work
+IMPORT_RUNS = 3
+
+
+def run_cli(tmp_path, *args, importtime=False):
+    StateFile(str(tmp_path / 'state.bin')).write(
+            LastKnownIP(IPv4.parse('203.0.113.5'), time.time()), {})
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else [])
+    command += ['-m', 'ip_checker', '--max-age', '60', *args]
+    environment = dict(os.environ, IP_CHECKER_STATE_DIR=str(tmp_path))
+    return subprocess.run(command, cwd=ROOT, env=environment, capture_output=True,
+                          text=True, timeout=30)
+
+
+def test_exit_codes_and_json(tmp_path):
+    completed = run_cli(tmp_path, '203.0.113.5', '--json')
+    assert completed.returncode == 0
+    data = json.loads(completed.stdout)
+    assert data['match'] is True and data['cached'] is True and data['ipv4'] == '203.0.113.5'
+    assert run_cli(tmp_path, '203.0.113.6').returncode == 1
+    assert run_cli(tmp_path, 'not an address').returncode == 2
+    completed = run_cli(tmp_path)
+    assert completed.returncode == 0 and completed.stdout.strip() == '203.0.113.5'
+
+
+def test_ipv6_expected_address_turns_on_dual():
+    assert cli.parse_args(['2001:db8::5']).dual
+    assert not cli.parse_args(['203.0.113.5']).dual and not cli.parse_args([]).dual
+
+
+def top_level_imports(stderr):
+    """
+    Top-level imports in the "-X importtime" output with their cumulative
+    times in microseconds.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not name.startswith('  '):
+            imports.append((name.strip(), int(cumulative)))
+    return imports
+
+
+def import_time(stderr, startup):
+    return sum(time for name, time in top_level_imports(stderr) if name not in startup)
+
+
+def run_python(code):
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                          capture_output=True, text=True, timeout=30)
+
+
+def test_cached_check_import_budget(tmp_path):
+    startup = {name for name, _ in top_level_imports(run_python('pass').stderr)}
+    baseline = min(import_time(run_python('import argparse, json').stderr, startup)
+                   for _ in range(IMPORT_RUNS))
+    totals = []
+    for _ in range(IMPORT_RUNS):
+        completed = run_cli(tmp_path, '203.0.113.5', importtime=True)
+        assert completed.returncode == 0
+        imported = [line.split('|')[2].strip() for line in completed.stderr.splitlines()
+                    if line.startswith('import time:') and 'self [us]' not in line]
+        assert not [name for name in imported
+                    if name.removeprefix('ip_checker.').split('.')[0] in HEAVY_MODULES]
+        totals.append(import_time(completed.stderr, startup))
+    budget = IMPORT_FACTOR * baseline + IMPORT_SLACK_US
+    assert min(totals) < budget, f'{min(totals)} us, budget {budget} us'
+
+
+def test_package_modules_keep_their_package():
+    # Nothing is put on the module search path: the modules of the program
+    # must not be importable by their plain names ("state", "health")
+    own = {name[:-3] for name in os.listdir(os.path.join(ROOT, 'ip_checker'))
+           if name.endswith('.py') and not name.startswith('__')}
+    completed = subprocess.run(
+            [sys.executable, '-c', 'import runpy, sys\n'
+             'sys.argv = ["ip_checker", "--max-age", "60"]\n'
+             'try:\n    runpy.run_module("ip_checker", run_name="__main__")\n'
+             'except SystemExit:\n    pass\n'
+             'print(" ".join(sys.modules))'],
+            cwd=ROOT, capture_output=True, text=True, timeout=30,
+            env=dict(os.environ, IP_CHECKER_STATE_DIR=os.devnull))
+    modules = completed.stdout.split()
+    assert 'ip_checker.cli' in modules
+    assert not own & set(modules)
@@ -0,0 +1,80 @@
+"""
+Tests of the status daemon: answers over the Unix socket and TCP, one
+lookup for many requests, a new lookup when the network changes.
+"""
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from find_ip import GetMyIP
+from daemon import StatusDaemon
+from fake_providers import FakeSites
+import netlink
+from netlink import NetworkEvent
+
+
+async def get_json(reader, writer, target):
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    status_line = await reader.readline()
+    headers = {}
+    while (line := await reader.readline()) != b'\r\n':
+        name, _, value = line.decode().partition(':')
+        headers[name.lower()] = value.strip()
+    body = await reader.readexactly(int(headers['content-length']))
+    return int(status_line.split()[1]), json.loads(body)
+
+
+def test_daemon_serves_many_requests_from_one_lookup(tmp_path):
+    async def scenario(sites):
+        daemon = StatusDaemon(GetMyIP(provider_urls=sites.urls()), expected_ip='198.51.100.2',
+                              interval=3600, unix_path=str(tmp_path / 'daemon.sock'), port=0)
+        await daemon.start(wait_for_lookup=True)
+        try:
+            reader, writer = await asyncio.open_unix_connection(daemon.unix_path)
+            status_code, data = await get_json(reader, writer, '/status')
+            assert status_code == 200 and data['ipv4'] == '198.51.100.2' and data['match'] is True
+            for _ in range(200): # The same keep-alive connection
+                _, data = await get_json(reader, writer, '/status?expected=203.0.113.1')
+            assert data['match'] is False and data['checks'] == 1
+            writer.close()
+            reader, writer = await asyncio.open_connection('127.0.0.1', daemon.port)
+            assert (await get_json(reader, writer, '/nothing'))[0] == 404
+            writer.close()
+        finally:
+            await daemon.close()
+        assert not os.path.exists(daemon.unix_path)
+
+    with FakeSites(address='198.51.100.2') as sites:
+        asyncio.run(scenario(sites))
+        assert all(server.requests <= 1 for server in sites.servers)
+
+
+def test_daemon_checks_again_when_the_network_changes(tmp_path):
+    class EventSource():
+        def __init__(self):
+            self.queue = asyncio.Queue()
+
+        async def read(self):
+            return await self.queue.get()
+
+        def close(self):
+            pass
+
+    async def scenario(sites):
+        source = EventSource()
+        daemon = StatusDaemon(GetMyIP(provider_urls=sites.urls(), cache_ttl=3600),
+                              interval=3600, unix_path=str(tmp_path / 'daemon.sock'),
+                              watch_network=True, event_source=source, debounce=0.05)
+        await daemon.start(wait_for_lookup=True)
+        try:
+            await source.queue.put([NetworkEvent(netlink.LINK, netlink.NEW, 7, 'tun0', up=False)])
+            await asyncio.sleep(0.5)
+            assert daemon.checks == 2 and daemon.ipv4 == '198.51.100.3'
+        finally:
+            await daemon.close()
+
+    with FakeSites(address='198.51.100.3') as sites:
+        asyncio.run(scenario(sites))
+        assert sites.servers[0].requests == 2
@@ -0,0 +1,91 @@
+"""
+Tests of the deadline of a lookup and of the timeouts derived from the
+answer times of the providers.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from find_ip import GetMyIP, DeadlineExceeded, FailedToGetIP, DEADLINE_WORKERS
+from fake_providers import FakeProviderServer, FakeSites, SITES
+from health import HealthTracker
+
+
+def test_lookup_ends_at_the_deadline():
+    with FakeSites(latency=3) as sites:
+        for race in (False, True):
+            with GetMyIP(provider_urls=sites.urls(), race=race) as ip_search:
+                started = time.monotonic()
+                with pytest.raises(DeadlineExceeded):
+                    ip_search.get(deadline=0.4)
+                assert 0.4 <= time.monotonic() - started < 0.6
+
+                async def lookup():
+                    started = time.monotonic()
+                    with pytest.raises(FailedToGetIP): # DeadlineExceeded is one
+                        await ip_search.aget(deadline=0.4)
+                    return time.monotonic() - started
+
+                assert 0.4 <= asyncio.run(lookup()) < 0.6
+    with pytest.raises(ValueError):
+        GetMyIP(deadline=0)
+
+
+def test_deadline_is_split_among_providers():
+    with FakeProviderServer(SITES[0], latency=3) as slow, \
+            FakeProviderServer(SITES[1], address='198.51.100.40') as fast, \
+            FakeProviderServer(SITES[2]) as last, \
+            GetMyIP(provider_urls=(slow.url, fast.url, last.url), adaptive=False,
+                    deadline=0.9) as ip_search:
+        started = time.monotonic()
+        assert str(ip_search.get()) == '198.51.100.40'
+        # The hanging provider got a third of the time, not all of it
+        assert time.monotonic() - started < 0.6
+        assert last.requests == 0
+
+
+def deadline_threads():
+    return [thread for thread in threading.enumerate()
+            if thread.name.startswith('GetMyIP-deadline')]
+
+
+def test_calls_with_a_deadline_reuse_the_helper_threads():
+    with FakeSites(address='198.51.100.41') as sites:
+        with GetMyIP(provider_urls=sites.urls(), deadline=2.0) as ip_search:
+            for _ in range(10):
+                assert str(ip_search.get()) == '198.51.100.41'
+            helpers = {ip_search.call_within(time.monotonic() + 1, threading.current_thread)
+                       for _ in range(10)}
+            assert 1 <= len(helpers) <= DEADLINE_WORKERS
+            assert 1 <= len(deadline_threads()) <= DEADLINE_WORKERS
+        for thread in deadline_threads(): # "close" lets them end
+            thread.join(timeout=5)
+        assert not deadline_threads()
+
+
+def test_timeouts_follow_the_answer_times():
+    tracker = HealthTracker(min_timeout=0.1, max_timeout=5.0, timeout_factor=3.0)
+    assert tracker.timeouts('site') == (5.0, 5.0)
+    for latency in (0.1, 0.1, 0.1, 0.1, 0.2):
+        tracker.record_success('site', latency)
+    connect, read = tracker.timeouts('site')
+    assert connect == pytest.approx(0.3) and read == pytest.approx(0.6)
+    tracker.record_failure('site', 2.0) # A timeout makes the timeouts longer
+    assert tracker.timeouts('site') == (pytest.approx(0.6), pytest.approx(1.2))
+    tracker.record_failure('site', 2.0)
+    assert tracker.timeouts('site') == (pytest.approx(1.2), pytest.approx(2.4))
+    # The failures are not answer times, the percentiles stay the same
+    assert tracker.percentile('site', 0.99) == 0.2 and len(tracker.get('site').samples) == 5
+    tracker.record_success('site', 0.1) # Back to the percentiles at once
+    assert tracker.timeouts('site') == (pytest.approx(0.3), pytest.approx(0.6))
+    for _ in range(5):
+        tracker.record_failure('site', 2.0)
+    assert tracker.timeouts('site') == (5.0, 5.0) # Never above "max_timeout"
+    restored = HealthTracker()
+    restored.restore(tracker.snapshot())
+    assert restored.percentile('site', 0.5) == tracker.percentile('site', 0.5)
@@ -0,0 +1,111 @@
+"""
+Tests of the DNS backend against a local stub DNS server.
+"""
+import os
+import socket
+import struct
+import sys
+import threading
+import asyncio
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+import dns_ip
+from find_ip import GetMyIP
+
+
+class StubDNSServer():
+    """
+    UDP server on 127.0.0.1 that answers every query with the given
+    records: a list of (type, rdata) tuples.
+    """
+
+    def __init__(self, records, drop_first=0):
+        self.records = records
+        self.drop_first = drop_first
+        self.received = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                query, addr = self.sock.recvfrom(512)
+            except OSError:
+                return
+            self.received += 1
+            if self.received <= self.drop_first:
+                continue
+            header = struct.pack('!HHHHHH', int.from_bytes(query[:2], 'big'),
+                                 0x8400, 1, len(self.records), 0, 0)
+            answers = b''.join(struct.pack('!HHHIH', 0xC00C, rtype, 1, 0, len(rdata)) + rdata
+                               for rtype, rdata in self.records)
+            self.sock.sendto(header + query[12:] + answers, addr)
+
+    def resolver(self, qtype=dns_ip.TYPE_A):
+        return dns_ip.DNSResolver('stub', '127.0.0.1', 'myip.example', qtype, port=self.port)
+
+    def close(self):
+        self.sock.close()
+
+
+def test_encode_decode_roundtrip():
+    query = dns_ip.encode_query(0x1234, 'myip.opendns.com')
+    assert query[:2] == b'\x12\x34'
+    assert dns_ip.read_name(query, 12) == ('myip.opendns.com', 12 + 18)
+
+
+def test_a_record():
+    server = StubDNSServer([(dns_ip.TYPE_A, socket.inet_aton('203.0.113.7'))])
+    try:
+        assert dns_ip.query(server.resolver()) == ['203.0.113.7']
+        ip_search = GetMyIP(backends=('dns',), dns_resolvers=[server.resolver()])
+        assert str(ip_search.get()) == '203.0.113.7'
+    finally:
+        server.close()
+
+
+def test_txt_record_async():
+    server = StubDNSServer([(dns_ip.TYPE_TXT, b'\x0b203.0.113.8')])
+    try:
+        ip_search = GetMyIP(backends=('dns',),
+                            dns_resolvers=[server.resolver(dns_ip.TYPE_TXT)])
+        assert str(asyncio.run(ip_search.aget())) == '203.0.113.8'
+    finally:
+        server.close()
+
+
+def test_retry_after_lost_packet():
+    server = StubDNSServer([(dns_ip.TYPE_A, socket.inet_aton('203.0.113.9'))], drop_first=1)
+    try:
+        assert dns_ip.query(server.resolver(), timeout_ms=100, retries=1) == ['203.0.113.9']
+        assert server.received == 2
+    finally:
+        server.close()
+
+
+def test_invalid_value_is_rejected():
+    server = StubDNSServer([(dns_ip.TYPE_TXT, b'\x05hello')])
+    try:
+        ip_search = GetMyIP(backends=('dns',),
+                            dns_resolvers=[server.resolver(dns_ip.TYPE_TXT)])
+        assert ip_search.get_from_dns(server.resolver(dns_ip.TYPE_TXT)) is None
+    finally:
+        server.close()
+
+
+def test_unreachable_resolver_falls_back_to_the_next():
+    closed = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    closed.bind(('127.0.0.1', 0))
+    dead = dns_ip.DNSResolver('dead', '127.0.0.1', 'myip.example', port=closed.getsockname()[1])
+    closed.close() # Nothing listens: the query gets "connection refused"
+    server = StubDNSServer([(dns_ip.TYPE_A, socket.inet_aton('203.0.113.10'))])
+    try:
+        ip_search = GetMyIP(backends=('dns',), dns_resolvers=[dead, server.resolver()],
+                            adaptive=False)
+        assert ip_search.get_from_dns(dead) is None
+        assert str(ip_search.lookup_uncached().ipv4) == '203.0.113.10'
+        assert str(asyncio.run(ip_search.afind())) == '203.0.113.10'
+    finally:
+        server.close()
@@ -0,0 +1,70 @@
+"""
+Tests of the concurrent IPv4 and IPv6 lookup and of the leak detection.
+"""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from find_ip import GetMyIP
+from providers import Provider
+from check_ip import IPAddressVerification
+
+ANSWERS = {'/v4': b'198.51.100.7', '/v6': b'2001:db8::7', '/slow': b'2001:db8::8'}
+
+
+class AddressHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/slow':
+            time.sleep(2)
+        body = ANSWERS.get(self.path, b'')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), AddressHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def test_get_dual_returns_both_families():
+    server, base = start_server()
+    try:
+        ip_search = GetMyIP(providers=[Provider('v4', base + '/v4')],
+                            ipv6_providers=[Provider('v6', base + '/v6')])
+        result = ip_search.get_dual()
+        assert str(result.ipv4) == '198.51.100.7'
+        assert str(result.ipv6) == '2001:db8::7'
+    finally:
+        server.shutdown()
+
+
+def test_slow_ipv6_does_not_delay_ipv4():
+    server, base = start_server()
+    try:
+        ip_search = GetMyIP(providers=[Provider('v4', base + '/v4')],
+                            ipv6_providers=[Provider('slow', base + '/slow')],
+                            ipv6_grace=0.2)
+        started = time.monotonic()
+        result = ip_search.get_dual()
+        assert time.monotonic() - started < 1.5
+        assert str(result.ipv4) == '198.51.100.7' and result.ipv6 is None
+    finally:
+        server.shutdown()
+
+
+def test_ipv6_leak_is_reported():
+    result = IPAddressVerification('198.51.100.7', '198.51.100.7',
+                                   current_ipv6='2001:db8::7').run_dual()
+    assert result.result is False and result.ipv6_leak and not result.ipv4_leak
+    result = IPAddressVerification('198.51.100.7', '198.51.100.7', current_ipv6='2001:db8::7',
+                                   expected_ipv6='2001:0db8:0::7').run_dual()
+    assert result.result is True
@@ -0,0 +1,79 @@
+"""
+Tests of the fast extraction: the search in a page that arrives in
+pieces, on the blocking and on the asynchronous path.
+"""
+import asyncio
+import os
+import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+import async_http
+import extract
+from extract import StreamExtractor, scan_chunks
+from find_ip import GetMyIP
+from providers import Provider
+from fake_providers import make_page, CHECKIP, IPLOCATION
+
+
+def test_match_split_between_chunks():
+    page = make_page(IPLOCATION, '198.51.100.80', page_size=64 * 1024)
+    start = page.index(b'home-ip')
+    for cut in range(start - 5, start + 40): # Inside the marker and inside the address
+        extractor = StreamExtractor(extract.IPLOCATION_PATTERN)
+        assert extractor.feed(page[:cut]) in (None, '198.51.100.80')
+        assert extractor.feed(page[cut:]) == '198.51.100.80'
+        assert extractor.found == '198.51.100.80'
+    extractor = StreamExtractor(extract.CHECKIP_PATTERN)
+    for byte in make_page(CHECKIP, '198.51.100.81'):
+        extractor.feed(bytes([byte]))
+    assert extractor.found == '198.51.100.81'
+    # An address at the very end of the page is complete only when the page ends
+    extractor = StreamExtractor(re.compile(rb'ip=(\d+\.\d+\.\d+\.\d+)'))
+    assert extractor.feed(b'ip=198.51.100.8') is None and extractor.feed(b'2') is None
+    assert extractor.finish() == '198.51.100.82'
+
+
+def test_budget_and_early_stop():
+    page = make_page(IPLOCATION, '198.51.100.82', page_size=64 * 1024)
+    extractor = StreamExtractor(extract.IPLOCATION_PATTERN, byte_budget=16 * 1024)
+    for offset in range(0, len(page), 4096):
+        assert extractor.feed(page[offset:offset + 4096]) is None
+    assert extractor.exhausted and extractor.found is None
+    chunks = iter([b'x' * 100, b'<span class="home-ip">198.51.100.83</span>', b'never read'])
+    assert scan_chunks(chunks, extract.IPLOCATION_PATTERN)[0] == '198.51.100.83'
+    assert next(chunks) == b'never read'
+
+
+def test_async_reading_stops_at_the_limit():
+    async def endless(reader, writer):
+        while await reader.readline() not in (b'\r\n', b''):
+            pass
+        # No Content-Length: the body would end only with the connection
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n\r\n'
+                     b'<span class="home-ip">198.51.100.84</span>')
+        try:
+            while True:
+                writer.write(b'x' * 4096)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            writer.close()
+
+    async def scenario():
+        server = await asyncio.start_server(endless, '127.0.0.1', 0)
+        url = f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}/'
+        try:
+            response = await async_http.fetch(url, timeout=5, byte_limit=100_000)
+            assert len(response.content) == 100_000 and not response.complete
+            extractor = StreamExtractor(extract.IPLOCATION_PATTERN)
+            response = await async_http.fetch(url, timeout=5, stop=extractor.feed)
+            assert extractor.found == '198.51.100.84' and len(response.content) < 100_000
+            with GetMyIP(byte_budget=32 * 1024) as ip_search:
+                regex = Provider('endless', url, 'regex', r'home-ip">(\d+\.\d+\.\d+\.\d+)')
+                assert str(await ip_search.aget_from_provider(regex)) == '198.51.100.84'
+                text = Provider('endless', url, 'text')
+                assert await ip_search.aget_from_provider(text) is None # Not an address
+        finally:
+            server.close()
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
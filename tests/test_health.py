@@ -0,0 +1,106 @@
+"""
+Tests of the health statistics of the providers: the circuit breaker
+and the order in which the providers are called.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from find_ip import GetMyIP
+from fake_providers import FakeProviderServer, SITES
+from health import HealthTracker, CLOSED, OPEN, HALF_OPEN
+from providers import Provider, ProviderRegistry
+
+
+def test_breaker_opens_after_failures_in_a_row():
+    tracker = HealthTracker(failure_threshold=3, cooldown=60)
+    tracker.record_failure('a')
+    tracker.record_success('a', 0.1) # A success starts the count again
+    for _ in range(2):
+        tracker.record_failure('a')
+    assert tracker.get('a').state == CLOSED and tracker.available('a')
+    tracker.record_failure('a')
+    assert tracker.get('a').state == OPEN and not tracker.available('a')
+    assert tracker.order(['a', 'b'], str) == ['b']
+    assert tracker.order(['a'], str) == ['a'] # All blocked: nothing is refused
+
+
+def test_half_open_probe_after_the_cooldown():
+    tracker = HealthTracker(failure_threshold=1, cooldown=0.1)
+    tracker.record_failure('a')
+    assert not tracker.available('a')
+    time.sleep(0.15)
+    assert tracker.available('a')
+    tracker.begin('a') # The single probe
+    assert tracker.get('a').state == HALF_OPEN and not tracker.available('a')
+    tracker.release('a') # Cancelled: another caller may probe
+    assert tracker.available('a')
+    tracker.begin('a')
+    tracker.record_failure('a') # A failed probe opens the breaker again at once
+    assert tracker.get('a').state == OPEN and not tracker.available('a')
+    time.sleep(0.15)
+    tracker.begin('a')
+    tracker.record_success('a', 0.1)
+    assert tracker.get('a').state == CLOSED and tracker.available('a')
+    assert tracker.get('a').consecutive_failures == 0
+
+
+def test_order_follows_the_ewma():
+    tracker = HealthTracker(alpha=0.5, default_latency=1.0)
+    names = ['slow', 'fast', 'new', 'flaky']
+    tracker.record_success('slow', 2.0)
+    tracker.record_success('fast', 0.1)
+    tracker.record_success('flaky', 0.05)
+    tracker.record_failure('flaky', 0.05) # Counted as taking the default latency
+    assert tracker.get('flaky').latency == 0.525
+    assert tracker.get('flaky').success_rate == 0.5
+    assert tracker.order(names, str) == ['fast', 'new', 'flaky', 'slow']
+    for _ in range(6): # The slow one gets fast, the EWMA follows it
+        tracker.record_success('slow', 0.01)
+    assert tracker.order(names, str)[0] == 'slow'
+    assert tracker.expected_time('new') == 1.0 # Never called: the default latency
+
+
+def test_weight_orders_the_providers_not_called_yet():
+    tracker = HealthTracker(default_latency=1.0)
+    weights = {'light': 0.5, 'plain': 1.0, 'heavy': 3.0, 'zero': 0.0}
+    names = ['zero', 'light', 'plain', 'heavy']
+    assert tracker.order(names, str, weights.get) == ['heavy', 'plain', 'light', 'zero']
+    assert tracker.order(names, str) == names # Without weights the given order
+    tracker.record_success('plain', 0.5)
+    # The measured 0.5 s is slower than the 1 s / 3 assumed for "heavy",
+    # but faster than the 1 s / 0.5 assumed for "light"
+    assert tracker.order(names, str, weights.get) == ['heavy', 'plain', 'light', 'zero']
+    tracker.record_success('light', 0.1)
+    assert tracker.order(names, str, weights.get) == ['light', 'heavy', 'plain', 'zero']
+    equal = HealthTracker()
+    for name in names:
+        equal.record_success(name, 0.2)
+    # Equal statistics: the heavier provider first
+    assert equal.order(names, str, weights.get) == ['heavy', 'plain', 'light', 'zero']
+
+
+def test_get_my_ip_orders_by_provider_weight():
+    registry = ProviderRegistry([Provider('light', 'http://127.0.0.1:9/', weight=0.5),
+                                 Provider('heavy', 'http://127.0.0.1:9/', weight=3.0)])
+    with GetMyIP(providers=registry, backends=('dns', 'http')) as ip_search:
+        ordered = [ip_search.provider_name(func) for func in ip_search.ordered_providers()]
+        assert ordered[0] == 'heavy' and ordered[-1] == 'light'
+        ordered = [ip_search.provider_name(func) for func in ip_search.aordered_providers()]
+        assert ordered[0] == 'heavy' and ordered[-1] == 'light'
+
+
+def test_failing_provider_is_called_last():
+    with FakeProviderServer(SITES[0], failure_rate=1.0) as failing, \
+            FakeProviderServer(SITES[1], address='198.51.100.60') as site_2, \
+            FakeProviderServer(SITES[2], address='198.51.100.60') as site_3:
+        urls = [failing.url, site_2.url, site_3.url]
+        with GetMyIP(provider_urls=urls) as ip_search:
+            for _ in range(3):
+                assert str(ip_search.lookup_uncached().ipv4) == '198.51.100.60'
+        assert failing.requests == 1 and site_2.requests == 3 and site_3.requests == 0
+        with GetMyIP(provider_urls=urls, adaptive=False) as ip_search:
+            for _ in range(2):
+                assert str(ip_search.lookup_uncached().ipv4) == '198.51.100.60'
+        assert failing.requests == 3 # The fixed order asks it every time
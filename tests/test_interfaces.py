@@ -0,0 +1,64 @@
+"""
+Tests of the lookups bound to local addresses (per-interface discovery).
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from find_ip import GetMyIP
+from interfaces import Interface, can_bind_to_device, list_interfaces
+from fake_providers import FakeSites
+
+
+def test_list_interfaces_has_loopback():
+    if sys.platform.startswith('linux'):
+        assert Interface('lo', '127.0.0.1') in list_interfaces(include_loopback=True)
+    assert all(not interface.address.startswith('127.')
+               for interface in list_interfaces())
+
+
+def test_interfaces_are_checked_in_parallel():
+    # The sites answer with the address of the client, as the real ones do
+    with FakeSites(address=None, latency=0.4) as sites, \
+            GetMyIP(provider_urls=sites.urls()) as ip_search:
+        started = time.monotonic()
+        results = ip_search.get_per_interface([Interface('vpn', '127.0.0.2'),
+                                               Interface('lan', '127.0.0.3'),
+                                               Interface('gone', '192.0.2.254')])
+        elapsed = time.monotonic() - started
+    assert {name: str(ipv4) for name, ipv4 in results.items()} == \
+           {'vpn': '127.0.0.2', 'lan': '127.0.0.3', 'gone': 'None'}
+    assert elapsed < 0.8, elapsed
+
+
+def test_lookup_bound_to_the_device():
+    if not can_bind_to_device('lo'):
+        pytest.skip('SO_BINDTODEVICE is not allowed here')
+    assert not can_bind_to_device('no-such-interface0')
+    with FakeSites(address=None) as sites, GetMyIP(provider_urls=sites.urls()) as ip_search:
+        with ip_search.bound_to('127.0.0.4', 'lo') as bound:
+            assert bound.source_interface == 'lo'
+            assert str(bound.get()) == '127.0.0.4'
+        results = ip_search.get_per_interface([Interface('lo', '127.0.0.5')])
+    assert str(results['lo']) == '127.0.0.5'
+
+
+def test_slow_lookups_are_closed_when_they_end(monkeypatch):
+    closed = []
+    close = GetMyIP.close
+
+    def record_close(self):
+        if self.source_address is not None:
+            closed.append(self.source_address)
+        close(self)
+
+    monkeypatch.setattr(GetMyIP, 'close', record_close)
+    with FakeSites(address=None, latency=0.6) as sites, \
+            GetMyIP(provider_urls=sites.urls()) as ip_search:
+        results = ip_search.get_per_interface([Interface('vpn', '127.0.0.6')], timeout=0.1)
+        assert results == {'vpn': None} and closed == [] # Still running
+        time.sleep(1)
+        assert closed == ['127.0.0.6']
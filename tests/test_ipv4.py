@@ -0,0 +1,47 @@
+"""
+Tests of the compact IPv4 type and its parser.
+"""
+import os
+import sys
+from ipaddress import IPv4Address, ip_address
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from ipv4 import IPv4
+from check_ip import IPAddressVerification
+
+CASES = ['1.2.3.4', '0.0.0.0', '255.255.255.255', '01.2.3.4', '256.0.0.0', '1.2.3',
+         '1.2.3.4.', ' 1.2.3.4', '1.2.3.4\n', '+1.2.3.4', '1..2.3', '::1',
+         '١.٢.٣.٤', '1.2.3.²', '']
+
+
+def test_parse_matches_ipaddress():
+    for text in CASES:
+        try:
+            expected = ip_address(text)
+        except ValueError:
+            expected = None
+        if expected is not None and expected.version != 4:
+            expected = None
+        parsed = IPv4.parse(text)
+        if expected is None:
+            assert parsed is None, text
+        else:
+            assert parsed == expected and str(parsed) == str(expected)
+            assert hash(parsed) == hash(expected)
+
+
+def test_conversions_and_ordering():
+    address = IPv4.parse('10.0.0.1')
+    assert int(address) == 0x0A000001
+    assert address.packed == bytes([10, 0, 0, 1])
+    assert address.to_ipaddress() == IPv4Address('10.0.0.1')
+    assert IPv4.from_ipaddress(IPv4Address('10.0.0.1')) == address
+    assert IPv4.parse(IPv4Address('10.0.0.1')) == address
+    assert address < IPv4.parse('10.0.0.2')
+    assert address != '10.0.0.1'
+
+
+def test_comparison_uses_numbers():
+    verification = IPAddressVerification()
+    assert verification.comparison_ipv4(IPv4.parse('8.8.8.8'), '8.8.8.8') is True
+    assert verification.comparison_ipv4('8.8.8.8', '8.8.4.4') is False
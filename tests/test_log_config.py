@@ -0,0 +1,42 @@
+"""
+Tests of the central logging configuration.
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from loguru import logger
+import log_config
+import find_ip
+
+
+def test_import_does_not_create_log_files():
+    assert not [name for name in os.listdir('.') if name.endswith('.log.txt')]
+
+
+def test_queued_file_sink(tmp_path):
+    log_config.configure(directory=str(tmp_path), file_level='ERROR', console_level=None)
+    try:
+        find_ip.GetMyIP().make_control('not an address')
+        logger.info('Below the level of the file: {}', 'hidden')
+    finally:
+        log_config.shutdown() # Writes out the queue
+    text = (tmp_path / log_config.LOG_FILE_NAME).read_text(encoding='utf-8')
+    assert 'does not contain an IP address. Value: (not an address)' in text
+    assert 'hidden' not in text
+
+
+def test_sinks_of_others_are_kept(tmp_path):
+    messages = []
+    sink = logger.add(messages.append, level='ERROR', format='{message}')
+    try:
+        log_config.configure(directory=str(tmp_path), console_level=None)
+        log_config.configure(directory=str(tmp_path), console_level=None) # Replaces its own
+        logger.error('Written {}', 'once')
+        log_config.shutdown()
+        logger.error('After the shutdown')
+    finally:
+        logger.remove(sink)
+    assert messages == ['Written once\n', 'After the shutdown\n']
+    text = (tmp_path / log_config.LOG_FILE_NAME).read_text(encoding='utf-8')
+    assert text.count('Written once') == 1 and 'After the shutdown' not in text
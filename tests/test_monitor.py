@@ -0,0 +1,48 @@
+"""
+Tests of the adaptive poll interval of the VPN monitor.
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from find_ip import GetMyIP
+from monitor import VPNMonitor, ACTIVE, NOT_ACTIVE, UNKNOWN
+
+
+def make_monitor():
+    return VPNMonitor('198.51.100.1', GetMyIP(), min_interval=10, max_interval=60, backoff=2)
+
+
+def test_interval_grows_while_nothing_changes():
+    vpn_monitor = make_monitor()
+    intervals = []
+    for _ in range(5):
+        vpn_monitor.update('198.51.100.1')
+        intervals.append(vpn_monitor.interval)
+    assert intervals == [10, 20, 40, 60, 60] # The first check is a change from "unknown"
+    assert vpn_monitor.state == ACTIVE and vpn_monitor.checks == 5
+
+
+def test_interval_drops_after_a_change():
+    vpn_monitor = make_monitor()
+    events = []
+    vpn_monitor.subscribe(events.append)
+    for _ in range(4):
+        vpn_monitor.update('198.51.100.1')
+    assert vpn_monitor.interval == 60
+    event = vpn_monitor.update('203.0.113.1')
+    assert vpn_monitor.interval == 10 and event.state == NOT_ACTIVE
+    assert [event.state for event in events] == [ACTIVE, NOT_ACTIVE]
+
+
+def test_interval_drops_after_a_failure():
+    vpn_monitor = make_monitor()
+    for _ in range(4):
+        vpn_monitor.update('198.51.100.1')
+    assert vpn_monitor.update(None).state == UNKNOWN and vpn_monitor.interval == 10
+    for current_ip in (None, 'not an address', None):
+        assert vpn_monitor.update(current_ip) is None # Still unknown, no new event
+        assert vpn_monitor.interval == 10
+    vpn_monitor.update('198.51.100.1')
+    vpn_monitor.update('198.51.100.1')
+    assert vpn_monitor.interval == 20
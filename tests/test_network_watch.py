@@ -0,0 +1,154 @@
+"""
+Tests of the re-check on network changes, with a fake source of the
+rtnetlink events and local copies of the provider sites.
+"""
+import asyncio
+import os
+import socket
+import struct
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from find_ip import GetMyIP
+from fake_providers import FakeSites, make_page
+import netlink
+from netlink import NetworkEvent, parse_messages
+from network_watch import NetworkWatcher
+from monitor import VPNMonitor, ACTIVE, NOT_ACTIVE
+
+TUN_DOWN = NetworkEvent(netlink.LINK, netlink.NEW, 7, 'tun0', up=False)
+ROUTE_GONE = NetworkEvent(netlink.ROUTE, netlink.DELETED, 7, address='10.8.0.1', default=True)
+LOOPBACK = NetworkEvent(netlink.ADDRESS, netlink.NEW, 99, 'lo', '127.0.0.2')
+
+
+class FakeEventSource():
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.closed = False
+
+    async def read(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.closed = True
+
+
+def test_parse_messages():
+    name = b'tun0\0'
+    attribute = struct.pack('=HH', 4 + len(name), netlink.IFLA_IFNAME) + name + b'\0' * 3
+    body = struct.pack('=BxHiII', socket.AF_UNSPEC, 0, 7, 0, 0) + attribute
+    link = struct.pack('=IHHII', 16 + len(body), 16, 0, 0, 0) + body
+    gateway = struct.pack('=HH', 8, netlink.RTA_GATEWAY) + socket.inet_aton('10.8.0.1')
+    body = struct.pack('=BBBBBBBBI', socket.AF_INET, 0, 0, 0, 254, 0, 0, 1, 0) + gateway
+    route = struct.pack('=IHHII', 16 + len(body), 25, 0, 0, 0) + body
+    local = struct.pack('=BBBBBBBBI', socket.AF_INET, 32, 0, 0, netlink.RT_TABLE_LOCAL,
+                        0, 0, 2, 0)
+    local = struct.pack('=IHHII', 16 + len(local), 24, 0, 0, 0) + local
+    assert parse_messages(link + route + local + b'\x01\x02') == [
+            NetworkEvent(netlink.LINK, netlink.NEW, 7, 'tun0', up=False),
+            NetworkEvent(netlink.ROUTE, netlink.DELETED, None, address='10.8.0.1',
+                         default=True)]
+
+
+def test_event_storm_invalidates_and_checks_once():
+    with FakeSites(address='198.51.100.50') as sites, \
+            GetMyIP(provider_urls=sites.urls(), cache_ttl=3600) as ip_search:
+        ip_search.get()
+        checks = []
+
+        async def scenario():
+            source = FakeEventSource()
+            watcher = NetworkWatcher(ip_search, expected_ip='198.51.100.50', source=source,
+                                     debounce=0.2, max_delay=1.0, on_check=checks.append)
+            task = asyncio.ensure_future(watcher.run())
+            await source.queue.put([LOOPBACK])
+            await asyncio.sleep(0.3)
+            assert ip_search.get_cached() is not None # Loopback changes are ignored
+            for _ in range(20):
+                await source.queue.put([TUN_DOWN, ROUTE_GONE])
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            assert ip_search.get_cached() is None # Invalidated before the check
+            assert checks == []
+            await asyncio.sleep(0.4)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            assert source.closed
+            return watcher
+
+        watcher = asyncio.run(scenario())
+        assert watcher.events == 40 and watcher.checks == 1
+        assert len(checks) == 1 and len(checks[0].events) == 40
+        assert str(checks[0].ipv4) == '198.51.100.50' and checks[0].comparison.result
+        assert sites.servers[0].requests == 2
+
+
+def test_max_delay_bounds_a_long_storm():
+    with FakeSites() as sites, GetMyIP(provider_urls=sites.urls()) as ip_search:
+        async def scenario():
+            source = FakeEventSource()
+            watcher = NetworkWatcher(ip_search, expected_ip='198.51.100.1', source=source,
+                                     debounce=0.2, max_delay=0.5)
+            task = asyncio.ensure_future(watcher.run())
+            for _ in range(40): # 1.2 s of events, never quiet for "debounce"
+                await source.queue.put([TUN_DOWN])
+                await asyncio.sleep(0.03)
+            checks_during_storm = watcher.checks
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return checks_during_storm, watcher.last_check
+
+        checks_during_storm, last_check = asyncio.run(scenario())
+        assert checks_during_storm >= 1
+        assert last_check.comparison.result is False
+
+
+def test_monitor_checks_when_the_network_changes():
+    with FakeSites(address='198.51.100.60') as sites, \
+            GetMyIP(provider_urls=sites.urls()) as ip_search:
+        source = FakeEventSource()
+        vpn_monitor = VPNMonitor('198.51.100.60', ip_search, min_interval=3600,
+                                 max_interval=3600, watch_network=True,
+                                 event_source=source, debounce=0.05)
+        events = []
+        vpn_monitor.subscribe(events.append)
+
+        async def scenario():
+            task = asyncio.ensure_future(vpn_monitor.arun())
+            await asyncio.sleep(0.3)
+            for server in sites.servers: # The VPN dropped
+                server.page = make_page(server.site, '203.0.113.60')
+            await source.queue.put([TUN_DOWN])
+            await asyncio.sleep(0.5)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            assert source.closed
+
+        asyncio.run(scenario())
+        assert [event.state for event in events] == [ACTIVE, NOT_ACTIVE]
+        assert events[1].current_ip == '203.0.113.60' and vpn_monitor.checks == 2
+
+
+def test_check_ignores_a_lookup_started_before_the_change():
+    with FakeSites(address='198.51.100.70', latency=0.1) as vpn_sites, \
+            FakeSites(address='203.0.113.70') as direct_sites, \
+            GetMyIP(provider_urls=vpn_sites.urls(), cache_ttl=3600) as ip_search:
+        async def scenario():
+            source = FakeEventSource()
+            watcher = NetworkWatcher(ip_search, expected_ip='198.51.100.70', source=source,
+                                     debounce=0.3)
+            task = asyncio.ensure_future(watcher.run())
+            old_lookup = asyncio.ensure_future(ip_search.alookup())
+            await asyncio.sleep(0.02)
+            ip_search.provider_urls = direct_sites.urls() # The VPN dropped
+            await source.queue.put([TUN_DOWN])
+            # The old lookup ends during the debounce with the VPN address
+            assert str((await old_lookup).ipv4) == '198.51.100.70'
+            await asyncio.sleep(0.4)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return watcher.last_check
+
+        check = asyncio.run(scenario())
+        assert str(check.ipv4) == '203.0.113.70' and check.comparison.result is False
+        assert str(ip_search.get()) == '203.0.113.70'
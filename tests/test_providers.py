@@ -0,0 +1,81 @@
+"""
+Tests of the provider records: loading them from JSON, finding the
+address in the answers and rejecting invalid records.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from providers import Provider, ProviderRegistry, check_provider, extract_address
+from providers import TEXT, JSON, REGEX, HTML
+
+
+def write_json(tmp_path, data):
+    path = tmp_path / 'providers.json'
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return str(path)
+
+
+def test_registry_from_file(tmp_path):
+    path = write_json(tmp_path, {'providers': [
+            {'name': 'plain', 'url': 'https://plain.example'},
+            {'name': 'json', 'url': 'https://json.example', 'extractor': 'json',
+             'query': 'data.ip', 'weight': 5, 'headers': {'Accept': 'application/json'}}]})
+    registry = ProviderRegistry.from_file(path)
+    assert [provider.name for provider in registry] == ['json', 'plain']
+    registry.load_file(write_json(tmp_path, [{'name': 'plain', 'url': 'https://other.example',
+                                              'weight': 9.5}]))
+    assert len(registry) == 2 and next(iter(registry)).url == 'https://other.example'
+    registry.remove('plain')
+    assert [provider.name for provider in registry] == ['json']
+
+
+def test_extractors():
+    assert extract_address(Provider('t', 'u', TEXT), b' 198.51.100.1\n') == '198.51.100.1'
+    provider = Provider('j', 'u', JSON, 'data.ip')
+    assert extract_address(provider, b'{"data": {"ip": "198.51.100.2"}}') == '198.51.100.2'
+    assert extract_address(provider, b'{"data": {}}') is None
+    assert extract_address(provider, b'not json') is None
+    provider = Provider('r', 'u', REGEX, r'ip=(\d+\.\d+\.\d+\.\d+);')
+    assert extract_address(provider, b'x ip=198.51.100.3; y') == '198.51.100.3'
+    assert extract_address(provider, 'ip=198.51.100.4;') == '198.51.100.4'
+    assert extract_address(provider, b'nothing') is None
+    provider = Provider('h', 'u', HTML, 'span.home-ip')
+    page = b'<p><span class="home-ip">Your IP: 198.51.100.5</span></p>'
+    assert extract_address(provider, page) == '198.51.100.5'
+    assert extract_address(provider, b'<p>nothing</p>') is None
+
+
+@pytest.mark.parametrize('fields', [
+        {'name': '', 'url': 'https://example.org'},
+        {'name': 'n', 'url': 42},
+        {'name': 'n', 'url': 'u', 'extractor': 'xml', 'query': 'ip'},
+        {'name': 'n', 'url': 'u', 'extractor': 'json'},
+        {'name': 'n', 'url': 'u', 'extractor': 'regex', 'query': '('},
+        {'name': 'n', 'url': 'u', 'extractor': 'regex', 'query': 'ip'},
+        {'name': 'n', 'url': 'u', 'weight': 'high'},
+        {'name': 'n', 'url': 'u', 'weight': True},
+        {'name': 'n', 'url': 'u', 'weight': float('nan')},
+        {'name': 'n', 'url': 'u', 'headers': ['Accept']},
+        {'name': 'n', 'url': 'u', 'headers': {'X-Retry': 3}},
+        ])
+def test_invalid_providers_are_rejected(fields):
+    with pytest.raises(ValueError):
+        check_provider(Provider(**fields))
+
+
+def test_invalid_file_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ProviderRegistry.from_file(write_json(tmp_path, [{'name': 'n', 'url': 'u',
+                                                          'weight': 'high'}]))
+    with pytest.raises(ValueError):
+        ProviderRegistry.from_file(write_json(tmp_path, [{'name': 'n', 'link': 'u'}]))
+    with pytest.raises(ValueError):
+        ProviderRegistry.from_file(write_json(tmp_path, {'providers': 'none'}))
+    registry = ProviderRegistry(())
+    with pytest.raises(ValueError):
+        registry.load_file(write_json(tmp_path, [{'name': 'good', 'url': 'u'},
+                                                 {'name': 'bad', 'url': 'u', 'headers': 'x'}]))
@@ -0,0 +1,63 @@
+"""
+Tests of the bulk proxy check against the local proxy stand-in.
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from providers import Provider
+from proxy_check import ProxyChecker
+from fake_providers import FakeProviderServer, FakeProxyServer, PLAIN
+
+
+def test_exit_addresses_of_many_proxies():
+    with FakeProviderServer(PLAIN, address=None) as site, \
+            FakeProxyServer(latency=0.05) as proxy_server:
+        proxies = {proxy_server.url(f'127.0.1.{number}', scheme): f'127.0.1.{number}'
+                   for number in range(1, 41) for scheme in ('http', 'socks5')}
+        proxies[proxy_server.url('127.0.1.1', 'http')] = '203.0.113.1' # Exits elsewhere
+        checker = ProxyChecker(providers=[Provider('local', site.url)], concurrency=10,
+                               timeout=5, expected=proxies)
+        results = list(checker.check(list(proxies) + ['http://127.0.0.1:1', 'ftp://nothing']))
+        # A connection closed by a client is counted until the proxy notices it
+        assert proxy_server.peak < 20
+    by_proxy = {result.proxy: result for result in results}
+    assert len(by_proxy) == len(proxies) + 2
+    for proxy, expected in proxies.items():
+        assert by_proxy[proxy].error is None
+        assert by_proxy[proxy].match is (str(by_proxy[proxy].ipv4) == expected)
+    assert by_proxy[proxy_server.url('127.0.1.1', 'http')].match is False
+    assert by_proxy['http://127.0.0.1:1'].ipv4 is None and by_proxy['http://127.0.0.1:1'].error
+    assert 'Invalid proxy' in by_proxy['ftp://nothing'].error
+
+
+def test_stopping_early_cancels_the_checks():
+    with FakeProviderServer(PLAIN, address=None) as site, \
+            FakeProxyServer(latency=0.2) as proxy_server:
+        checker = ProxyChecker(providers=[Provider('local', site.url)], concurrency=5)
+        results = checker.check(proxy_server.url(f'127.0.2.{number}') for number in range(1, 200))
+        assert next(results).error is None
+        results.close()
+        assert proxy_server.connections < 20
+
+
+def test_one_connection_per_proxy_and_errors_kept():
+    class FlakyChecker(ProxyChecker):
+        async def acheck_one(self, proxy):
+            if proxy.endswith('broken'):
+                raise RuntimeError('broken check')
+            return await super().acheck_one(proxy)
+
+    with FakeProviderServer(PLAIN, failure_rate=1.0) as failing, \
+            FakeProviderServer(PLAIN, address=None) as site, \
+            FakeProxyServer() as proxy_server:
+        proxies = [proxy_server.url(f'127.0.3.{number}') for number in range(1, 6)]
+        checker = FlakyChecker(providers=[Provider('failing', failing.url),
+                                          Provider('local', site.url)], concurrency=1)
+        results = list(checker.check(proxies[:2] + ['http://broken'] + proxies[2:]))
+        # Both providers were asked over the same connection to the proxy
+        assert failing.requests == 5 and proxy_server.connections == 5
+    assert len(results) == 6
+    assert [str(result.ipv4) for result in results if result.error is None] == [
+            proxy.split('@')[0].split('/')[-1].split(':')[0] for proxy in proxies]
+    assert 'broken check' in results[2].error and results[2].proxy == 'http://broken'
@@ -0,0 +1,49 @@
+"""
+Tests of the HTTP session shared by the provider requests: the
+connections are kept open between the checks, an idle session is
+replaced by a new one.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from find_ip import GetMyIP
+from fake_providers import FakeSites
+
+
+def test_checks_reuse_one_connection():
+    with FakeSites(address='198.51.100.50') as sites, \
+            GetMyIP(provider_urls=sites.urls()) as ip_search:
+        session = ip_search.get_session()
+        for _ in range(5):
+            assert str(ip_search.lookup_uncached().ipv4) == '198.51.100.50'
+        assert ip_search.get_session() is session
+        assert sites.servers[0].requests == 5 and sites.servers[0].connections == 1
+
+
+def test_idle_session_is_closed_and_replaced():
+    with FakeSites(address='198.51.100.51') as sites, \
+            GetMyIP(provider_urls=sites.urls(), idle_timeout=0.2) as ip_search:
+        ip_search.lookup_uncached()
+        session = ip_search.get_session()
+        ip_search.lookup_uncached() # Used again in time: the same connection
+        assert sites.servers[0].connections == 1
+        time.sleep(0.3)
+        assert ip_search.get_session() is not session
+        assert not session.adapters['http://'].poolmanager.pools # Its connections are closed
+        ip_search.lookup_uncached()
+        assert sites.servers[0].requests == 3 and sites.servers[0].connections == 2
+
+
+def test_close_drops_the_connections():
+    with FakeSites(address='198.51.100.52') as sites:
+        ip_search = GetMyIP(provider_urls=sites.urls())
+        ip_search.lookup_uncached()
+        session = ip_search.get_session()
+        ip_search.close()
+        assert not session.adapters['http://'].poolmanager.pools
+        ip_search.lookup_uncached() # The instance stays usable with a new session
+        assert ip_search.get_session() is not session
+        assert sites.servers[0].connections == 2
+        ip_search.close()
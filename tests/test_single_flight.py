@@ -0,0 +1,71 @@
+"""
+Tests of the single-flight lookup: concurrent callers in threads and
+in asyncio share one request to the providers.
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from find_ip import GetMyIP, FailedToGetIP
+from fake_providers import FakeSites
+
+
+def test_threads_and_tasks_share_one_lookup():
+    with FakeSites(address='198.51.100.30', latency=0.3) as sites, \
+            GetMyIP(provider_urls=sites.urls()) as ip_search:
+        async def tasks():
+            return await asyncio.gather(*[ip_search.aget() for _ in range(10)])
+
+        with ThreadPoolExecutor(max_workers=11) as executor:
+            futures = [executor.submit(ip_search.get) for _ in range(10)]
+            futures.append(executor.submit(asyncio.run, tasks()))
+            results = [future.result() for future in futures[:-1]] + futures[-1].result()
+        assert {str(ipv4) for ipv4 in results} == {'198.51.100.30'}
+        assert sites.servers[0].requests == 1
+
+
+def test_failure_reaches_every_caller():
+    with FakeSites(failure_rate=1.0, latency=0.2) as sites, \
+            GetMyIP(provider_urls=sites.urls()) as ip_search:
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [executor.submit(ip_search.get) for _ in range(5)]
+            for future in futures:
+                with pytest.raises(FailedToGetIP):
+                    future.result()
+        assert all(server.requests == 1 for server in sites.servers)
+
+
+def test_cancelled_waiter_does_not_cancel_the_lookup():
+    with FakeSites(address='198.51.100.31', latency=0.3) as sites, \
+            GetMyIP(provider_urls=sites.urls()) as ip_search:
+        async def scenario():
+            first = asyncio.ensure_future(ip_search.aget())
+            second = asyncio.ensure_future(ip_search.aget())
+            await asyncio.sleep(0.05)
+            first.cancel()
+            assert str(await second) == '198.51.100.31'
+            assert first.cancelled()
+
+        asyncio.run(scenario())
+        assert sites.servers[0].requests == 1
+
+
+def test_lookup_running_during_invalidate_is_not_cached():
+    with FakeSites(address='198.51.100.32', latency=0.3) as sites, \
+            GetMyIP(provider_urls=sites.urls(), cache_ttl=3600) as ip_search:
+        async def scenario():
+            old = asyncio.ensure_future(ip_search.alookup())
+            await asyncio.sleep(0.05)
+            ip_search.invalidate() # The network changed during the lookup
+            assert not (await old).cached
+            assert ip_search.get_cached() is None and ip_search.last_known() is None
+            return await ip_search.alookup()
+
+        result = asyncio.run(scenario())
+        assert not result.cached and str(result.ipv4) == '198.51.100.32'
+        assert sites.servers[0].requests == 2
+        assert ip_search.lookup().cached # The new lookup filled the cache
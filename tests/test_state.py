@@ -0,0 +1,72 @@
+"""
+Tests of the state file and of restoring the provider statistics from it.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+from ipv4 import IPv4
+from state import LastKnownIP, StateFile
+from health import HealthTracker, OPEN, CLOSED
+from find_ip import GetMyIP
+from fake_providers import FakeSites
+
+
+def test_state_file_round_trip(tmp_path):
+    state_file = StateFile(str(tmp_path / 'state' / 'state.bin'))
+    assert state_file.read_last() is None and state_file.read() is None
+    tracker = HealthTracker(cooldown=60)
+    tracker.record_success('fast', 0.05)
+    for _ in range(3):
+        tracker.record_failure('broken', 0.1)
+    last = LastKnownIP(IPv4.parse('198.51.100.4'), time.time())
+    assert state_file.write(last, tracker.snapshot())
+    assert state_file.read_last() == last
+    saved = state_file.read()
+    restored = HealthTracker(cooldown=60)
+    assert saved.last == last and restored.restore(saved.providers) == 2
+    assert restored.get('fast').state == CLOSED and restored.get('fast').latency == 0.05
+    assert restored.get('broken').state == OPEN and not restored.available('broken')
+    (tmp_path / 'broken.bin').write_bytes(b'not a state file')
+    assert StateFile(str(tmp_path / 'broken.bin')).read() is None
+
+
+def test_get_my_ip_saves_and_restores_state(tmp_path):
+    path = str(tmp_path / 'state.bin')
+    with FakeSites(address='198.51.100.9') as sites:
+        with GetMyIP(provider_urls=sites.urls(), state_file=StateFile(path)) as ip_search:
+            assert ip_search.last_known() is None
+            ip_search.get()
+        ip_search = GetMyIP(provider_urls=sites.urls(), state_file=StateFile(path))
+        assert str(ip_search.last_known().ipv4) == '198.51.100.9'
+        assert ip_search.health.snapshot()
+
+
+def test_state_writes_are_merged_and_off_the_caller(tmp_path):
+    class SlowStateFile(StateFile):
+        def __init__(self, path):
+            super().__init__(path)
+            self.writes = []
+
+        def write(self, last, providers):
+            time.sleep(0.3) # A slow disk
+            self.writes.append(last)
+            return super().write(last, providers)
+
+    state_file = SlowStateFile(str(tmp_path / 'state.bin'))
+    with FakeSites(address='198.51.100.10') as sites:
+        with GetMyIP(provider_urls=sites.urls(), state_file=state_file,
+                     state_interval=60) as ip_search:
+            for _ in range(3):
+                started = time.monotonic()
+                ip_search.lookup_uncached()
+                assert time.monotonic() - started < 0.3 # The lookup did not wait
+            time.sleep(0.5)
+            assert len(state_file.writes) == 1 # The first write, the others wait
+            ip_search.save_state()
+            assert len(state_file.writes) == 1
+        assert len(state_file.writes) == 2 # Written by close
+        assert str(state_file.read_last().ipv4) == '198.51.100.10'
+        ip_search.close()
+        assert len(state_file.writes) == 2 # Nothing was pending
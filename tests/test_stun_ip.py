@@ -0,0 +1,64 @@
+"""
+Tests of the STUN backend against the local STUN responder.
+"""
+import os
+import socket
+import sys
+import asyncio
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+import dns_ip
+import stun_ip
+from find_ip import GetMyIP
+from tests.test_dns_ip import StubDNSServer
+
+
+def test_response_roundtrip():
+    transaction_id = b'0123456789ab'
+    message = stun_ip.encode_response(transaction_id, '198.51.100.1', 40000)
+    assert stun_ip.decode_response(message, transaction_id) == ('198.51.100.1', 40000)
+
+
+def test_query_reports_sender_address():
+    with stun_ip.StunResponder() as responder:
+        address, port = stun_ip.query(responder.server())
+        assert address == '127.0.0.1'
+        assert port > 0
+
+
+def test_get_my_ip_with_stun_backend():
+    with stun_ip.StunResponder(mapped_address='198.51.100.2') as responder:
+        ip_search = GetMyIP(backends=('stun',), stun_servers=[responder.server()])
+        assert str(ip_search.get()) == '198.51.100.2'
+        assert str(asyncio.run(ip_search.aget(race=True))) == '198.51.100.2'
+        assert responder.requests == 2
+
+
+def test_stun_answer_without_address_is_rejected():
+    transaction_id = b'0123456789ab'
+    message = stun_ip.encode_request(transaction_id)
+    try:
+        stun_ip.decode_response(message, transaction_id)
+    except stun_ip.STUNError:
+        return
+    raise AssertionError('A request was accepted as an answer')
+
+
+def test_unreachable_server_falls_back_to_the_next():
+    closed = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    closed.bind(('127.0.0.1', 0))
+    dead = stun_ip.STUNServer('dead', '127.0.0.1', closed.getsockname()[1])
+    closed.close() # Nothing listens: the request gets "connection refused"
+    with stun_ip.StunResponder(mapped_address='198.51.100.3') as responder:
+        ip_search = GetMyIP(backends=('stun',), stun_servers=[dead, responder.server()],
+                            adaptive=False)
+        assert ip_search.get_from_stun(dead) is None
+        assert str(ip_search.lookup_uncached().ipv4) == '198.51.100.3'
+        assert str(asyncio.run(ip_search.afind())) == '198.51.100.3'
+    dns_server = StubDNSServer([(dns_ip.TYPE_A, socket.inet_aton('198.51.100.4'))])
+    try:
+        ip_search = GetMyIP(backends=('stun', 'dns'), stun_servers=[dead],
+                            dns_resolvers=[dns_server.resolver()], adaptive=False)
+        assert str(ip_search.lookup_uncached().ipv4) == '198.51.100.4'
+    finally:
+        dns_server.close()
@@ -0,0 +1,113 @@
+"""
+Tests of the UDP request with retries shared by the DNS and STUN
+backends: late answers and stray datagrams.
+"""
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+import dns_ip
+import stun_ip
+
+
+class SlowStunServer():
+    """
+    STUN server on 127.0.0.1 that answers only the first request, "delay"
+    seconds late, and sends a stray datagram every "noise" seconds.
+    """
+
+    def __init__(self, delay=None, noise=None):
+        self.delay = delay
+        self.noise = noise
+        self.requests = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                message, address = self.sock.recvfrom(2048)
+            except OSError:
+                return
+            self.requests += 1
+            if self.requests == 1:
+                threading.Thread(target=self.answer, args=(message, address),
+                                 daemon=True).start()
+
+    def answer(self, message, address):
+        started = time.monotonic()
+        try:
+            while self.noise is not None and time.monotonic() - started < 1:
+                self.sock.sendto(b'stray datagram', address)
+                time.sleep(self.noise)
+            if self.delay is not None:
+                time.sleep(self.delay)
+                self.sock.sendto(stun_ip.encode_response(message[8:20], '198.51.100.70', 4000),
+                                 address)
+        except OSError:
+            pass
+
+    def server(self):
+        return stun_ip.STUNServer('slow', '127.0.0.1', self.port)
+
+    def close(self):
+        self.sock.close()
+
+
+def test_late_answer_to_an_earlier_attempt_is_accepted():
+    for asynchronous in (False, True):
+        server = SlowStunServer(delay=0.3)
+        try:
+            if asynchronous:
+                mapped = asyncio.run(stun_ip.aquery(server.server(), timeout_ms=200, retries=2))
+            else:
+                mapped = stun_ip.query(server.server(), timeout_ms=200, retries=2)
+            assert mapped == ('198.51.100.70', 4000)
+            assert server.requests == 2 # Answered during the second attempt
+        finally:
+            server.close()
+
+
+def test_stray_datagrams_do_not_extend_the_wait():
+    for asynchronous in (False, True):
+        server = SlowStunServer(noise=0.05)
+        started = time.monotonic()
+        try:
+            if asynchronous:
+                mapped = asyncio.run(stun_ip.aquery(server.server(), timeout_ms=200, retries=1))
+            else:
+                mapped = stun_ip.query(server.server(), timeout_ms=200, retries=1)
+        finally:
+            server.close()
+        assert mapped is None
+        assert time.monotonic() - started < 0.6
+
+
+def test_dns_answer_to_an_earlier_query_is_accepted():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    queries = []
+
+    def serve():
+        while len(queries) < 2:
+            message, address = sock.recvfrom(512)
+            queries.append(message)
+        # Answer the first query only, after it was repeated
+        answer = (queries[0][:2] + b'\x84\x00\x00\x01\x00\x01\x00\x00\x00\x00'
+                  + queries[0][12:] + b'\xc0\x0c\x00\x01\x00\x01\x00\x00\x00\x00\x00\x04'
+                  + socket.inet_aton('198.51.100.71'))
+        sock.sendto(answer, address)
+
+    threading.Thread(target=serve, daemon=True).start()
+    resolver = dns_ip.DNSResolver('slow', '127.0.0.1', 'myip.example',
+                                  port=sock.getsockname()[1])
+    try:
+        assert dns_ip.query(resolver, timeout_ms=200, retries=2) == ['198.51.100.71']
+    finally:
+        sock.close()
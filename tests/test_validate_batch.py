@@ -0,0 +1,32 @@
+"""
+Tests of the vectorised batch validation of check_ip.
+"""
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+
+np = pytest.importorskip('numpy')
+
+from check_ip import (validate_batch, IPAddressVerification, BATCH_OK,
+                      BATCH_NOT_IP, BATCH_NOT_IPV4)
+
+CASES = ['1.2.3.4', ' 10,0,0,1 ', '255.255.255.255', '0.0.0.0', '256.1.1.1',
+         '01.2.3.4', '1.2.3', '1.2.3.4.5', '', 'abc', '1..2.3', '1.2.3.4/24',
+         '::1', 12345, '100.200.30.4\n']
+
+
+def test_validate_batch_matches_single_path():
+    verification = IPAddressVerification()
+    result = validate_batch(CASES)
+    for value, valid in zip(CASES, result.valid):
+        normalized = verification.data_normalization(verification.data_type_check(value))
+        assert bool(valid) == (verification.ipv4_type_check(normalized) is True)
+
+
+def test_validate_batch_codes_and_addresses():
+    result = validate_batch(np.array(['192.168.0.1', 'x', 'fe80::1']))
+    assert result.addresses.dtype == np.uint32
+    assert list(result.addresses) == [0xC0A80001, 0, 0]
+    assert list(result.errors) == [BATCH_OK, BATCH_NOT_IP, BATCH_NOT_IPV4]
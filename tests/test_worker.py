@@ -0,0 +1,84 @@
+"""
+Tests of the worker loop of the GUI: the checks share the keep-alive
+connections of the loop, the Stop button cancels a running check.
+"""
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ip_checker'))
+import async_http
+from find_ip import GetMyIP
+from fake_providers import FakeSites
+from worker import WorkerLoop
+
+
+def test_checks_on_the_worker_reuse_connections():
+    worker = WorkerLoop()
+    try:
+        with FakeSites(address='198.51.100.90') as sites, \
+                GetMyIP(provider_urls=sites.urls()) as ip_search:
+            for _ in range(3):
+                assert str(worker.submit(ip_search.aget()).result(5)) == '198.51.100.90'
+
+            async def reused():
+                return ip_search.get_async_pool().reused
+
+            assert worker.submit(reused()).result(5) == 2
+            assert sites.servers[0].requests == 3
+    finally:
+        worker.close()
+    assert not worker.thread.is_alive() and worker.loop.is_closed()
+
+
+def test_stop_cancels_the_running_check():
+    worker = WorkerLoop()
+    try:
+        with FakeSites(latency=5) as sites, GetMyIP(provider_urls=sites.urls()) as ip_search:
+            future = worker.submit(ip_search.aget())
+            time.sleep(0.2)
+            started = time.monotonic()
+            future.cancel() # The Stop button
+            with pytest.raises(CancelledError):
+                future.result(1)
+
+            async def running():
+                await asyncio.sleep(0.05) # The cancellation reaches the lookup task
+                return [task for task in asyncio.all_tasks()
+                        if task is not asyncio.current_task()]
+
+            assert worker.submit(running()).result(1) == []
+            assert time.monotonic() - started < 1
+            assert ip_search.get_cached() is None
+    finally:
+        worker.close()
+
+
+def test_connection_closed_by_the_server_is_replaced():
+    connections = []
+
+    async def serve_once(reader, writer):
+        connections.append(writer)
+        await reader.readuntil(b'\r\n\r\n')
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 14\r\n\r\n198.51.100.91\n')
+        await reader.readuntil(b'\r\n\r\n') # The next request is not answered
+        writer.close()
+
+    async def scenario():
+        server = await asyncio.start_server(serve_once, '127.0.0.1', 0)
+        url = f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}/'
+        pool = async_http.ConnectionPool()
+        try:
+            for _ in range(2):
+                response = await async_http.fetch(url, timeout=5, pool=pool)
+                assert response.content == b'198.51.100.91\n' and response.complete
+        finally:
+            pool.close()
+            server.close()
+        return pool.reused
+
+    assert asyncio.run(scenario()) == 1 and len(connections) == 2